@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Modo por lotes del scraper: ejecuta sin preguntas una lista de trabajos leída
+de un archivo JSON (lista de objetos) o JSONL (un objeto por línea).
+
+Cada trabajo admite los campos:
+    site:        olympus, m440, inmanga, ikigai, leercapitulo o tmo
+    url:         URL del capítulo inicial (o del manga en m440)
+    chapters:    en m440, rango de capítulos ('1-10', '5' o 'todos');
+                 en el resto, total de capítulos a descargar contando el
+                 inicial (número o 'todos'; 5 descarga el inicial y los 4
+                 siguientes). Si se omite se descarga solo el capítulo
+                 indicado (en m440, todos los capítulos).
+    download:    si se descargan las imágenes (por defecto true)
+    overwrite:   qué hacer si el capítulo ya existe en disco: 'keep'
+                 (por defecto), 'overwrite' o 'ask'
+    priority:    prioridad del trabajo (mayor valor, antes se ejecuta; 0 por defecto)
+
+Los trabajos se reparten en un pool global de hilos respetando el límite de
+trabajos simultáneos de cada sitio (configurable con BATCH_SITE_LIMITS, por
+ejemplo 'olympus=3,m440=1').
+
+Uso:
+    python batch.py trabajos.jsonl [hilos]
+    python main.py --batch trabajos.jsonl [hilos]
+"""
+
+import os
+import sys
+import json
+
+from utils.file_utils import create_directories, overwrite_policy, OVERWRITE_POLICIES
+from utils.scheduler import JobScheduler
+from utils.download_utils import ensure_connection_pool
+
+# Número de trabajos que se ejecutan a la vez entre todos los sitios
+DEFAULT_BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '2'))
+
+
+def parse_site_limits(value):
+    """Convierte 'sitio=límite,sitio=límite' en un diccionario."""
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            site, limit = item.split('=', 1)
+            try:
+                limits[site.strip()] = int(limit)
+            except ValueError:
+                print(f"Límite no válido para {site.strip()}: {limit}")
+    return limits
+
+
+def scrape_tmo(url, download_images=True, num_chapters=None):
+    """TMO todavía no está soportado; el trabajo se registra y se omite."""
+    print(f"TMO: funcionalidad no implementada aún ({url})")
+
+
+def _scrapers():
+    """Tabla de funciones de descarga por sitio: (capítulo único, consecutivos)."""
+    from main import scrape_olympus, scrape_olympus_consecutive, scrape_m440_range
+    from scrapers.inmanga_scraper import scrape_inmanga, scrape_inmanga_consecutive
+    from scrapers.ikigai_scraper import scrape_ikigai, scrape_ikigai_consecutive
+    from scrapers.leercapitulo_scraper import scrape_leercapitulo, scrape_leercapitulo_consecutive
+
+    return {
+        'olympus': (scrape_olympus, scrape_olympus_consecutive),
+        'm440': (None, scrape_m440_range),
+        'inmanga': (scrape_inmanga, scrape_inmanga_consecutive),
+        'ikigai': (scrape_ikigai, scrape_ikigai_consecutive),
+        'leercapitulo': (scrape_leercapitulo, scrape_leercapitulo_consecutive),
+        'tmo': (scrape_tmo, scrape_tmo),
+    }
+
+
+def load_jobs(path):
+    """
+    Lee la lista de trabajos de un archivo JSON o JSONL.
+
+    Args:
+        path: Ruta del archivo de trabajos
+
+    Returns:
+        list: Trabajos leídos, en el orden del archivo
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    stripped = content.lstrip()
+    if stripped.startswith('['):
+        return json.loads(stripped)
+
+    jobs = []
+    for line_number, line in enumerate(content.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            jobs.append(json.loads(line))
+        except ValueError as e:
+            print(f"Línea {line_number} no válida en {path}: {str(e)}")
+    return jobs
+
+
+def validate_job(job, scrapers):
+    """Devuelve un mensaje de error si el trabajo no es válido, o None."""
+    if not isinstance(job, dict):
+        return "el trabajo debe ser un objeto JSON"
+    if job.get('site') not in scrapers:
+        return f"sitio no soportado: {job.get('site')}"
+    if not job.get('url'):
+        return "falta la URL"
+    if job.get('overwrite', 'keep') not in OVERWRITE_POLICIES:
+        return f"política de sobreescritura no válida: {job.get('overwrite')}"
+    if not isinstance(job.get('priority', 0), (int, float)):
+        return f"prioridad no válida: {job.get('priority')}"
+    return None
+
+
+def run_job(job, scrapers):
+    """
+    Ejecuta un trabajo con las funciones de descarga existentes.
+
+    Args:
+        job: Trabajo a ejecutar
+        scrapers: Tabla de funciones devuelta por _scrapers()
+
+    Returns:
+        bool: True si el scraper descargó lo pedido (al menos un capítulo y
+              ninguno fallido)
+    """
+    site = job['site']
+    url = job['url']
+    download_images = bool(job.get('download', True))
+    chapters = job.get('chapters')
+    scrape_single, scrape_many = scrapers[site]
+
+    # Cada hilo aplica su propia política, sin preguntar por consola
+    with overwrite_policy(job.get('overwrite', 'keep')):
+        if site == 'm440':
+            result = scrape_many(url, download_images, str(chapters or 'todos'))
+        elif chapters in (None, 0, '0', ''):
+            result = scrape_single(url, download_images)
+        else:
+            result = scrape_many(url, download_images, str(chapters))
+    # Los scrapers devuelven la información del capítulo, el número de
+    # capítulos descargados o una lista con el resultado de cada uno
+    if isinstance(result, list):
+        return bool(result) and all(result)
+    return bool(result)
+
+
+def run_batch(jobs, workers=None, site_limits=None):
+    """
+    Ejecuta una lista de trabajos en el planificador global.
+
+    Args:
+        jobs: Lista de trabajos
+        workers: Trabajos simultáneos entre todos los sitios (por defecto BATCH_WORKERS)
+        site_limits: Límites por sitio (por defecto los de BATCH_SITE_LIMITS)
+
+    Returns:
+        list: Resultado de cada trabajo como (trabajo, estado)
+    """
+    create_directories()
+    scrapers = _scrapers()
+    workers = max(1, workers or DEFAULT_BATCH_WORKERS)
+    if site_limits is None:
+        site_limits = parse_site_limits(os.getenv('BATCH_SITE_LIMITS'))
+
+    results = []
+    valid_jobs = []
+    for job in jobs:
+        error = validate_job(job, scrapers)
+        if error:
+            print(f"Trabajo omitido ({error}): {job}")
+            results.append((job, f"inválido: {error}"))
+        else:
+            valid_jobs.append(job)
+
+    print(f"Ejecutando {len(valid_jobs)} trabajos con {workers} hilos...")
+    # Cada trabajo puede descargar varios capítulos, y cada capítulo varias imágenes
+    ensure_connection_pool(jobs=min(workers, len(valid_jobs)))
+
+    def execute(job):
+        print(f"\n=== Trabajo {job['site']}: {job['url']} ===")
+        try:
+            return 'completado' if run_job(job, scrapers) else 'fallido'
+        except Exception as e:
+            print(f"Error en el trabajo {job['url']}: {str(e)}")
+            return f"error: {str(e)}"
+
+    with JobScheduler(workers, site_limits) as scheduler:
+        futures = [
+            scheduler.submit(job['site'], execute, job, priority=job.get('priority', 0))
+            for job in valid_jobs
+        ]
+        for job, future in zip(valid_jobs, futures):
+            results.append((job, future.result()))
+
+    # Mostrar resumen de resultados
+    print(f"\nResumen del lote:")
+    for job, status in results:
+        print(f"  - {job.get('site') if isinstance(job, dict) else '?'} {job.get('url') if isinstance(job, dict) else job}: {status}")
+    return results
+
+
+def run_batch_file(path, workers=None):
+    """Lee un archivo de trabajos y lo ejecuta."""
+    if not os.path.exists(path):
+        print(f"Error: El archivo {path} no existe")
+        return []
+    jobs = load_jobs(path)
+    return run_batch(jobs, workers)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python batch.py <trabajos.json|trabajos.jsonl> [hilos]")
+        sys.exit(1)
+    run_batch_file(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -25,7 +25,10 @@ from scrapers.ikigai_scraper import scrape_ikigai, scrape_ikigai_consecutive
 
 # Importar utilidades comunes
 from utils.file_utils import create_directories, sanitize_filename, create_manga_directory
-from utils.file_utils import create_chapter_directory, save_metadata, download_image
+from utils.file_utils import create_chapter_directory, save_metadata
+from utils.download_utils import download_chapter_images, download_chapters, download_following_chapters
+from scrapers.olympus_scraper import get_olympus_chapters
+from utils.http_utils import get_session, rate_limited_get
 
 # Crear directorio para guardar imágenes si no existe
 def create_directories():
@@ -77,40 +80,7 @@ def main():
         
         # Solicitar rango de capítulos
         range_option = input("Ingresa el rango de capítulos a descargar (ejemplo: 1-10, o 'todos' para descargar todos): ").lower()
-        
-        start_chapter = 0
-        end_chapter = float('inf')
-        
-        if range_option != 'todos':
-            try:
-                if '-' in range_option:
-                    start_chapter, end_chapter = map(int, range_option.split('-'))
-                else:
-                    # Si solo se ingresa un número, descargar desde ese capítulo hasta el final
-                    start_chapter = int(range_option)
-            except ValueError:
-                print("Formato de rango incorrecto. Se descargarán todos los capítulos.")
-                start_chapter = 0
-                end_chapter = float('inf')
-        
-        # Filtrar capítulos según el rango especificado
-        filtered_chapters = [chapter for chapter in chapters if start_chapter <= chapter['number'] <= end_chapter]
-        
-        if not filtered_chapters:
-            print("No hay capítulos en el rango especificado.")
-            return
-        
-        print(f"Se descargarán {len(filtered_chapters)} capítulos.")
-        
-        # Descargar capítulos
-        for idx, chapter in enumerate(filtered_chapters):
-            print(f"\n=== Procesando capítulo {chapter['number']} ({idx+1}/{len(filtered_chapters)}): {chapter['url']} ===")
-            
-            # Añadir una pequeña pausa para no sobrecargar el servidor
-            if idx > 0:
-                time.sleep(1.5)
-            
-            m440_scrape_chapter_impl(chapter['url'], download_images)
+        scrape_m440_range(url, download_images, range_option, chapters)
     elif option == "3":
         url = input("Ingresa la URL del capítulo de Inmanga: ")
         download_option = input("¿Deseas descargar las imágenes? (s/n): ").lower()
@@ -171,7 +141,7 @@ def scrape_olympus(url, download_images=True):
         #     return
         
         # Obtener el contenido de la página
-        response = requests.get(url)
+        response = rate_limited_get(get_session(), url)
         if response.status_code != 200:
             print(f"Error al acceder a la URL: {response.status_code}")
             return
@@ -225,6 +195,17 @@ def scrape_olympus(url, download_images=True):
         
         base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
         
+        # Página de la serie, para obtener el índice de capítulos: el título
+        # enlaza a ella; si no, se deriva de la URL (/capitulo/<id>/<slug>)
+        manga_url = None
+        title_link = title_element.find_parent('a', href=True) if title_element else None
+        if title_link:
+            manga_url = urljoin(base_url, title_link['href'])
+        else:
+            slug_match = re.search(r'/capitulo/\d+/([^/?#]+)', parsed_url.path)
+            if slug_match:
+                manga_url = f"{base_url}/series/{slug_match.group(1)}"
+        
         # Si encontramos al menos 2 enlaces, asumimos que son el anterior y siguiente
         if len(chapter_links) >= 2:
             # El primer enlace suele ser el capítulo anterior
@@ -289,7 +270,8 @@ def scrape_olympus(url, download_images=True):
             "manga_title": manga_title,
             "chapter_number": chapter_number,
             "next_chapter_url": next_chapter_url,
-            "prev_chapter_url": prev_chapter_url
+            "prev_chapter_url": prev_chapter_url,
+            "manga_url": manga_url
         }
         
     except Exception as e:
@@ -300,6 +282,17 @@ def scrape_olympus(url, download_images=True):
     Función para descargar capítulos consecutivos
 """
 def scrape_olympus_consecutive(initial_url, download_images=True, num_chapters='todos'):
+    """
+    Descarga capítulos consecutivos de Olympus a partir de uno inicial.
+
+    Args:
+        initial_url: URL del capítulo inicial
+        download_images: Si es True, descarga las imágenes de los capítulos
+        num_chapters: Total de capítulos a descargar, incluido el inicial, o 'todos'
+
+    Returns:
+        int: Número de capítulos descargados
+    """
     current_url = initial_url
     chapters_downloaded = 0
     max_chapters = float('inf') if num_chapters == 'todos' else int(num_chapters)
@@ -310,24 +303,31 @@ def scrape_olympus_consecutive(initial_url, download_images=True, num_chapters='
     
     if not chapter_info:
         print("No se pudo obtener información del capítulo.")
-        return
+        return chapters_downloaded
     
     chapters_downloaded += 1
     
+    # Con el índice de la serie, el resto del rango se descarga en paralelo
+    if max_chapters > 1 and chapter_info.get('manga_url'):
+        index = get_olympus_chapters(chapter_info['manga_url'])
+        downloaded = download_following_chapters(scrape_olympus, chapter_info, current_url, index,
+                                                 download_images, max_chapters - 1)
+        if downloaded is not None:
+            chapters_downloaded += len(downloaded)
+            print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
+            return chapters_downloaded
+    
     # Verificar si hay capítulo siguiente
     if not chapter_info.get('next_chapter_url'):
         print("No hay capítulo siguiente disponible.")
         print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
-        return
+        return chapters_downloaded
     
-    # Descargar capítulos consecutivos
+    # Sin índice: seguir los enlaces "siguiente" de uno en uno
     while chapters_downloaded < max_chapters and chapter_info and chapter_info.get('next_chapter_url'):
         current_url = chapter_info['next_chapter_url']
         print(f"\n=== Procesando capítulo siguiente ({chapters_downloaded + 1}/{max_chapters if max_chapters != float('inf') else 'todos'}): {current_url} ===")
         
-        # Añadir una pequeña pausa para no sobrecargar el servidor
-        time.sleep(1.5)
-        
         chapter_info = scrape_olympus(current_url, download_images)
         
         if not chapter_info:
@@ -341,6 +341,7 @@ def scrape_olympus_consecutive(initial_url, download_images=True, num_chapters='
             break
     
     print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
+    return chapters_downloaded
 
 """
     funcionalidad especifica para leer el manga de M440.in
@@ -359,6 +360,54 @@ def scrape_m440(url, download_images=True):
     """
     return m440_scrape_chapter_impl(url, download_images)
 
+def scrape_m440_range(url, download_images=True, range_option='todos', chapters=None):
+    """
+    Descarga un rango de capítulos de un manga de m440.in.
+    
+    Args:
+        url: URL principal del manga en m440.in
+        download_images: Si es True, descarga las imágenes de cada capítulo
+        range_option: Rango de capítulos ('1-10', '5' para desde el 5 hasta el final, o 'todos')
+        chapters: Lista de capítulos ya obtenida (opcional, se consulta si no se indica)
+
+    Returns:
+        list: Resultado de cada capítulo del rango (None si falló), o None si no
+              se pudo obtener la lista de capítulos o el rango está vacío
+    """
+    if chapters is None:
+        chapters = m440_get_chapters_impl(url)
+        if not chapters:
+            print("No se pudo obtener la lista de capítulos. Verifica la URL e intenta nuevamente.")
+            return
+    
+    start_chapter = 0
+    end_chapter = float('inf')
+    
+    range_option = str(range_option).lower()
+    if range_option != 'todos':
+        try:
+            if '-' in range_option:
+                start_chapter, end_chapter = map(int, range_option.split('-'))
+            else:
+                # Si solo se ingresa un número, descargar desde ese capítulo hasta el final
+                start_chapter = int(range_option)
+        except ValueError:
+            print("Formato de rango incorrecto. Se descargarán todos los capítulos.")
+            start_chapter = 0
+            end_chapter = float('inf')
+    
+    # Filtrar capítulos según el rango especificado
+    filtered_chapters = [chapter for chapter in chapters if start_chapter <= chapter['number'] <= end_chapter]
+    
+    if not filtered_chapters:
+        print("No hay capítulos en el rango especificado.")
+        return
+    
+    print(f"Se descargarán {len(filtered_chapters)} capítulos.")
+    
+    # Descargar capítulos en paralelo
+    return download_chapters(m440_scrape_chapter_impl, filtered_chapters, download_images)
+
 """
     Función para obtener la lista de todos los capítulos disponibles de un manga en M440.in
 """
@@ -434,8 +483,6 @@ def save_images(manga_title, chapter_number, image_elements, download_images=Tru
                 #     print(f"Saltando imagen {real_index} porque parece ser un anuncio")
                 #     continue
 
-                filepath = os.path.join(chapter_dir, filename)
-                
                 # Añadir a la lista de imágenes
                 image_urls.append(img_url)
                 images_info.append({
@@ -443,14 +490,13 @@ def save_images(manga_title, chapter_number, image_elements, download_images=Tru
                     'number': real_index,
                     'filename': filename
                 })
-                
-                # Descargar imagen solo si se ha solicitado
-                if download_images:
-                    download_image(requests.Session(), img_url, filepath)
-                    print(f"Guardada imagen {real_index}/{len(unique_urls)}")
         except Exception as e:
             print(f"Error al procesar imagen {index+1}: {str(e)}")
     
+    # Descargar imágenes solo si se ha solicitado, todas las páginas del capítulo a la vez
+    if download_images:
+        download_chapter_images(get_session(), images_info, chapter_dir)
+    
     # Crear y guardar archivo de metadatos
     metadata = {
         'manga_title': manga_title,
@@ -520,10 +566,9 @@ def scrape_m440_consecutive(initial_url, download_images=True, num_chapters='tod
             print("Número de capítulos no válido, descargando solo el capítulo inicial.")
             end_index = start_index + 1
     
-    # Descargar capítulos en secuencia
-    for i in range(start_index, end_index):
-        print(f"\nDescargando capítulo {i-start_index+1} de {end_index-start_index}...")
-        m440_scrape_chapter_impl(chapters[i]['url'], download_images)
+    # Descargar capítulos en paralelo
+    print(f"\nDescargando {end_index-start_index} capítulos...")
+    download_chapters(m440_scrape_chapter_impl, chapters[start_index:end_index], download_images)
 
 # Función para procesar los enlaces de capítulos y convertirlos en una lista estructurada
 def process_chapter_links(chapter_links, base_url):
@@ -541,4 +586,9 @@ def process_chapter_links(chapter_links, base_url):
     return m440_process_chapter_links_impl(chapter_links, base_url)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 2 and sys.argv[1] == '--batch':
+        # Modo por lotes: python main.py --batch trabajos.jsonl [hilos]
+        from batch import run_batch_file
+        run_batch_file(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    else:
+        main()
\ No newline at end of file
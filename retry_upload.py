@@ -18,8 +18,13 @@ import sys
 from pathlib import Path
 
 # Importar módulos de Strapi
-from strapi.save import ComicManager, EpisodeManager
-from strapi.upload import ImageUploader
+from strapi.save import ComicManager, EpisodeManager, run_episode_pipeline
+from strapi.client import client_session, StrapiSession
+from strapi.hash_index import hash_index, sha256_file, hash_remote_file, REBUILD_CONCURRENCY
+from strapi.transcode import optimize_image
+from strapi.upload import ImageUploader, guess_image_type
+from strapi.journal import journal_for_chapter_dir
+from utils.library_index import library_index
 
 # Cargar variables de entorno
 load_dotenv('.env.local')
@@ -31,6 +36,22 @@ STRAPI_TOKEN = os.getenv('STRAPI_TOKEN')
 if not STRAPI_URL or not STRAPI_TOKEN:
     raise ValueError("STRAPI_URL y STRAPI_TOKEN deben estar configurados en .env.local")
 
+# Nombres por consulta y tamaño de página al buscar imágenes ya subidas
+LOOKUP_BATCH_SIZE = 50
+LOOKUP_PAGE_SIZE = 100
+
+
+def _size_kb(file_data: Dict) -> Optional[float]:
+    """Tamaño de un archivo de Strapi, que lo guarda en kB con dos decimales."""
+    try:
+        return float(file_data.get('size'))
+    except (TypeError, ValueError):
+        return None
+
+def _size_matches(file_data: Dict, size: int) -> bool:
+    """Si el tamaño de un archivo de Strapi puede corresponder a size bytes (o no se conoce)."""
+    size_kb = _size_kb(file_data)
+    return size_kb is None or abs(size_kb - size / 1000) <= 0.01
 
 class RetryUploader:
     def __init__(self):
@@ -42,47 +63,177 @@ class RetryUploader:
         self.episode_manager = EpisodeManager()
         self.image_uploader = ImageUploader()
     
-    async def find_uploaded_images(self, image_urls: List[str]) -> Dict[str, int]:
+    async def _fetch_files_by_name(self, names: List[str]) -> List[Dict]:
         """
-        Busca imágenes ya subidas en Strapi por URL para evitar volver a subirlas.
+        Obtiene de Strapi los archivos cuyo nombre está en la lista, en lotes.
+        
+        Cada lote usa un filtro filters[name][$in] paginado, de modo que se hacen
+        unas pocas peticiones por manga en lugar de una por imagen.
         
         Args:
-            image_urls: Lista de URLs de imágenes a buscar
+            names: Nombres de archivo a buscar
             
         Returns:
-            Diccionario que mapea URLs de imágenes a IDs de Strapi
+            Lista de archivos de Strapi encontrados
         """
-        print(f"Buscando {len(image_urls)} imágenes ya subidas en Strapi...")
-        url_to_id_map = {}
+        batches = [names[i:i + LOOKUP_BATCH_SIZE] for i in range(0, len(names), LOOKUP_BATCH_SIZE)]
         
-        async with aiohttp.ClientSession() as session:
-            for url in image_urls:
-                # Extraer nombre de archivo de la URL para buscar coincidencias
-                filename = os.path.basename(url)
-                search_query = f"{STRAPI_URL}/api/upload/files?filters[name][$contains]={filename}"
-                
+        async def fetch_batch(session, batch: List[str]) -> List[Dict]:
+            files = []
+            start = 0
+            while True:
+                params = [('fields[0]', 'id'), ('fields[1]', 'name'), ('fields[2]', 'url'), ('fields[3]', 'size'),
+                          ('pagination[start]', str(start)), ('pagination[limit]', str(LOOKUP_PAGE_SIZE))]
+                params.extend((f'filters[name][$in][{i}]', name) for i, name in enumerate(batch))
                 try:
-                    async with session.get(search_query, headers=self.headers) as response:
+                    async with session.get(f"{STRAPI_URL}/api/upload/files", params=params, headers=self.headers) as response:
                         if response.status != 200:
-                            print(f"Error al buscar imagen {filename}: {response.status}")
-                            continue
-                        
-                        data = await response.json()
-                        if not data or len(data) == 0:
-                            continue
-                        
-                        # Buscar coincidencia exacta o similar
-                        for file_data in data:
-                            if 'url' in file_data and (file_data['url'] == url or filename in file_data['url']):
-                                url_to_id_map[url] = file_data['id']
-                                print(f"Imagen encontrada: {filename} -> ID: {file_data['id']}")
-                                break
+                            print(f"Error al buscar imágenes en Strapi: {response.status}")
+                            break
+                        page = await response.json()
                 except Exception as e:
-                    print(f"Error al buscar imagen {filename}: {str(e)}")
+                    print(f"Error al buscar imágenes en Strapi: {str(e)}")
+                    break
+                if isinstance(page, dict):
+                    page = page.get('data', [])
+                files.extend(page)
+                if len(page) < LOOKUP_PAGE_SIZE:
+                    break
+                start += LOOKUP_PAGE_SIZE
+            return files
+        
+        async with client_session() as session:
+            pages = await asyncio.gather(*[fetch_batch(session, batch) for batch in batches])
+        return [file_data for page in pages for file_data in page]
+    
+    async def find_uploaded_images(self, images: List, local_dir: str = None, chapter=None) -> Dict[str, int]:
+        """
+        Busca imágenes ya subidas en Strapi para evitar volver a subirlas.
+        
+        Primero se consulta el diario de subidas del manga y el índice local de
+        hashes con las copias descargadas en el directorio del capítulo, sin
+        peticiones de red. Las imágenes que no aparecen ahí se buscan por nombre
+        en Strapi con consultas por lotes, pero como nombres como 001.jpg se
+        repiten entre mangas y capítulos, un archivo solo se acepta si su
+        contenido coincide con la copia local (original o convertida a WebP).
+        Antes de descargar nada los candidatos se filtran por tamaño, y las
+        comprobaciones que quedan se hacen a la vez.
+        Solo esas coincidencias verificadas se añaden al índice de hashes.
+        
+        Args:
+            images: Lista de imágenes (diccionarios con 'url' y 'filename', o URLs)
+            local_dir: Directorio del capítulo con las imágenes descargadas
+            chapter: Número del capítulo, para consultar el diario de subidas
+            
+        Returns:
+            Diccionario que mapea URLs de imágenes a IDs de Strapi
+        """
+        print(f"Buscando {len(images)} imágenes ya subidas en Strapi...")
+        url_to_id_map = {}
+        pending = {}
+        journal = journal_for_chapter_dir(local_dir) if chapter is not None else None
+        
+        for img in images:
+            url = img['url'] if isinstance(img, dict) else img
+            filename = img.get('filename') if isinstance(img, dict) else None
+            filename = filename or os.path.basename(url)
+            recorded = journal.get_image(STRAPI_URL, chapter, filename) if journal else None
+            if recorded:
+                url_to_id_map[url] = recorded['id']
+                continue
+            local_path = os.path.join(local_dir, filename) if local_dir else None
+            digest = None
+            if local_path and os.path.isfile(local_path):
+                digest = library_index.page_hash(local_dir, filename)
+                existing = hash_index.get(STRAPI_URL, digest)
+                if existing:
+                    url_to_id_map[url] = existing['id']
+                    print(f"Imagen encontrada: {filename} -> ID: {existing['id']}")
+                    continue
+            pending[url] = (filename, digest)
+        
+        if pending:
+            # Nombres candidatos: el original y el que recibe tras convertirse a WebP
+            candidate_names = {}
+            for url, (filename, _) in pending.items():
+                stem = os.path.splitext(filename)[0]
+                candidate_names[url] = [filename, f"{stem}.webp"]
+            names = sorted({name for names in candidate_names.values() for name in names})
+            
+            files = await self._fetch_files_by_name(names)
+            files_by_name = {}
+            for file_data in files:
+                files_by_name.setdefault(file_data.get('name'), []).append(file_data)
+            
+            # Un nombre como 001.webp se repite entre mangas y capítulos: los
+            # candidatos se filtran por tamaño y solo los que quedan se descargan
+            # para comparar su contenido con la copia local
+            semaphore = asyncio.Semaphore(REBUILD_CONCURRENCY)
+            async with client_session() as session:
+                async def verify(url, filename, digest):
+                    matches = [match for name in candidate_names[url] for match in files_by_name.get(name, [])]
+                    if not matches or not digest:
+                        return
+                    local_path = os.path.join(local_dir, filename)
+                    found = await self._verify_candidates(session, semaphore, local_path, digest, matches)
+                    if found:
+                        file_data, digests = found
+                        url_to_id_map[url] = file_data['id']
+                        print(f"Imagen encontrada: {filename} -> ID: {file_data['id']}")
+                        # Contenido verificado: la subida puede reutilizarlo
+                        hash_index.add(STRAPI_URL, digests, file_data)
+                
+                await asyncio.gather(*[verify(url, filename, digest) for url, (filename, digest) in pending.items()])
+            hash_index.save()
         
         print(f"Se encontraron {len(url_to_id_map)} imágenes ya subidas")
         return url_to_id_map
     
+    async def _verify_candidates(self, session, semaphore, local_path: str, digest: str, matches: List[Dict]):
+        """
+        Busca entre los archivos de Strapi con el nombre de una página el que tiene su contenido.
+        
+        Solo se descargan los candidatos cuyo tamaño coincide con la copia local
+        o, para los .webp, con su versión convertida, que solo se genera si
+        algún .webp puede coincidir (la conversión nunca sube un archivo mayor
+        que el original).
+        
+        Returns:
+            (archivo de Strapi, hashes locales) o None si ninguno coincide
+        """
+        local_size = os.path.getsize(local_path)
+        is_webp = local_path.lower().endswith('.webp')
+        same_format = [m for m in matches if is_webp or not m.get('name', '').lower().endswith('.webp')]
+        # La versión convertida solo se sube si pesa menos que el original
+        converted = [m for m in matches if m not in same_format
+                     and (_size_kb(m) is None or _size_kb(m) <= local_size / 1000 + 0.01)]
+        
+        found = await self._first_with_digest(session, semaphore,
+                                              [m for m in same_format if _size_matches(m, local_size)], [digest])
+        if found or not converted:
+            return found
+        
+        with open(local_path, 'rb') as f:
+            content_type = guess_image_type(f.read(16), local_path)
+        upload_path, _ = await optimize_image(local_path, content_type)
+        if upload_path == local_path:
+            return None
+        try:
+            webp_size = os.path.getsize(upload_path)
+            webp_digest = sha256_file(upload_path)
+        finally:
+            os.remove(upload_path)
+        return await self._first_with_digest(session, semaphore,
+                                             [m for m in converted if _size_matches(m, webp_size)], [digest, webp_digest])
+    
+    async def _first_with_digest(self, session, semaphore, candidates: List[Dict], digests: List[str]):
+        """Descarga los candidatos a la vez y devuelve el primero cuyo contenido tiene uno de los hashes."""
+        remote = await asyncio.gather(*[hash_remote_file(session, STRAPI_URL, m, semaphore) for m in candidates])
+        for file_data, remote_digest in zip(candidates, remote):
+            if remote_digest in digests:
+                return file_data, digests
+        return None
+    
     async def prepare_episode_with_existing_images(self, episode_data: Dict, comic_id: str) -> Dict:
         """
         Prepara los datos del episodio utilizando imágenes existentes cuando sea posible.
@@ -108,27 +259,24 @@ class RetryUploader:
         
         if 'images' in episode_data and isinstance(episode_data['images'], list):
             # Buscar imágenes ya subidas
+            existing_images = await self.find_uploaded_images(episode_data['images'], episode_data.get('directory'), episode_data['episode'])
             image_urls = [img['url'] if isinstance(img, dict) else img for img in episode_data['images']]
-            existing_images = await self.find_uploaded_images(image_urls)
-            
-            # Preparar lista de imágenes para subir (las que no existen)
-            images_to_upload = []
-            for img in episode_data['images']:
-                url = img['url'] if isinstance(img, dict) else img
-                if url not in existing_images:
-                    images_to_upload.append(img)
-            
-            # Obtener IDs de imágenes existentes
-            image_ids = list(existing_images.values())
             
-            # Subir imágenes faltantes si es necesario
-            if images_to_upload:
-                print(f"Subiendo {len(images_to_upload)} imágenes faltantes...")
+            journal = journal_for_chapter_dir(episode_data.get('directory'))
+            if all(url in existing_images for url in image_urls):
+                # Todas las imágenes ya están en Strapi: no hace falta subir nada
+                image_ids = [existing_images[url] for url in image_urls]
+            else:
+                # Subir el capítulo completo; las imágenes ya subidas se reutilizan
+                # por su hash sin volver a enviarlas, conservando el orden de páginas
+                print(f"Subiendo {len(image_urls) - len(existing_images)} imágenes faltantes...")
                 uploaded_images = await self.image_uploader.upload_images(
-                    images_to_upload, 
+                    episode_data['images'], 
                     str(episode_data['episode']), 
                     as_media=True, 
-                    retries=3
+                    retries=3,
+                    local_dir=episode_data.get('directory'),
+                    journal=journal.chapter(episode_data['episode']) if journal else None
                 )
                 
                 # Verificar si hubo un error crítico durante la subida
@@ -136,7 +284,8 @@ class RetryUploader:
                     print(f"ERROR CRÍTICO: Falló la subida de imágenes para el episodio {episode_data['episode']}")
                     return {"error": "Falló la subida de imágenes para el episodio"}
                 
-                # Extraer IDs de las imágenes recién subidas
+                # Extraer IDs de las imágenes subidas
+                image_ids = []
                 for img in uploaded_images:
                     if isinstance(img, list) and len(img) > 0 and isinstance(img[0], dict) and 'id' in img[0]:
                         image_ids.append(img[0]['id'])
@@ -158,38 +307,51 @@ class RetryUploader:
         
         return normalized
     
-    async def retry_create_episode(self, document_id: str, episode_data: Dict) -> Dict:
+    async def prepare_retry_episode(self, document_id: str, episode_data: Dict) -> Dict:
         """
-        Reintenta crear un episodio utilizando imágenes existentes cuando sea posible.
+        Comprueba si el episodio ya existe y, si no, sube sus imágenes.
         
         Args:
             document_id: ID del documento del cómic
             episode_data: Datos del episodio a crear
             
         Returns:
-            Resultado de la creación del episodio
+            Datos normalizados del episodio, o un diccionario con 'status' o 'error'
         """
         episode_number = episode_data.get('episode', 0)
         if not episode_number and episode_number != 0:  # Permitir episodio 0
             print(f"Error: Datos del episodio sin número de episodio")
             return {"error": "Falta el número de episodio"}
         
-        # Verificar si el episodio ya existe
-        existing_episode = await self.episode_manager.get_episode_by_number(document_id, episode_number)
+        # Verificar si el episodio ya existe (primero en el diario, sin peticiones)
+        journal = journal_for_chapter_dir(episode_data.get('directory'))
+        existing_episode = (journal is not None and journal.has_episode(STRAPI_URL, document_id, episode_number)) \
+            or await self.episode_manager.episode_exists(document_id, episode_number)
         if existing_episode:
             print(f"El episodio {episode_number} ya existe, omitiendo...")
             return {"status": "existing", "message": f"El episodio {episode_number} ya existe"}
         
         # Preparar datos del episodio con imágenes existentes
-        normalized_data = await self.prepare_episode_with_existing_images(episode_data, document_id)
-        if "error" in normalized_data:
-            return normalized_data
+        return await self.prepare_episode_with_existing_images(episode_data, document_id)
+    
+    async def create_episode(self, document_id: str, episode_number, normalized_data: Dict, journal=None) -> Dict:
+        """
+        Crea un episodio con los datos ya preparados.
         
+        Args:
+            document_id: ID del documento del cómic
+            episode_number: Número del episodio
+            normalized_data: Datos devueltos por prepare_retry_episode
+            journal: Diario de subidas del manga donde registrar el episodio
+            
+        Returns:
+            Resultado de la creación del episodio
+        """
         # Asegurar que el número de episodio esté establecido
         normalized_data['episode'] = episode_number
         
         # Crear el episodio
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 print(f"Creando episodio {episode_number}...")
                 async with session.post(
@@ -204,10 +366,32 @@ class RetryUploader:
                     
                     result = await response.json()
                     print(f"Episodio {episode_number} creado exitosamente")
+                    self.episode_manager.mark_episode_created(document_id, episode_number, result)
+                    if journal is not None:
+                        data = result.get('data') if isinstance(result, dict) else None
+                        episode_id = data.get('id') if isinstance(data, dict) else None
+                        journal.record_episode(STRAPI_URL, document_id, episode_number, episode_id)
                     return result
             except Exception as e:
                 print(f"Error al crear episodio {episode_number}: {str(e)}")
                 return {"error": f"Error al crear episodio: {str(e)}"}
+    
+    async def retry_create_episode(self, document_id: str, episode_data: Dict) -> Dict:
+        """
+        Reintenta crear un episodio utilizando imágenes existentes cuando sea posible.
+        
+        Args:
+            document_id: ID del documento del cómic
+            episode_data: Datos del episodio a crear
+            
+        Returns:
+            Resultado de la creación del episodio
+        """
+        normalized_data = await self.prepare_retry_episode(document_id, episode_data)
+        if "error" in normalized_data or "status" in normalized_data:
+            return normalized_data
+        journal = journal_for_chapter_dir(episode_data.get('directory'))
+        return await self.create_episode(document_id, episode_data['episode'], normalized_data, journal)
 
 
 async def retry_upload_manga(manga_dir: str, failed_episodes: List[int] = None):
@@ -221,18 +405,14 @@ async def retry_upload_manga(manga_dir: str, failed_episodes: List[int] = None):
     manga_name = os.path.basename(manga_dir)
     print(f"\nReintentando subida del manga: {manga_name}")
     
-    # Buscar todos los directorios de capítulos
-    chapter_dirs = [d for d in os.listdir(manga_dir) 
-                   if os.path.isdir(os.path.join(manga_dir, d)) and d.startswith("capitulo_")]
+    # Capítulos del índice de la biblioteca, ya ordenados por número
+    episodes = library_index.get_episodes(manga_dir)
     
-    if not chapter_dirs:
+    if not episodes:
         print(f"No se encontraron capítulos para {manga_name}")
         return
     
-    # Ordenar capítulos por número
-    chapter_dirs.sort(key=lambda x: float(x.split('_')[1]) if x.split('_')[1].replace('.', '', 1).isdigit() else 0)
-    
-    print(f"Se encontraron {len(chapter_dirs)} capítulos")
+    print(f"Se encontraron {len(episodes)} capítulos")
     
     # Datos del cómic para Strapi
     comic_data = {
@@ -263,55 +443,13 @@ async def retry_upload_manga(manga_dir: str, failed_episodes: List[int] = None):
             print(f"Error al crear el cómic: {str(e)}")
             return
     
-    comic_id = existing_comic['id']
-    print(f"Usando cómic existente con ID: {comic_id}")
-    
-    # Lista para almacenar datos de episodios
-    episodes = []
-    
-    # Procesar cada capítulo
-    for chapter_dir_name in chapter_dirs:
-        chapter_dir = os.path.join(manga_dir, chapter_dir_name)
-        meta_file = os.path.join(chapter_dir, 'meta.json')
-        
-        if not os.path.exists(meta_file):
-            print(f"No se encontró meta.json en {chapter_dir}")
-            continue
-        
-        # Cargar metadatos del capítulo
-        try:
-            with open(meta_file, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-            
-            # Extraer información del capítulo
-            chapter_number = metadata.get('chapter_number')
-            if chapter_number is None:
-                # Intentar extraer del nombre del directorio
-                try:
-                    chapter_number = float(chapter_dir_name.split('_')[1])
-                    if chapter_number.is_integer():
-                        chapter_number = int(chapter_number)
-                except:
-                    print(f"No se pudo determinar el número de capítulo para {chapter_dir}")
-                    continue
-            
-            # Crear datos del episodio
-            episode_data = {
-                'episode': chapter_number,
-                'images': metadata.get('images', []),
-            }
-            episodes.append(episode_data)
-            print(f"  - Capítulo {chapter_number} procesado")
-            
-        except Exception as e:
-            print(f"Error al procesar {meta_file}: {str(e)}")
-    
-    if not episodes:
-        print(f"No se pudieron procesar capítulos para {manga_name}")
+    # El diario y el índice de la biblioteca registran los episodios por el
+    # documentId del cómic, igual que strapi/save.py
+    document_id = existing_comic.get('documentId')
+    if not document_id:
+        print(f"Error: No se pudo obtener el documentId del cómic {manga_name}")
         return
-    
-    # Ordenar episodios por número
-    episodes.sort(key=lambda x: x['episode'])
+    print(f"Usando cómic existente con ID: {existing_comic.get('id')} (documentId: {document_id})")
     
     # Verificar episodios existentes en Strapi y filtrar solo los que necesitan reintento
     retry_uploader = RetryUploader()
@@ -325,18 +463,21 @@ async def retry_upload_manga(manga_dir: str, failed_episodes: List[int] = None):
         print(f"No hay episodios para reintentar en {manga_name}")
         return
     
-    # Reintentar crear cada episodio
-    results = []
-    for episode_data in episodes:
+    async def prepare(episode_data: Dict) -> Dict:
         print(f"\nReintentando subida del episodio {episode_data['episode']}...")
-        result = await retry_uploader.retry_create_episode(comic_id, episode_data)
-        results.append({
-            'episode': episode_data['episode'],
-            'result': result
-        })
-        
-        # Pausa breve entre episodios para no sobrecargar la API
-        await asyncio.sleep(1)
+        return await retry_uploader.prepare_retry_episode(document_id, episode_data)
+    
+    async def create(episode_data: Dict, normalized_data: Dict) -> Dict:
+        journal = journal_for_chapter_dir(episode_data.get('directory'))
+        return await retry_uploader.create_episode(document_id, episode_data['episode'], normalized_data, journal)
+    
+    # Reintentar crear cada episodio: las imágenes de los siguientes capítulos se
+    # suben mientras se crean los anteriores, siempre en orden de capítulo
+    pipeline_results = await run_episode_pipeline(episodes, prepare, create, stop_on_error=False)
+    results = [
+        {'episode': episode_data['episode'], 'result': result}
+        for episode_data, result in pipeline_results
+    ]
     
     # Mostrar resumen de resultados
     print(f"\nResumen de resultados para {manga_name}:")
@@ -388,8 +529,9 @@ async def main():
             print("Error: Los números de episodio deben ser enteros separados por comas")
             return
     
-    # Ejecutar el reintento de subida
-    await retry_upload_manga(manga_path, failed_episodes)
+    # Ejecutar el reintento de subida compartiendo una única sesión HTTP
+    async with StrapiSession():
+        await retry_upload_manga(manga_path, failed_episodes)
 
 
 if __name__ == "__main__":
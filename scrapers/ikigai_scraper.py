@@ -13,6 +13,7 @@ import time
 # Importar utilidades comunes
 from utils.file_utils import create_directories, sanitize_filename, create_manga_directory
 from utils.file_utils import create_chapter_directory, save_metadata, download_image
+from utils.http_utils import get_session, rate_limited_get, rate_limiter
 
 def scrape_ikigai(url, download_images=True):
     """
@@ -52,45 +53,34 @@ def scrape_ikigai(url, download_images=True):
             'Pragma': 'no-cache'
         }
         
-        # Crear una sesión para mantener cookies y otros estados
-        session = requests.Session()
-        session.headers.update(headers)
+        # Sesión con las cabeceras del sitio sobre el pool de conexiones compartido
+        session = get_session(headers)
         
-        # Intentar obtener la página con reintentos y delays para evitar bloqueos
+        # Intentar obtener la página con reintentos; el limitador por host
+        # aplica el retroceso entre intentos
         max_retries = 3
-        retry_delay = 2
         
         for retry in range(max_retries):
             try:
                 # Primero, visitar la página principal para obtener cookies
                 print(f"Visitando la página principal de {base_url} para obtener cookies...")
-                session.get(base_url, timeout=10)
+                rate_limited_get(session, base_url, timeout=10)
                 
                 # Luego intentar acceder a la URL del capítulo
                 print(f"Intentando acceder a {url} (intento {retry+1}/{max_retries})...")
-                response = session.get(url, timeout=10)
+                response = rate_limited_get(session, url, timeout=10)
                 
                 if response.status_code == 200:
                     print("Acceso exitoso a la página.")
                     break
                 elif response.status_code == 403:
                     print(f"Error 403 Forbidden al acceder a la URL (intento {retry+1}/{max_retries})")
-                    if retry < max_retries - 1:
-                        wait_time = retry_delay * (retry + 1)
-                        print(f"Esperando {wait_time} segundos antes de reintentar...")
-                        time.sleep(wait_time)
+                    # Tratar el bloqueo como una petición de bajar el ritmo
+                    rate_limiter.bucket(url).backoff()
                 else:
                     print(f"Error al acceder a la URL: {response.status_code} (intento {retry+1}/{max_retries})")
-                    if retry < max_retries - 1:
-                        wait_time = retry_delay * (retry + 1)
-                        print(f"Esperando {wait_time} segundos antes de reintentar...")
-                        time.sleep(wait_time)
             except Exception as e:
                 print(f"Error de conexión (intento {retry+1}/{max_retries}): {str(e)}")
-                if retry < max_retries - 1:
-                    wait_time = retry_delay * (retry + 1)
-                    print(f"Esperando {wait_time} segundos antes de reintentar...")
-                    time.sleep(wait_time)
         
         # Verificar si después de los reintentos se pudo acceder a la página
         if not hasattr(response, 'status_code') or response.status_code != 200:
@@ -279,6 +269,9 @@ def scrape_ikigai_consecutive(initial_url, download_images=True, num_chapters='t
         initial_url: URL del capítulo inicial
         download_images: Si es True, descarga las imágenes de los capítulos
         num_chapters: Número de capítulos a descargar o 'todos' para descargar todos los disponibles
+
+    Returns:
+        int: Número de capítulos descargados
     """
     current_url = initial_url
     chapters_downloaded = 0
@@ -293,7 +286,7 @@ def scrape_ikigai_consecutive(initial_url, download_images=True, num_chapters='t
     
     if not chapter_info:
         print("No se pudo obtener información del capítulo.")
-        return
+        return chapters_downloaded
     
     chapters_downloaded += 1
     
@@ -301,7 +294,7 @@ def scrape_ikigai_consecutive(initial_url, download_images=True, num_chapters='t
     if not chapter_info.get('next_chapter_url'):
         print("No hay capítulo siguiente disponible.")
         print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
-        return
+        return chapters_downloaded
     
     # Descargar capítulos consecutivos
     while chapters_downloaded < max_chapters and chapter_info and chapter_info.get('next_chapter_url'):
@@ -318,9 +311,6 @@ def scrape_ikigai_consecutive(initial_url, download_images=True, num_chapters='t
         
         print(f"\n=== Procesando capítulo siguiente ({chapters_downloaded + 1}/{max_chapters if max_chapters != float('inf') else 'todos'}): {current_url} ===")
         
-        # Añadir una pequeña pausa para no sobrecargar el servidor
-        time.sleep(1.5)
-        
         chapter_info = scrape_ikigai(current_url, download_images)
         
         if not chapter_info:
@@ -333,4 +323,5 @@ def scrape_ikigai_consecutive(initial_url, download_images=True, num_chapters='t
             print("No hay más capítulos disponibles.")
             break
     
-    print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
\ No newline at end of file
+    print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
+    return chapters_downloaded
@@ -10,25 +10,86 @@ import time
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 
-from utils.http_utils import create_session, get_page_content
+from utils.http_utils import get_session, get_page_content
+from utils.chapter_index import chapter_index
 from utils.file_utils import (
-    create_chapter_directory, save_metadata, download_image, sanitize_filename
+    create_chapter_directory, save_metadata, sanitize_filename
 )
+from utils.download_utils import download_chapter_images, download_following_chapters
 
-def get_inmanga_chapters(url):
+def parse_chapter_options(soup, url):
+    """
+    Construye el índice de capítulos a partir del desplegable de capítulos.
+
+    El desplegable aparece tanto en la página del manga como en la de cada
+    capítulo, así que el índice completo se obtiene sin peticiones extra.
+
+    Args:
+        soup: Página parseada con BeautifulSoup
+        url: URL de la página (para resolver URLs relativas)
+
+    Returns:
+        list: Capítulos con su número, URL, título e ID, ordenados por número
+    """
+    chapter_options = soup.select("select.ChapterListClass option")
+    
+    manga_friendly_name = None
+    manga_friendly_name_input = soup.select_one("input#FriendlyMangaName")
+    if manga_friendly_name_input:
+        manga_friendly_name = manga_friendly_name_input.get('value')
+    
+    chapters = []
+    for option in chapter_options:
+        chapter_id = option.get('value')
+        chapter_num_text = option.text.strip()
+        
+        try:
+            # Convertir el número de capítulo a float o int según corresponda
+            chapter_num = float(chapter_num_text)
+            if chapter_num.is_integer():
+                chapter_num = int(chapter_num)
+        except ValueError:
+            # Si no se puede convertir, usar un contador
+            chapter_num = 0
+        
+        # Construir la URL del capítulo
+        chapter_url = f"/ver/manga/{manga_friendly_name}/{chapter_num_text}/{chapter_id}"
+        chapter_url = urljoin(url, chapter_url)
+        
+        # Añadir a la lista de capítulos
+        chapters.append({
+            'number': chapter_num,
+            'url': chapter_url,
+            'title': f"Capítulo {chapter_num_text}",
+            'id': chapter_id
+        })
+    
+    # Ordenar por número de capítulo
+    chapters.sort(key=lambda x: x['number'])
+    return chapters
+
+def get_inmanga_chapters(url, refresh=False):
     """
     Obtiene la lista de capítulos de un manga en intomanga.com
     
+    El índice se guarda por serie (utils.chapter_index) y solo se consulta el
+    sitio cuando ha caducado o se pide refrescarlo.
+    
     Args:
         url: URL principal del manga
+        refresh: Si es True, vuelve a obtener el índice completo del sitio
         
     Returns:
         list: Lista de capítulos con su número, URL y título,
               o None si no se pudieron obtener
     """
+    return chapter_index.get_chapters('inmanga', url, _fetch_inmanga_chapters, refresh)
+
+def _fetch_inmanga_chapters(url):
+    """Obtiene la lista de capítulos directamente de la página del manga."""
     try:
-        # Crear sesión HTTP
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener la página del manga
         print(f"Obteniendo información del manga desde {url}...")
@@ -46,56 +107,11 @@ def get_inmanga_chapters(url):
             print(f"Manga encontrado: {manga_title}")
         
         # Buscar todos los enlaces a capítulos
-        chapters = []
-        chapter_options = soup.select("select.ChapterListClass option")
+        chapters = parse_chapter_options(soup, url)
         
-        if not chapter_options:
+        if not chapters:
             print("No se encontraron enlaces a capítulos en la página.")
             return None
-            
-        print(f"Se encontraron {len(chapter_options)} posibles enlaces a capítulos.")
-        
-        # Extraer información base del manga
-        manga_id = None
-        manga_friendly_name = None
-        
-        # Intentar obtener el ID del manga y su nombre amigable
-        manga_id_input = soup.select_one("input#MangaIdentification")
-        if manga_id_input:
-            manga_id = manga_id_input.get('value')
-            
-        manga_friendly_name_input = soup.select_one("input#FriendlyMangaName")
-        if manga_friendly_name_input:
-            manga_friendly_name = manga_friendly_name_input.get('value')
-        
-        # Procesar cada opción de capítulo
-        for option in chapter_options:
-            chapter_id = option.get('value')
-            chapter_num_text = option.text.strip()
-            
-            try:
-                # Convertir el número de capítulo a float o int según corresponda
-                chapter_num = float(chapter_num_text)
-                if chapter_num.is_integer():
-                    chapter_num = int(chapter_num)
-            except ValueError:
-                # Si no se puede convertir, usar un contador
-                chapter_num = 0
-            
-            # Construir la URL del capítulo
-            chapter_url = f"/ver/manga/{manga_friendly_name}/{chapter_num_text}/{chapter_id}"
-            chapter_url = urljoin(url, chapter_url)
-            
-            # Añadir a la lista de capítulos
-            chapters.append({
-                'number': chapter_num,
-                'url': chapter_url,
-                'title': f"Capítulo {chapter_num_text}",
-                'id': chapter_id
-            })
-            
-        # Ordenar por número de capítulo
-        chapters.sort(key=lambda x: x['number'])
         
         print(f"Total de capítulos procesados: {len(chapters)}")
         return chapters
@@ -118,8 +134,8 @@ def scrape_inmanga(url, download_images=True):
         dict: Información del capítulo descargado, o None si hubo un error
     """
     try:
-        # Crear sesión HTTP
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener la página del capítulo
         print(f"Descargando contenido de {url}...")
@@ -274,21 +290,17 @@ def scrape_inmanga(url, download_images=True):
             chapter_dir = create_chapter_directory(manga_title, chapter_number, chapter_info['chapter_title'])
             save_metadata(chapter_dir, chapter_info)
             
-            # Descargar cada imagen
-            for i, img_url in enumerate(images, 1):
-                img_filename = f"{i:03d}.jpg"
-                img_path = f"{chapter_dir}/{img_filename}"
-                
-                print(f"Descargando imagen {i}/{len(images)}: {img_url}")
-                success = download_image(session, img_url, img_path)
-                
-                if not success:
-                    print(f"Error al descargar la imagen {i}")
-                
-                # Pequeña pausa para evitar sobrecarga del servidor
-                time.sleep(0.5)
+            # Descargar las imágenes de forma concurrente
+            page_images = [
+                {'url': img_url, 'number': i, 'filename': f"{i:03d}.jpg"}
+                for i, img_url in enumerate(images, 1)
+            ]
+            download_chapter_images(session, page_images, chapter_dir)
                 
             print(f"Capítulo descargado en: {chapter_dir}")
+        
+        # El desplegable es el índice completo de la serie (no se guarda en meta.json)
+        chapter_info['chapters'] = parse_chapter_options(soup, url)
             
         return chapter_info
             
@@ -324,20 +336,27 @@ def scrape_inmanga_consecutive(initial_url, download_images=True, num_chapters='
     
     chapters_downloaded += 1
     
+    # Con el índice de la serie, el resto del rango se descarga en paralelo
+    if max_chapters > 1:
+        downloaded = download_following_chapters(scrape_inmanga, chapter_info, current_url,
+                                                 chapter_info.get('chapters'), download_images,
+                                                 max_chapters - 1)
+        if downloaded is not None:
+            chapters_downloaded += len(downloaded)
+            print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
+            return chapters_downloaded
+    
     # Verificar si hay capítulo siguiente
     if not chapter_info.get('next_chapter_url'):
         print("No hay capítulo siguiente disponible.")
         print(f"\n=== Proceso completado. Se descargaron {chapters_downloaded} capítulos. ===")
         return chapters_downloaded
     
-    # Descargar capítulos consecutivos
+    # Sin índice: seguir los enlaces "siguiente" de uno en uno
     while chapters_downloaded < max_chapters and chapter_info and chapter_info.get('next_chapter_url'):
         current_url = chapter_info['next_chapter_url']
         print(f"\n=== Procesando capítulo siguiente ({chapters_downloaded + 1}/{max_chapters if max_chapters != float('inf') else 'todos'}): {current_url} ===")
         
-        # Añadir una pequeña pausa para no sobrecargar el servidor
-        time.sleep(1.5)
-        
         chapter_info = scrape_inmanga(current_url, download_images)
         
         if not chapter_info:
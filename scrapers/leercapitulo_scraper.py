@@ -10,25 +10,35 @@ import time
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 
-from utils.http_utils import create_session, get_page_content
+from utils.http_utils import get_session, get_page_content
+from utils.chapter_index import chapter_index
 from utils.file_utils import (
     create_chapter_directory, save_metadata, download_image, sanitize_filename
 )
+from utils.download_utils import download_following_chapters
 
-def get_leercapitulo_chapters(url):
+def get_leercapitulo_chapters(url, refresh=False):
     """
     Obtiene la lista de capítulos de un manga en leercapitulo.co
     
+    El índice se guarda por serie (utils.chapter_index) y solo se consulta el
+    sitio cuando ha caducado o se pide refrescarlo.
+    
     Args:
         url: URL principal del manga
+        refresh: Si es True, vuelve a obtener el índice completo del sitio
         
     Returns:
         list: Lista de capítulos con su número, URL y título,
               o None si no se pudieron obtener
     """
+    return chapter_index.get_chapters('leercapitulo', url, _fetch_leercapitulo_chapters, refresh)
+
+def _fetch_leercapitulo_chapters(url):
+    """Obtiene la lista de capítulos directamente de la página del manga."""
     try:
-        # Crear sesión HTTP
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener la página del manga
         print(f"Obteniendo información del manga desde {url}...")
@@ -149,9 +159,8 @@ def scrape_leercapitulo(url, download_images=True):
             'Pragma': 'no-cache'
         }
         
-        # Crear una sesión para mantener cookies y otros estados
-        session = create_session()
-        session.headers.update(headers)
+        # Sesión con las cabeceras del sitio sobre el pool de conexiones compartido
+        session = get_session(headers)
         
         # Obtener la página del capítulo con múltiples intentos para asegurar la carga completa
         print(f"Descargando contenido de {url}...")
@@ -180,12 +189,7 @@ def scrape_leercapitulo(url, download_images=True):
                     print("Se encontró un número suficiente de imágenes.")
                     break
                     
-                # Esperar un tiempo para que se carguen más imágenes
-                wait_time = 2 * attempt  # Aumentar el tiempo de espera en cada intento
-                print(f"Esperando {wait_time} segundos para la carga de imágenes...")
-                time.sleep(wait_time)
-                
-                # Volver a cargar la página
+                # Volver a cargar la página (el limitador por host espaciará las peticiones)
                 soup, response = get_page_content(session, url)
                 if not soup:
                     print("Error al recargar la página.")
@@ -338,6 +342,17 @@ def scrape_leercapitulo(url, download_images=True):
         if next_chapter_url == url:
             next_chapter_url = None
         
+        # Página del manga, para obtener el índice de capítulos: se toma del
+        # enlace del título o se deriva de la URL (/leer/<id>/<slug>/<n>/)
+        manga_url = None
+        manga_link = soup.select_one("div.container_title h2.chapter-title a[href], a.manga-name[href]")
+        if manga_link and '/manga/' in manga_link['href']:
+            manga_url = urljoin(url, manga_link['href'])
+        else:
+            slug_match = re.search(r'/leer/([^/]+)/([^/]+)/', url)
+            if slug_match:
+                manga_url = urljoin(url, f"/manga/{slug_match.group(1)}/{slug_match.group(2)}/")
+        
         # Buscar imágenes del capítulo - usando múltiples estrategias como en ikigai_scraper
         image_elements = []
         
@@ -352,8 +367,6 @@ def scrape_leercapitulo(url, download_images=True):
             # Verificar si todas las imágenes ya están cargadas
             if img_containers:
                 print(f"Se encontraron {len(img_containers)} imágenes ya cargadas en la página")
-                # Esperar un momento para asegurar que todas las imágenes se hayan cargado
-                time.sleep(2)
                 
                 # Volver a obtener la página para asegurarnos de tener todas las imágenes
                 print("Recargando la página para obtener todas las imágenes...")
@@ -470,6 +483,7 @@ def scrape_leercapitulo(url, download_images=True):
             "chapter_title": chapter_title,
             "next_chapter_url": next_chapter_url,
             "prev_chapter_url": prev_chapter_url,
+            "manga_url": manga_url,
             "source_url": url,
             "downloaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
             **result
@@ -527,13 +541,21 @@ def scrape_leercapitulo_consecutive(url, download_images=True, num_chapters='1')
             downloaded_chapters.append(chapter_info)
             chapters_downloaded += 1
             
+            # Tras el primer capítulo, si se conoce el índice del manga, el
+            # resto del rango se descarga en paralelo
+            if chapters_downloaded == 1 and max_chapters > 1 and chapter_info.get('manga_url'):
+                index = get_leercapitulo_chapters(chapter_info['manga_url'])
+                following = download_following_chapters(scrape_leercapitulo, chapter_info, current_url, index,
+                                                        download_images, max_chapters - 1)
+                if following is not None:
+                    downloaded_chapters.extend(following)
+                    chapters_downloaded += len(following)
+                    break
+            
             # Verificar si hay un capítulo siguiente
             if 'next_chapter_url' in chapter_info:
                 current_url = chapter_info['next_chapter_url']
                 print(f"Siguiente capítulo: {current_url}")
-                
-                # Pequeña pausa para evitar sobrecarga del servidor
-                time.sleep(1.5)
             else:
                 print("No hay más capítulos disponibles.")
                 break
@@ -13,67 +13,215 @@ import os
 import asyncio
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
 
 
 
 # Importar utilidades goto
 from utils.file_utils import create_chapter_directory, save_metadata, download_image, sanitize_filename
-from utils.http_utils import create_session
+from utils.http_utils import get_session, get_page_content
+from utils.browser_pool import browser_pool
+from utils.chapter_index import chapter_index
+
+# Esperas de la extracción de capítulos (milisegundos)
+NAVIGATION_TIMEOUT = 30000
+CHAPTER_LIST_TIMEOUT = 15000
+# Enlaces de la lista de capítulos de la página del manga
+CHAPTER_LIST_SELECTOR = "ul li a[href] em"
+# Claves con las que el JSON del sitio puede nombrar el número y el enlace de un capítulo
+JSON_NUMBER_KEYS = ('number', 'chapter_number', 'numero', 'num', 'chapter')
+JSON_URL_KEYS = ('url', 'href', 'link', 'permalink')
+
+def _chapter_from_json(entry, manga_url):
+    """Convierte un objeto JSON con aspecto de capítulo al formato de la lista, o None."""
+    number = next((entry[key] for key in JSON_NUMBER_KEYS if key in entry), None)
+    try:
+        number = float(str(number).replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+    
+    chapter_url = next((entry[key] for key in JSON_URL_KEYS if isinstance(entry.get(key), str)), None)
+    if not chapter_url and isinstance(entry.get('slug'), str):
+        chapter_url = f"{manga_url}/{entry['slug']}"
+    if not chapter_url:
+        return None
+    
+    # Los capítulos cuelgan de la URL del manga; así se descartan listas de
+    # otras series (recomendados, populares...)
+    chapter_url = urljoin(manga_url + '/', chapter_url)
+    if not chapter_url.startswith(manga_url + '/'):
+        return None
+    
+    title = entry.get('title') or entry.get('name') or f"Capítulo {number:g}"
+    return {
+        'number': number,
+        'url': chapter_url,
+        'title': str(title).strip()
+    }
+
+def chapters_from_json(data, manga_url):
+    """
+    Busca en una respuesta JSON la lista de capítulos del manga.
+    
+    Se recorre el documento buscando listas cuyos elementos sean en su
+    mayoría objetos con número y enlace de capítulo.
+    
+    Args:
+        data: JSON ya decodificado
+        manga_url: URL principal del manga (para resolver enlaces relativos)
+        
+    Returns:
+        list: Capítulos encontrados (vacía si no hay ninguno)
+    """
+    found = []
+    pending = [data]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, dict):
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            chapters = [_chapter_from_json(entry, manga_url) for entry in item if isinstance(entry, dict)]
+            chapters = [chapter for chapter in chapters if chapter]
+            if chapters and len(chapters) * 2 >= len(item):
+                found.extend(chapters)
+            else:
+                pending.extend(item)
+    return found
+
+def get_chapters_http(url):
+    """
+    Obtiene la lista de capítulos con una petición HTTP normal, sin navegador.
+    
+    Se usa el JSON embebido en la página del manga o, si no lo hay, los
+    enlaces a capítulos del HTML. Si el paginador indica que la lista tiene
+    más de una página, el HTML no trae todos los capítulos y se devuelve None
+    para que se use el navegador.
+    
+    Args:
+        url: URL principal del manga en m440.in
+        
+    Returns:
+        list: Capítulos ordenados por número, o None si no se pudieron obtener
+    """
+    try:
+        soup, _ = get_page_content(get_session(), url, retry_count=2)
+        if not soup:
+            return None
+        
+        paginator = soup.select_one("ul > pag")
+        page_count = re.search(r'/\s*(\d+)', paginator.get_text()) if paginator else None
+        if page_count and int(page_count.group(1)) > 1:
+            print(f"La lista de capítulos está paginada ({page_count.group(1)} páginas)")
+            return None
+        
+        chapters = []
+        for script in soup.select('script[type="application/json"], script[type="application/ld+json"]'):
+            try:
+                data = json.loads(script.string or '')
+            except ValueError:
+                continue
+            chapters.extend(chapters_from_json(data, url))
+        
+        if not chapters:
+            manga_slug = url.rstrip('/').split('/')[-1]
+            links = [
+                link for link in soup.select(f'a[href*="/manga/{manga_slug}/"]')
+                if re.search(r'/\d+(?:\.\d+)?-[^/]+/?$', link['href'])
+            ]
+            chapters = process_chapter_links(links, url)
+        
+        unique_chapters = {}
+        for chapter in chapters:
+            if chapter['number'] >= 0 and chapter['url'] not in unique_chapters:
+                chapter['number'] = float(chapter['number'])
+                unique_chapters[chapter['url']] = chapter
+        
+        if not unique_chapters:
+            return None
+        return sorted(unique_chapters.values(), key=lambda x: x['number'])
+    
+    except Exception as e:
+        print(f"Error al obtener la lista de capítulos por HTTP: {str(e)}")
+        return None
+
+async def _chapters_from_responses(responses, manga_url):
+    """Extrae los capítulos de las respuestas JSON capturadas durante la carga."""
+    chapters = []
+    for response in responses:
+        try:
+            data = await response.json()
+        except Exception:
+            continue
+        chapters.extend(chapters_from_json(data, manga_url))
+    return chapters
 
 async def get_chapters(url):
     """
     Obtiene la lista de capítulos de un manga en m440.in utilizando Playwright.
     
+    La lista se toma del índice guardado de la serie mientras no caduque.
+    Para consultar el sitio, primero se intenta sin navegador
+    (get_chapters_http); si la página no trae la lista completa, se usa una
+    página del navegador compartido (utils.browser_pool), que se inicia una
+    sola vez por proceso y no descarga imágenes, fuentes ni CSS.
+    
     Args:
         url: URL principal del manga en m440.in (ejemplo: https://m440.in/manga/the-return-of-the-disasterclass-hero)
         
     Returns:
         list: Lista de capítulos con su número, URL y título, ordenados por número
     """
+    return await asyncio.to_thread(get_m440_chapters, url)
+
+def _normalize_manga_url(url):
+    """Devuelve la URL principal del manga aunque se indique la de un capítulo, o None."""
+    if '/capitulo/' in url or re.search(r'/\d+-[a-zA-Z0-9]+(?:/\d+)?$', url):
+        base_match = re.search(r'(https://m440\.in/manga/[^/]+)', url)
+        if base_match:
+            print(f"URL ajustada a: {base_match.group(1)}")
+            return base_match.group(1)
+        print("La URL proporcionada parece ser de un capítulo específico. Por favor, usa la URL principal del manga.")
+        return None
+    return url.rstrip('/')
+
+def _fetch_m440_chapters(url):
+    """Obtiene la lista de capítulos del sitio (HTTP y, si falla, navegador)."""
+    return browser_pool.run(_get_chapters(url))
+
+async def _get_chapters(url):
+    """Implementación de la consulta al sitio; se ejecuta en el bucle del pool de navegador."""
     try:
-        # Verificar que la URL sea la principal del manga
-        if '/capitulo/' in url or re.search(r'/\d+-[a-zA-Z0-9]+(?:/\d+)?$', url):
-            base_match = re.search(r'(https://m440\.in/manga/[^/]+)', url)
-            if base_match:
-                url = base_match.group(1)
-                print(f"URL ajustada a: {url}")
-            else:
-                print("La URL proporcionada parece ser de un capítulo específico. Por favor, usa la URL principal del manga.")
-                return None
-        
         # Extraer el slug del manga
         manga_slug = url.split("/")[-1]
         print(f"Procesando manga: {manga_slug}")
         
-        # Verificar si existe un archivo capitulos.json para esta URL
-        json_filename = "capitulos.json"
-        if os.path.exists(json_filename):
-            try:
-                with open(json_filename, 'r', encoding='utf-8') as f:
-                    chapters_data = json.load(f)
-                
-                # Verificar si ya tenemos datos para esta URL
-                if url in chapters_data and chapters_data[url]:
-                    print(f"Usando datos guardados para el manga {manga_slug}")
-                    return chapters_data[url]
-            except Exception as e:
-                print(f"Error al cargar datos guardados: {str(e)}")
+        # Primero sin navegador: una petición HTTP a la página del manga
+        chapters = await asyncio.to_thread(get_chapters_http, url)
+        if chapters:
+            print(f"Se encontraron {len(chapters)} capítulos sin usar el navegador")
+            return chapters
         
-        print(f"Iniciando navegador para acceder a {url}...")
-        async with async_playwright() as p:
-            # Iniciar navegador en modo headless
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                viewport={"width": 1920, "height": 1080},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-            )
+        print(f"Usando el navegador para acceder a {url}...")
+        async with browser_pool.page() as page:
+            # Guardar las respuestas JSON que la página pida mientras carga
+            json_responses = []
             
-            page = await context.new_page()
-            print(f"Navegando a {url}...")
-            await page.goto(url, wait_until="networkidle", timeout=60000)
-            await page.wait_for_timeout(2000)  # Espera 2 segundos tras cargar
-            print("Página cargada completamente")
+            def capture_response(response):
+                if response.request.resource_type in ('xhr', 'fetch') and 'json' in response.headers.get('content-type', ''):
+                    json_responses.append(response)
+            
+            page.on("response", capture_response)
+            try:
+                print(f"Navegando a {url}...")
+                await page.goto(url, wait_until="domcontentloaded", timeout=NAVIGATION_TIMEOUT)
+                try:
+                    # Esperar solo a que aparezca la lista de capítulos
+                    await page.wait_for_selector(CHAPTER_LIST_SELECTOR, timeout=CHAPTER_LIST_TIMEOUT)
+                    print("Lista de capítulos cargada")
+                except TimeoutError:
+                    print("La lista de capítulos no apareció a tiempo; se analiza la página tal como está")
+            finally:
+                page.remove_listener("response", capture_response)
             
             # Obtener información del manga
             manga_title = await page.evaluate("() => { const el = document.querySelector('h2.element-subtitle, h2.widget-title'); return el ? el.innerText.trim() : null; }")
@@ -83,89 +231,105 @@ async def get_chapters(url):
             
             print(f"Título del manga: {manga_title}")
             
-            # Método optimizado: Extraer directamente los capítulos del DOM usando el selector específico
-            print("Extrayendo capítulos directamente del DOM...")
-            chapters_data = await page.evaluate("""
-                () => {
-                    // solicitar todos los capitulos
-                    try {
-                    const btnOnClickX = Number(document.querySelector("ul>pag").textContent.split(" / ")[1])
-                    for(let xy=0; xy<btnOnClickX;xy++) {
-                        document.querySelector("ul>pag").click()
-                    }
-                    } catch {
-                        console.log("Error")
-                    }
+            # Método 0: capítulos de las respuestas JSON (XHR/fetch) que la propia
+            # página pide al cargar, sin recorrer el paginador del DOM. Solo se
+            # capturan las respuestas previas a la lista, así que con un paginador
+            # "1 / N" el JSON puede cubrir solo la primera página
+            page_count = await page.evaluate("() => { const el = document.querySelector('ul>pag'); return el ? Number(el.textContent.split(' / ')[1]) || 1 : 1; }")
+            json_chapters = await _chapters_from_responses(json_responses, url)
+            chapters = []
+            if json_chapters and page_count <= 1:
+                chapters = json_chapters
+                print(f"Se encontraron {len(chapters)} capítulos en las respuestas JSON del sitio")
+            elif json_chapters:
+                print(f"El JSON del sitio tiene {len(json_chapters)} capítulos pero la lista tiene {page_count} páginas; se recorre el paginador")
+            
+            # Método optimizado: si no hubo JSON, extraer los capítulos del DOM usando el selector específico
+            if not chapters:
+                print("Extrayendo capítulos directamente del DOM...")
+                chapters_data = await page.evaluate("""
+                    () => {
+                        // solicitar todos los capitulos
+                        try {
+                        const btnOnClickX = Number(document.querySelector("ul>pag").textContent.split(" / ")[1])
+                        for(let xy=0; xy<btnOnClickX;xy++) {
+                            document.querySelector("ul>pag").click()
+                        }
+                        } catch {
+                            console.log("Error")
+                        }
 
 
-                    // Obtener la lista de capítulos usando el selector específico (div>ul)[2]
-                    const chapterList = document.querySelectorAll("div>ul")[2];
+                        // Obtener la lista de capítulos usando el selector específico (div>ul)[2]
+                        const chapterList = document.querySelectorAll("div>ul")[2];
 
-                    if (!chapterList) return [];
-                    
-                    // Obtener todos los elementos li que contienen los capítulos
-                    const chapterItems = chapterList.querySelectorAll("li");
-                    const chapters = [];
-                    
-                    // Extraer información de cada capítulo
-                    for (const item of chapterItems) {
-                        // Buscar el enlace y el elemento em dentro del li
-                        const link = item.querySelector("a");
-                        const em = link ? link.querySelector("em") : null;
+                        if (!chapterList) return [];
+                        
+                        // Obtener todos los elementos li que contienen los capítulos
+                        const chapterItems = chapterList.querySelectorAll("li");
+                        const chapters = [];
                         
-                        if (link && em) {
-                            // Extraer URL y título del capítulo
-                            const href = link.getAttribute("href");
-                            const title = em.textContent.trim();
+                        // Extraer información de cada capítulo
+                        for (const item of chapterItems) {
+                            // Buscar el enlace y el elemento em dentro del li
+                            const link = item.querySelector("a");
+                            const em = link ? link.querySelector("em") : null;
                             
-                            // Extraer número de capítulo del texto o de la URL
-                            let chapterNum = null;
-                            const numMatch = item.textContent.match(/#(\d+(?:\.\d+)?)/);
-                            if (numMatch) {
-                                chapterNum = numMatch[1];
-                            } else {
-                                // Intentar extraer de la URL
-                                const urlMatch = href.match(/(\d+(?:\.\d+)?)-/);
-                                if (urlMatch) {
-                                    chapterNum = urlMatch[1];
+                            if (link && em) {
+                                // Extraer URL y título del capítulo
+                                const href = link.getAttribute("href");
+                                const title = em.textContent.trim();
+                                
+                                // Extraer número de capítulo del texto o de la URL
+                                let chapterNum = null;
+                                const numMatch = item.textContent.match(/#(\d+(?:\.\d+)?)/);
+                                if (numMatch) {
+                                    chapterNum = numMatch[1];
+                                } else {
+                                    // Intentar extraer de la URL
+                                    const urlMatch = href.match(/(\d+(?:\.\d+)?)-/);
+                                    if (urlMatch) {
+                                        chapterNum = urlMatch[1];
+                                    }
+                                }
+                                
+                                if (chapterNum && href) {
+                                    chapters.push({
+                                        number: chapterNum,
+                                        url: href,
+                                        title: title
+                                    });
                                 }
-                            }
-                            
-                            if (chapterNum && href) {
-                                chapters.push({
-                                    number: chapterNum,
-                                    url: href,
-                                    title: title
-                                });
                             }
                         }
+                        
+                        return chapters;
                     }
-                    
-                    return chapters;
-                }
-            """)
-            
-            chapters = []
-            
-            if chapters_data and len(chapters_data) > 0:
-                print(f"Se encontraron {len(chapters_data)} capítulos en el DOM")
+                """)
                 
-                for chapter in chapters_data:
-                    chapter_num = chapter.get('number', '')
-                    chapter_url = chapter.get('url', '')
-                    chapter_title = chapter.get('title', f"Capítulo {chapter_num}")
+                if chapters_data and len(chapters_data) > 0:
+                    print(f"Se encontraron {len(chapters_data)} capítulos en el DOM")
                     
-                    if chapter_num and chapter_url:
-                        try:
-                            chapter_num_float = float(chapter_num)
-                        except ValueError:
-                            chapter_num_float = 0
-                            
-                        chapters.append({
-                            'number': chapter_num_float,
-                            'url': chapter_url,
-                            'title': chapter_title
-                        })
+                    for chapter in chapters_data:
+                        chapter_num = chapter.get('number', '')
+                        chapter_url = chapter.get('url', '')
+                        chapter_title = chapter.get('title', f"Capítulo {chapter_num}")
+                        
+                        if chapter_num and chapter_url:
+                            try:
+                                chapter_num_float = float(chapter_num)
+                            except ValueError:
+                                chapter_num_float = 0
+                                
+                            chapters.append({
+                                'number': chapter_num_float,
+                                'url': chapter_url,
+                                'title': chapter_title
+                            })
+            
+            # Si el DOM no dio resultado, mejor el JSON parcial que nada
+            if not chapters and json_chapters:
+                chapters = json_chapters
             
             # Método 1: Si no se encontraron capítulos con el método optimizado, extraer datos de capítulos desde el JavaScript
             if not chapters:
@@ -317,9 +481,6 @@ async def get_chapters(url):
                     f.write(await page.content())
                 print(f"HTML guardado en: {html_path}")
             
-            # Cerrar navegador
-            await browser.close()
-            
             if chapters:
                 # Eliminar duplicados basados en la URL
                 unique_chapters = []
@@ -427,6 +588,14 @@ def process_chapter_links(chapter_links, base_url):
 
 
 # Funciones de utilidad para ejecutar código asíncrono
-def get_m440_chapters(url):
-    """Wrapper síncrono para get_chapters"""
-    return asyncio.run(get_chapters(url))
+def get_m440_chapters(url, refresh=False):
+    """
+    Wrapper síncrono para get_chapters.
+    
+    El índice se guarda por serie (utils.chapter_index); solo se consulta el
+    sitio cuando ha caducado o se pide refrescarlo.
+    """
+    url = _normalize_manga_url(url)
+    if not url:
+        return None
+    return chapter_index.get_chapters('m440', url, _fetch_m440_chapters, refresh)
@@ -3,10 +3,11 @@ import time
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 
-from utils.http_utils import create_session, get_page_content
+from utils.http_utils import get_session, get_page_content
 from utils.file_utils import (
-    create_chapter_directory, save_metadata, download_image
+    create_chapter_directory, save_metadata
 )
+from utils.download_utils import download_chapter_images
 
 def scrape_m440(url, download_images=True):
     """
@@ -41,8 +42,8 @@ def scrape_m440(url, download_images=True):
         manga_base_url = f"https://m440.in/manga/{manga_slug}"
         print(f"Extrayendo capítulo {chapter_number} de {manga_slug}...")
         
-        # Crear sesión
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener título del manga
         soup, _ = get_page_content(session, manga_base_url)
@@ -132,20 +133,7 @@ def scrape_m440(url, download_images=True):
         # Descargar imágenes solo si se solicita
         if download_images:
             print("Descargando imágenes...")
-            
-            for image_info in images:
-                img_url = image_info['url']
-                img_filename = image_info['filename']
-                img_path = f"{chapter_dir}/{img_filename}"
-                
-                print(f"Descargando imagen {image_info['number']}/{total_images}: {img_url}")
-                success = download_image(session, img_url, img_path)
-                
-                if not success:
-                    print(f"Error al descargar la imagen {image_info['number']}")
-                    
-                time.sleep(0.5)
-                
+            download_chapter_images(session, images, chapter_dir)
             print(f"Capítulo descargado en: {chapter_dir}")
         else:
             print(f"Metadatos guardados en: {chapter_dir}")
@@ -10,25 +10,35 @@ import time
 from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 
-from utils.http_utils import create_session, get_page_content
+from utils.http_utils import get_session, get_page_content
+from utils.chapter_index import chapter_index
 from utils.file_utils import (
-    create_chapter_directory, save_metadata, download_image, sanitize_filename
+    create_chapter_directory, save_metadata, sanitize_filename
 )
+from utils.download_utils import download_chapter_images
 
-def get_olympus_chapters(url):
+def get_olympus_chapters(url, refresh=False):
     """
     Obtiene la lista de capítulos de un manga en olympusscanlation.com
     
+    El índice se guarda por serie (utils.chapter_index) y solo se consulta el
+    sitio cuando ha caducado o se pide refrescarlo.
+    
     Args:
         url: URL principal del manga
+        refresh: Si es True, vuelve a obtener el índice completo del sitio
         
     Returns:
         list: Lista de capítulos con su número, URL y título,
               o None si no se pudieron obtener
     """
+    return chapter_index.get_chapters('olympus', url, _fetch_olympus_chapters, refresh)
+
+def _fetch_olympus_chapters(url):
+    """Obtiene la lista de capítulos directamente de la página del manga."""
     try:
-        # Crear sesión HTTP
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener la página del manga
         print(f"Obteniendo información del manga desde {url}...")
@@ -134,8 +144,8 @@ def scrape_olympus(url, download_images=True):
             print("La URL proporcionada no pertenece a olympusscanlation.com")
             return None
 
-        # Crear sesión HTTP
-        session = create_session()
+        # Obtener la sesión HTTP compartida
+        session = get_session()
         
         # Obtener la página del capítulo
         print(f"Descargando contenido de {url}...")
@@ -262,19 +272,12 @@ def scrape_olympus(url, download_images=True):
             chapter_dir = create_chapter_directory(manga_title, chapter_number, chapter_title)
             save_metadata(chapter_dir, chapter_info)
             
-            # Descargar cada imagen
-            for i, img_url in enumerate(images, 1):
-                img_filename = f"{i:03d}.jpg"
-                img_path = f"{chapter_dir}/{img_filename}"
-                
-                print(f"Descargando imagen {i}/{len(images)}: {img_url}")
-                success = download_image(session, img_url, img_path)
-                
-                if not success:
-                    print(f"Error al descargar la imagen {i}")
-                
-                # Pequeña pausa para evitar sobrecarga del servidor
-                time.sleep(0.5)
+            # Descargar las imágenes de forma concurrente
+            page_images = [
+                {'url': img_url, 'number': i, 'filename': f"{i:03d}.jpg"}
+                for i, img_url in enumerate(images, 1)
+            ]
+            download_chapter_images(session, page_images, chapter_dir)
                 
             print(f"Capítulo descargado en: {chapter_dir}")
             
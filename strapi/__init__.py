@@ -3,4 +3,5 @@
 
 # Import main classes for easier access
 from .save import ComicManager, EpisodeManager
-from .upload import ImageUploader
\ No newline at end of file
+from .upload import ImageUploader
+from .client import StrapiSession
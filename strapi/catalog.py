@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import weakref
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from .client import client_session
+from .title_index import TitleIndex
+
+# Load environment variables
+load_dotenv('.env.local')
+
+# Catalog cache settings
+CATALOG_CACHE_DIR = os.getenv('STRAPI_CATALOG_CACHE', os.path.join('images', '.strapi_catalog'))
+CATALOG_TTL = int(os.getenv('STRAPI_CATALOG_TTL', '600'))
+# Strapi's default maxLimit is 100 entries per page
+CATALOG_PAGE_SIZE = 100
+CATALOG_CONCURRENCY = 4
+
+
+class ComicCatalog:
+    """Paginated list of every comic on a Strapi server, cached in memory and on disk.
+
+    Only the fields needed for title matching and the interactive picker
+    (id, title, documentId) are requested. The first page reports the page
+    count, and the remaining pages are fetched concurrently.
+    """
+
+    def __init__(self, strapi_url: str, strapi_token: str, ttl: int = CATALOG_TTL,
+                 cache_dir: str = CATALOG_CACHE_DIR):
+        self.strapi_url = strapi_url
+        self.headers = {
+            'Authorization': f'Bearer {strapi_token}',
+            'Content-Type': 'application/json',
+        }
+        self.ttl = ttl
+        self.cache_path = None
+        if cache_dir:
+            server_key = hashlib.sha1(strapi_url.encode('utf-8')).hexdigest()[:16]
+            self.cache_path = os.path.join(cache_dir, f"comics_{server_key}.json")
+        self._comics: Optional[List[Dict]] = None
+        self._fetched_at = 0.0
+        self._index: Optional[TitleIndex] = None
+        # asyncio locks are bound to one event loop, and the catalog outlives them
+        self._locks = weakref.WeakKeyDictionary()
+
+    def _loop_lock(self) -> asyncio.Lock:
+        """Return the lock for the running event loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        lock = self._locks.get(loop)
+        if lock is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        return lock
+
+    def _is_fresh(self) -> bool:
+        return self._comics is not None and time.time() - self._fetched_at < self.ttl
+
+    def _read_cache(self):
+        """Load the disk cache into memory if it exists"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            self._comics = cached['comics']
+            self._fetched_at = cached['fetched_at']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not read comic catalog cache {self.cache_path}: {str(e)}")
+
+    def _write_cache(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': self._fetched_at, 'comics': self._comics}, f, ensure_ascii=False)
+        os.replace(temp_path, self.cache_path)
+
+    async def _fetch_page(self, session, page: int) -> Optional[Dict]:
+        url = (f"{self.strapi_url}/api/comics?fields[0]=title&fields[1]=documentId&sort=id:asc"
+               f"&pagination[page]={page}&pagination[pageSize]={CATALOG_PAGE_SIZE}")
+        async with session.get(url, headers=self.headers) as response:
+            if response.status != 200:
+                print(f"Error getting comics page {page}: {response.status}")
+                return None
+            return await response.json()
+
+    async def _fetch(self) -> Optional[List[Dict]]:
+        """Download the full catalog, returning None if any page fails"""
+        async with client_session() as session:
+            first = await self._fetch_page(session, 1)
+            if first is None:
+                return None
+            pages = [first]
+            page_count = first.get('meta', {}).get('pagination', {}).get('pageCount', 1)
+
+            if page_count > 1:
+                semaphore = asyncio.Semaphore(CATALOG_CONCURRENCY)
+
+                async def fetch(page: int):
+                    async with semaphore:
+                        return await self._fetch_page(session, page)
+
+                rest = await asyncio.gather(*[fetch(page) for page in range(2, page_count + 1)])
+                if any(page is None for page in rest):
+                    return None
+                pages.extend(rest)
+
+        comics = []
+        for page in pages:
+            for comic in page.get('data') or []:
+                if not comic.get('title'):
+                    continue
+                comics.append({
+                    'id': comic['id'],
+                    'title': comic['title'],
+                    'documentId': comic.get('documentId', str(comic['id']))
+                })
+        return comics
+
+    async def get_comics(self, refresh: bool = False) -> List[Dict]:
+        """Return every comic as {'id', 'title', 'documentId'}, using the cache while it is fresh"""
+        async with self._loop_lock():
+            if not refresh:
+                if self._comics is None:
+                    self._read_cache()
+                if self._is_fresh():
+                    return self._comics
+
+            try:
+                comics = await self._fetch()
+            except Exception as e:
+                print(f"Error loading comic catalog: {str(e)}")
+                comics = None
+
+            if comics is None:
+                # Fall back to stale data rather than showing an empty catalog
+                return self._comics or []
+
+            self._comics = comics
+            self._fetched_at = time.time()
+            self._write_cache()
+            return self._comics
+
+    async def get_index(self, refresh: bool = False) -> TitleIndex:
+        """Return a title index over the current catalog, rebuilding it only when the catalog changed"""
+        comics = await self.get_comics(refresh)
+        if self._index is None or self._index.comics is not comics:
+            self._index = TitleIndex(comics)
+        return self._index
+
+    def invalidate(self):
+        """Force the next get_comics() call to reload the catalog from Strapi"""
+        self._fetched_at = 0.0
+
+
+# One catalog per server, shared by every manager in the process
+_catalogs: Dict[str, ComicCatalog] = {}
+
+
+def get_catalog(strapi_url: str, strapi_token: str) -> ComicCatalog:
+    """Return the shared catalog for a Strapi server"""
+    catalog = _catalogs.get(strapi_url)
+    if catalog is None:
+        catalog = ComicCatalog(strapi_url, strapi_token)
+        _catalogs[strapi_url] = catalog
+    return catalog
@@ -0,0 +1,68 @@
+import contextvars
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiohttp
+
+# Connection pool settings for the shared session
+DEFAULT_CONNECTION_LIMIT = 32
+DEFAULT_LIMIT_PER_HOST = 16
+DEFAULT_DNS_CACHE_TTL = 300
+
+_shared_session: contextvars.ContextVar[Optional[aiohttp.ClientSession]] = contextvars.ContextVar(
+    'strapi_shared_session', default=None
+)
+
+
+class StrapiSession:
+    """Async context manager that owns the aiohttp session shared by all Strapi managers.
+
+    While it is open, every ``client_session()`` call made from the same task
+    (or from tasks created inside it) reuses one connector, so connections to
+    Strapi and to the image sources are kept alive across requests.
+    """
+
+    def __init__(self, limit: int = DEFAULT_CONNECTION_LIMIT,
+                 limit_per_host: int = DEFAULT_LIMIT_PER_HOST,
+                 ttl_dns_cache: int = DEFAULT_DNS_CACHE_TTL):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._token = None
+
+    async def __aenter__(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=True,
+        )
+        self.session = aiohttp.ClientSession(connector=connector)
+        self._token = _shared_session.set(self.session)
+        return self.session
+
+    async def __aexit__(self, exc_type, exc, tb):
+        _shared_session.reset(self._token)
+        await self.session.close()
+        self.session = None
+
+
+def get_shared_session() -> Optional[aiohttp.ClientSession]:
+    """Return the shared session if a StrapiSession is open, otherwise None"""
+    session = _shared_session.get()
+    if session is None or session.closed:
+        return None
+    return session
+
+
+@asynccontextmanager
+async def client_session():
+    """Yield the shared session, or a temporary one when no StrapiSession is open"""
+    session = get_shared_session()
+    if session is not None:
+        yield session
+        return
+
+    async with aiohttp.ClientSession() as session:
+        yield session
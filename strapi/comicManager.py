@@ -4,6 +4,9 @@ import aiohttp
 import re
 from typing import Dict, List, Optional, Union
 
+from .client import client_session
+from .catalog import get_catalog
+
 class ComicManager:
     def __init__(self, strapi_url: str, strapi_token: str):
         self.strapi_url = strapi_url
@@ -11,10 +14,11 @@ class ComicManager:
             'Authorization': f'Bearer {strapi_token}',
             'Content-Type': 'application/json',
         }
+        self.catalog = get_catalog(strapi_url, strapi_token)
         
     async def get_comic_by_document_id(self, document_id: str) -> Optional[Dict]:
         """Get a comic by its document_id"""
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.get(
                     f"{self.strapi_url}/api/comics?filters[documentId][$eq]={document_id}",
@@ -46,7 +50,7 @@ class ComicManager:
                 
     async def get_comic_by_id(self, comic_id: int) -> Optional[Dict]:
         """Get a comic directly by its numeric ID"""
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.get(
                     f"{self.strapi_url}/api/comics?filters[id][$eq]={comic_id}",
@@ -75,7 +79,7 @@ class ComicManager:
         # Normalize data fields
         normalized_data = self._normalize_comic_data(comic_data)
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.post(
                     f"{self.strapi_url}/api/comics",
@@ -87,6 +91,9 @@ class ComicManager:
                     if response.status not in (200, 201):
                         print(f"Error creating comic: {response.status}")
                         print(f"Response: {response_data}")
+                    else:
+                        # The cached catalog no longer lists every comic
+                        self.catalog.invalidate()
                     return response_data
             except Exception as e:
                 print(f"Error creating comic: {str(e)}")
@@ -96,7 +103,7 @@ class ComicManager:
         """Update an existing comic with normalized data"""
         normalized_data = self._normalize_comic_data(comic_data)
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.put(
                     f"{self.strapi_url}/api/comics/{comic_id}",
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import asyncio
+import hashlib
+from typing import Dict, Iterable, Optional
+from dotenv import load_dotenv
+from .client import client_session, StrapiSession
+
+# Cargar variables de entorno
+load_dotenv('.env.local')
+
+# Configuración de Strapi desde variables de entorno
+STRAPI_URL = os.getenv('STRAPI_URL')
+STRAPI_TOKEN = os.getenv('STRAPI_TOKEN')
+STRAPI_URL_API = os.getenv('STRAPI_URL_API')
+STRAPI_TOKEN_API = os.getenv('STRAPI_TOKEN_API')
+
+# Archivo del índice (vacío para desactivarlo)
+HASH_INDEX_PATH = os.getenv('STRAPI_HASH_INDEX', os.path.join('images', '.strapi_hashes.json'))
+# Tamaño de página y descargas simultáneas al reconstruir el índice
+REBUILD_PAGE_SIZE = 100
+REBUILD_CONCURRENCY = 8
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Campos del archivo de Strapi que se conservan en el índice
+RECORD_FIELDS = ('id', 'documentId', 'name', 'url', 'mime', 'size')
+
+
+def sha256_file(path: str) -> str:
+    """Calcula el SHA-256 de un archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class HashIndex:
+    """Índice persistente de hash de contenido -> archivo subido a Strapi.
+
+    Las entradas se agrupan por servidor, ya que los IDs de archivo del
+    servidor local y del API no coinciden. Una misma subida se registra con
+    el hash de los bytes originales y con el de los bytes convertidos, de modo
+    que se reconoce tanto antes como después de la conversión a WebP.
+    """
+
+    def __init__(self, path: str = HASH_INDEX_PATH):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Dict]] = {}
+        self._dirty = False
+        self._loaded = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer el índice de hashes {self.path}: {e}")
+            self.entries = {}
+
+    def get(self, server_url: str, digest: str) -> Optional[Dict]:
+        """Devuelve el archivo registrado para un hash en un servidor, o None."""
+        if not self.enabled:
+            return None
+        self._load()
+        return self.entries.get(server_url, {}).get(digest)
+
+    def add(self, server_url: str, digests: Iterable[str], file_data: Dict):
+        """Registra un archivo subido bajo uno o varios hashes de contenido."""
+        if not self.enabled or not isinstance(file_data, dict) or 'id' not in file_data:
+            return
+        self._load()
+        record = {key: file_data[key] for key in RECORD_FIELDS if key in file_data}
+        server_entries = self.entries.setdefault(server_url, {})
+        for digest in digests:
+            server_entries[digest] = record
+        self._dirty = True
+
+    def replace_server(self, server_url: str, server_entries: Dict[str, Dict]):
+        """Sustituye todas las entradas de un servidor (usado al reconstruir)."""
+        self._load()
+        self.entries[server_url] = server_entries
+        self._dirty = True
+
+    def save(self):
+        """Guarda el índice en disco si hubo cambios, de forma atómica."""
+        if not self.enabled or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+
+
+# Instancia compartida por todo el proceso
+hash_index = HashIndex()
+
+
+async def hash_remote_file(session, server_url: str, file_data: Dict, semaphore: asyncio.Semaphore) -> Optional[str]:
+    """Descarga un archivo de Strapi por bloques y devuelve su SHA-256."""
+    file_url = file_data.get('url', '')
+    if file_url.startswith('/'):
+        file_url = f"{server_url}{file_url}"
+    async with semaphore:
+        try:
+            async with session.get(file_url) as response:
+                if response.status != 200:
+                    print(f"Error al descargar {file_url} (Estado: {response.status})")
+                    return None
+                digest = hashlib.sha256()
+                async for chunk in response.content.iter_chunked(HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                return digest.hexdigest()
+        except Exception as e:
+            print(f"Error al calcular el hash de {file_url}: {str(e)}")
+            return None
+
+
+async def rebuild_hash_index(server_url: str, token: str, index: HashIndex = hash_index) -> int:
+    """Reconstruye las entradas de un servidor recorriendo /api/upload/files por páginas.
+
+    Args:
+        server_url: URL base del servidor Strapi
+        token: Token de acceso del servidor
+        index: Índice a reconstruir
+
+    Returns:
+        int: Número de archivos indexados, o None si falló alguna página (el
+             índice del servidor no se modifica en ese caso)
+    """
+    headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+    semaphore = asyncio.Semaphore(REBUILD_CONCURRENCY)
+    server_entries = {}
+    start = 0
+
+    async with client_session() as session:
+        while True:
+            page_url = (f"{server_url}/api/upload/files?sort=id:asc"
+                        f"&pagination[start]={start}&pagination[limit]={REBUILD_PAGE_SIZE}")
+            async with session.get(page_url, headers=headers) as response:
+                if response.status != 200:
+                    print(f"Error al listar archivos de {server_url} (Estado: {response.status})")
+                    # Un listado parcial borraría del índice los archivos que faltan
+                    return None
+                files = await response.json()
+            if isinstance(files, dict):
+                files = files.get('data', [])
+            if not files:
+                break
+
+            digests = await asyncio.gather(*[
+                hash_remote_file(session, server_url, file_data, semaphore) for file_data in files
+            ])
+            for file_data, digest in zip(files, digests):
+                if digest:
+                    server_entries[digest] = {key: file_data[key] for key in RECORD_FIELDS if key in file_data}
+
+            print(f"Indexados {len(server_entries)} archivos de {server_url}...")
+            if len(files) < REBUILD_PAGE_SIZE:
+                break
+            start += REBUILD_PAGE_SIZE
+
+    index.replace_server(server_url, server_entries)
+    index.save()
+    return len(server_entries)
+
+
+# Función principal
+async def main():
+    """Reconstruye el índice de hashes: python -m strapi.hash_index [local|api|all]"""
+    target = sys.argv[1] if len(sys.argv) > 1 else 'all'
+    servers = []
+    if target in ('local', 'all'):
+        servers.append((STRAPI_URL, STRAPI_TOKEN))
+    if target in ('api', 'all') and STRAPI_URL_API and STRAPI_URL_API != STRAPI_URL:
+        servers.append((STRAPI_URL_API, STRAPI_TOKEN_API))
+    if not servers:
+        print("Uso: python -m strapi.hash_index [local|api|all]")
+        return
+
+    async with StrapiSession():
+        for server_url, token in servers:
+            print(f"Reconstruyendo índice de hashes para {server_url}")
+            total = await rebuild_hash_index(server_url, token)
+            if total is None:
+                print(f"Índice de {server_url} sin cambios: no se pudo listar todos los archivos")
+            else:
+                print(f"Índice de {server_url}: {total} archivos")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+from typing import Dict, Optional
+from utils.library_index import library_index
+
+# Nombre del diario dentro del directorio de cada manga
+JOURNAL_FILENAME = '.upload_journal.jsonl'
+
+# Campos del archivo de Strapi que se guardan en el diario
+RECORD_FIELDS = ('id', 'documentId', 'name', 'url', 'mime', 'size')
+
+
+def _chapter_key(chapter) -> str:
+    """Normaliza el número de capítulo (3, 3.0 y '3' son el mismo capítulo)."""
+    try:
+        number = float(chapter)
+        return str(int(number)) if number.is_integer() else str(number)
+    except (TypeError, ValueError):
+        return str(chapter)
+
+
+class UploadJournal:
+    """Diario de subidas de un manga, de solo anexado, en formato JSONL.
+
+    Cada línea registra una imagen subida (capítulo, página e ID del archivo
+    en Strapi) o un episodio creado. Al abrirlo se reproduce el archivo
+    completo, de modo que un proceso reiniciado sabe exactamente qué páginas
+    y episodios ya están en cada servidor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manga = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        self.images: Dict[tuple, Dict] = {}
+        self.episodes: Dict[tuple, Optional[int]] = {}
+        self._replay()
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Línea incompleta si el proceso murió mientras escribía
+                    continue
+                if entry.get('type') == 'image':
+                    self.images[(entry['server'], entry['chapter'], entry['page'])] = entry['file']
+                elif entry.get('type') == 'episode':
+                    self.episodes[(entry['server'], entry['comic'], entry['chapter'])] = entry.get('episode_id')
+
+    def _append(self, entry: Dict):
+        entry['manga'] = self.manga
+        entry['ts'] = int(time.time())
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+
+    def get_image(self, server: str, chapter, page: str) -> Optional[Dict]:
+        """Devuelve el archivo de Strapi registrado para una página, o None."""
+        return self.images.get((server, _chapter_key(chapter), page))
+
+    def record_image(self, server: str, chapter, page: str, file_data: Dict):
+        """Registra una página subida a un servidor."""
+        if not isinstance(file_data, dict) or 'id' not in file_data:
+            return
+        record = {key: file_data[key] for key in RECORD_FIELDS if key in file_data}
+        chapter = _chapter_key(chapter)
+        self.images[(server, chapter, page)] = record
+        self._append({'type': 'image', 'server': server, 'chapter': chapter, 'page': page, 'file': record})
+
+    def has_episode(self, server: str, document_id, chapter) -> bool:
+        """Indica si el diario registra el episodio como creado (el cómic se identifica por su documentId)."""
+        return (server, str(document_id), _chapter_key(chapter)) in self.episodes
+
+    def record_episode(self, server: str, document_id, chapter, episode_id: Optional[int] = None):
+        """Registra un episodio creado en el cómic con ese documentId."""
+        chapter = _chapter_key(chapter)
+        self.episodes[(server, str(document_id), chapter)] = episode_id
+        self._append({'type': 'episode', 'server': server, 'comic': str(document_id),
+                      'chapter': chapter, 'episode_id': episode_id})
+        try:
+            library_index.record_upload(os.path.dirname(self.path), chapter, server, document_id, episode_id)
+        except Exception as e:
+            print(f"No se pudo registrar el episodio {chapter} en el índice de la biblioteca: {str(e)}")
+
+    def chapter(self, chapter) -> 'ChapterJournal':
+        """Devuelve una vista del diario limitada a un capítulo."""
+        return ChapterJournal(self, chapter)
+
+
+class ChapterJournal:
+    """Vista de un UploadJournal para las páginas de un capítulo."""
+
+    def __init__(self, journal: UploadJournal, chapter):
+        self.journal = journal
+        self.chapter = chapter
+
+    def get_image(self, server: str, page: str) -> Optional[Dict]:
+        return self.journal.get_image(server, self.chapter, page)
+
+    def record_image(self, server: str, page: str, file_data: Dict):
+        self.journal.record_image(server, self.chapter, page, file_data)
+
+
+# Un diario por directorio de manga, compartido por todo el proceso
+_journals: Dict[str, UploadJournal] = {}
+
+
+def get_journal(manga_dir: str) -> UploadJournal:
+    """Devuelve el diario de subidas de un directorio de manga."""
+    path = os.path.join(os.path.abspath(manga_dir), JOURNAL_FILENAME)
+    journal = _journals.get(path)
+    if journal is None:
+        journal = UploadJournal(path)
+        _journals[path] = journal
+    return journal
+
+
+def journal_for_chapter_dir(chapter_dir: Optional[str]) -> Optional[UploadJournal]:
+    """Devuelve el diario del manga que contiene un directorio de capítulo, o None."""
+    if not chapter_dir or not os.path.isdir(chapter_dir):
+        return None
+    return get_journal(os.path.dirname(os.path.abspath(chapter_dir)))
@@ -5,6 +5,10 @@ import aiohttp
 import asyncio
 import re
 from .upload import ImageUploader
+from .client import client_session
+from .catalog import get_catalog
+from .title_index import normalize_title
+from .journal import journal_for_chapter_dir
 
 # Load environment variables
 load_dotenv('.env.local')
@@ -16,96 +20,70 @@ STRAPI_TOKEN = os.getenv('STRAPI_TOKEN')
 if not STRAPI_URL or not STRAPI_TOKEN:
     raise ValueError("STRAPI_URL and STRAPI_TOKEN must be set in .env.local")
 
+# Episodes per page when loading a comic's episode list (Strapi's default maxLimit)
+EPISODE_PAGE_SIZE = 100
+# Chapters whose images are uploaded ahead of the episode being created
+PIPELINE_LOOKAHEAD = int(os.getenv('STRAPI_PIPELINE_LOOKAHEAD', '2'))
+
+# Minimum score for picking the best title match without asking, and how far
+# ahead of the runner-up it must be (set the threshold above 1 to always ask).
+# Matches whose numbers differ (sequels, seasons) are never picked automatically.
+AUTO_SELECT_THRESHOLD = float(os.getenv('STRAPI_AUTO_SELECT_THRESHOLD', '0.9'))
+AUTO_SELECT_MARGIN = 0.1
+
+
+def _title_numbers(title: str) -> List[str]:
+    """Numeric tokens of a title ('Tower of God 2' -> ['2'])"""
+    return [token.lstrip('0') or '0' for token in normalize_title(title).split() if token.isdigit()]
+
+def pick_confident_match(title: str, similar_comics: List[Dict]) -> Optional[int]:
+    """Return the index of the best match if it is confident enough to select automatically"""
+    if not similar_comics or similar_comics[0]['similarity'] < AUTO_SELECT_THRESHOLD:
+        return None
+    if _title_numbers(title) != _title_numbers(similar_comics[0]['title']):
+        return None
+    if len(similar_comics) > 1 and similar_comics[0]['similarity'] - similar_comics[1]['similarity'] < AUTO_SELECT_MARGIN:
+        return None
+    return 0
+
 class ComicManager:
     def __init__(self):
         self.headers = {
             'Authorization': f'Bearer {STRAPI_TOKEN}',
             'Content-Type': 'application/json',
         }
+        # Shared, cached catalog used for title matching and the picker
+        self.catalog = get_catalog(STRAPI_URL, STRAPI_TOKEN)
         
-    async def find_similar_comics(self, title: str) -> List[Dict]:
-        """Find comics with similar titles"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                # Get all comics
-                async with session.get(
-                    f"{STRAPI_URL}/api/comics?populate[episodesAll][fields][0]=id&populate[episodesAll][fields][1]=episode&popula&fields[1]=title",
-                    headers=self.headers,
-                    
-                ) as response:
-                    if response.status != 200:
-                        print(f"Error getting comics: {response.status}")
-                        return []
-                    
-                    data = await response.json()
-                    if not data.get('data'):
-                        return []
-                    
-                    # Process each comic and calculate similarity
-                    similar_comics = []
-                    title_lower = title.lower()
-                    
-                    for comic in data['data']:
-                        comic_title = comic['title']
-                        
-                        if not comic_title:
-                            continue
-                            
-                        # Calculate similarity (basic contains check for now)
-                        comic_title_lower = comic_title.lower()
-                        if (title_lower in comic_title_lower or 
-                            comic_title_lower in title_lower or
-                            len(set(title_lower.split()) & set(comic_title_lower.split())) > 0):
-                            similar_comics.append({
-                                'id': comic['id'],
-                                'title': comic_title,
-                                'documentId': comic['documentId'],
-                                'similarity': 'Potential match'
-                            })
-                    
-                    return similar_comics
-            except Exception as e:
-                print(f"Error finding similar comics: {str(e)}")
-                return []
+    async def find_similar_comics(self, title: str, limit: int = 10) -> List[Dict]:
+        """Find comics with similar titles, best match first"""
+        try:
+            index = await self.catalog.get_index()
+            return [
+                {
+                    'id': comic['id'],
+                    'title': comic['title'],
+                    'documentId': comic['documentId'],
+                    'similarity': score
+                }
+                for comic, score in index.search(title, limit=limit)
+            ]
+        except Exception as e:
+            print(f"Error finding similar comics: {str(e)}")
+            return []
                 
     async def get_all_comics(self) -> List[Dict]:
-        """Get all comics from Strapi"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                # Get all comics
-                async with session.get(
-                    f"{STRAPI_URL}/api/comics?populate[episodesAll][fields][0]=id&populate[episodesAll][fields][1]=episode&fields[0]=id&fields[1]=title&fields[2]=documentId&sort=title:asc",
-                    headers=self.headers,
-                    
-                ) as response:
-                    if response.status != 200:
-                        print(f"Error getting all comics: {response.status}")
-                        return []
-                    
-                    data = await response.json()
-                    if not data.get('data'):
-                        return []
-                    
-                    # Format comics list
-                    all_comics = []
-                    for comic in data['data']:
-                        if not comic.get('title'):
-                            continue
-                            
-                        all_comics.append({
-                            'id': comic['id'],
-                            'title': comic['title'],
-                            'documentId': comic.get('documentId', str(comic['id']))
-                        })
-                    
-                    return all_comics
-            except Exception as e:
-                print(f"Error getting all comics: {str(e)}")
-                return []
+        """Get all comics from Strapi, sorted by title"""
+        try:
+            comics = await self.catalog.get_comics()
+            return sorted(comics, key=lambda comic: comic['title'].lower())
+        except Exception as e:
+            print(f"Error getting all comics: {str(e)}")
+            return []
 
     async def get_comic_by_document_id(self, document_id: str) -> Optional[Dict]:
         """Get a comic by its document_id or find similar comics if not found"""
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 # First try exact document_id match
                 async with session.get(
@@ -145,7 +123,7 @@ class ComicManager:
         """Update an existing comic with normalized data"""
         normalized_data = await self._normalize_comic_data(comic_data, comic_data.get('documentId', ''))
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.put(
                     f"{STRAPI_URL}/api/comics/{comic_id}",
@@ -241,7 +219,7 @@ class ComicManager:
     
     async def get_comic_by_id(self, comic_id: int) -> Optional[Dict]:
         """Get a comic directly by its numeric ID"""
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 async with session.get(
                     f"{STRAPI_URL}/api/comics?filters[id][$eq]={comic_id}",
@@ -272,12 +250,70 @@ class EpisodeManager:
             'Authorization': f'Bearer {STRAPI_TOKEN}',
             'Content-Type': 'application/json',
         }
+        # Episode number -> episode id for each comic, loaded once per comic
+        self._episode_sets: Dict[str, Dict[Any, Optional[int]]] = {}
+
+    async def _fetch_episode_set(self, comic_id: Union[str, int]) -> Optional[Dict[Any, Optional[int]]]:
+        """Fetch every episode number of a comic with paginated /api/episodes requests"""
+        # Numeric ids filter by id, anything else by documentId
+        comic_filter = 'id' if str(comic_id).isdigit() else 'documentId'
+        episodes = {}
+        page = 1
+        async with client_session() as session:
+            try:
+                while True:
+                    url = (f"{STRAPI_URL}/api/episodes?filters[comic][{comic_filter}][$eq]={comic_id}"
+                           f"&fields[0]=episode&pagination[page]={page}&pagination[pageSize]={EPISODE_PAGE_SIZE}")
+                    async with session.get(url, headers=self.headers) as response:
+                        if response.status != 200:
+                            print(f"Error getting episodes: {response.status}")
+                            return None
+                        data = await response.json()
+                    
+                    for item in data.get('data') or []:
+                        episode_num = item.get('episode', item.get('attributes', {}).get('episode'))
+                        if episode_num is not None:
+                            episodes[episode_num] = self._extract_episode_id(item)
+                    
+                    page_count = data.get('meta', {}).get('pagination', {}).get('pageCount', 1)
+                    if page >= page_count:
+                        return episodes
+                    page += 1
+            except Exception as e:
+                print(f"Error retrieving episodes: {str(e)}")
+                return None
+
+    async def get_existing_episodes(self, comic_id: Union[str, int], refresh: bool = False) -> Optional[Dict[Any, Optional[int]]]:
+        """Return the cached episode number -> id map of a comic, or None if it could not be loaded"""
+        key = str(comic_id)
+        if refresh or key not in self._episode_sets:
+            episodes = await self._fetch_episode_set(comic_id)
+            if episodes is None:
+                return None
+            print(f"Found {len(episodes)} existing episodes for comic {comic_id}")
+            self._episode_sets[key] = episodes
+        return self._episode_sets[key]
+
+    async def episode_exists(self, comic_id: Union[str, int], episode_number) -> bool:
+        """Check whether an episode exists, falling back to a single query if the set is unavailable"""
+        episodes = await self.get_existing_episodes(comic_id)
+        if episodes is None:
+            return await self.get_episode_by_number(comic_id, episode_number) is not None
+        return episode_number in episodes
+
+    def mark_episode_created(self, comic_id: Union[str, int], episode_number, response_data: Dict):
+        """Record a newly created episode in the comic's cached set"""
+        episodes = self._episode_sets.get(str(comic_id))
+        if episodes is None:
+            return
+        data = response_data.get('data') if isinstance(response_data, dict) else None
+        episodes[episode_number] = self._extract_episode_id(data) if isinstance(data, dict) else None
 
     async def get_comic_episodes(self, comic_id: str) -> List[int]:
         """Get all episode numbers for a comic"""
         print(f"Getting episodes for comic ID: {comic_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 # First try the camelCase field name
                 url = f"{STRAPI_URL}/api/episodes?filters[comic][id][$eq]={comic_id}&fields[0]=episode"
@@ -316,7 +352,7 @@ class EpisodeManager:
         """Get an episode by its number with error handling"""
         print(f"Looking for episode {episode_number} for comic ID: {comic_id}")
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
                 url = f"{STRAPI_URL}/api/comics?filters[documentId][$eq]={comic_id}&filters[episodesAll][episode][$eq]={episode_number}&fields[0]=title&populate[episodesAll][fields][0]=id&populate[episodesAll][fields][1]=episode"
                 #/api/comics?filters[documentId][$eq]={comic_id}&filters[episodeAll][episode][$eq]={episode_number}"
@@ -380,7 +416,16 @@ class EpisodeManager:
         uploadImage = ImageUploader()
 
         if 'images' in episode_data and isinstance(episode_data['images'], list):
-            uploaded_images = await uploadImage.upload_images(episode_data['images'], str(episode_data['episode']), as_media=True, retries=3)
+            # Resume from the pages recorded in the manga's upload journal
+            journal = journal_for_chapter_dir(episode_data.get('directory'))
+            uploaded_images = await uploadImage.upload_images(
+                episode_data['images'],
+                str(episode_data['episode']),
+                as_media=True,
+                retries=3,
+                local_dir=episode_data.get('directory'),
+                journal=journal.chapter(episode_data['episode']) if journal else None
+            )
             
             # Verificar si hubo un error crítico durante la subida de imágenes
             if uploaded_images is None:
@@ -430,12 +475,19 @@ class EpisodeManager:
         
         
             
-        existing_episode = await self.get_episode_by_number(document_id, episode_number)
+        existing_episode = await self.episode_exists(document_id, episode_number)
 
         if existing_episode:
             return print(f"Capitulo ya existente")
 
         normalized_data = await self._prepare_episode_data(episode_data, document_id)
+        if 'error' in normalized_data:
+            return normalized_data
+        journal = journal_for_chapter_dir(episode_data.get('directory'))
+        return await self.create_episode(document_id, episode_number, normalized_data, journal)
+
+    async def create_episode(self, document_id: str, episode_number, normalized_data: Dict, journal=None) -> Dict:
+        """Create an episode from data prepared by _prepare_episode_data, recording it in the upload journal"""
         # Ensure episode number is set in normalized data
         normalized_data['episode'] = episode_number
         
@@ -447,45 +499,82 @@ class EpisodeManager:
                 flattened_images = [img for sublist in images_data for img in sublist]
                 normalized_data['images']['data'] = flattened_images
         
-        async with aiohttp.ClientSession() as session:
+        async with client_session() as session:
             try:
-                if existing_episode:
-                    # Update existing episode
-                    episode_id = self._extract_episode_id(existing_episode)
-                    if not episode_id:
-                        print(f"Error: Could not extract episode ID from {existing_episode}")
-                        return {"error": "Could not extract episode ID"}
-                        
-                    print(f"Updating episode {episode_number} with ID {episode_id}")
-                    async with session.put(
-                        f"{STRAPI_URL}/api/episodes/{episode_id}",
-                        json={"data": normalized_data},
-                        headers=self.headers,
-                        
-                    ) as response:
-                        response_data = await response.json()
-                        if response.status not in (200, 201):
-                            print(f"Error updating episode: {response.status}")
-                            print(f"Response: {response_data}")
-                        return response_data
-                else:
-                    # Create new episode
-                    print(f"Creating new episode {episode_number} for comic {document_id}")
-                    async with session.post(
-                        f"{STRAPI_URL}/api/episodes",
-                        json={"data": normalized_data},
-                        headers=self.headers,
-                        
-                    ) as response:
-                        response_data = await response.json()
-                        if response.status not in (200, 201):
-                            print(f"Error creating episode: {response.status}")
-                            print(f"Response: {response_data}")
-                        return response_data
+                print(f"Creating new episode {episode_number} for comic {document_id}")
+                async with session.post(
+                    f"{STRAPI_URL}/api/episodes",
+                    json={"data": normalized_data},
+                    headers=self.headers,
+                    
+                ) as response:
+                    response_data = await response.json()
+                    if response.status not in (200, 201):
+                        print(f"Error creating episode: {response.status}")
+                        print(f"Response: {response_data}")
+                    else:
+                        self.mark_episode_created(document_id, episode_number, response_data)
+                        if journal is not None:
+                            data = response_data.get('data')
+                            episode_id = self._extract_episode_id(data) if isinstance(data, dict) else None
+                            journal.record_episode(STRAPI_URL, document_id, episode_number, episode_id)
+                    return response_data
             except Exception as e:
                 print(f"Error creating/updating episode: {str(e)}")
                 return {"error": str(e)}
 
+
+async def run_episode_pipeline(episodes: List[Dict], prepare, create,
+                               lookahead: int = PIPELINE_LOOKAHEAD,
+                               stop_on_error: bool = True) -> List[tuple]:
+    """Create episodes in order while the images of the next chapters upload in the background
+
+    Args:
+        episodes: Episodes to process, already in chapter order
+        prepare: Coroutine function(episode) that uploads the images and returns
+            the episode data, or a dict with 'error' or 'status' to skip creation
+        create: Coroutine function(episode, prepared) that creates the episode
+        lookahead: Number of chapters prepared ahead of the one being created
+        stop_on_error: Stop at the first episode that fails
+
+    Returns:
+        List of (episode, result) tuples in chapter order
+    """
+    results = []
+    tasks = {}
+
+    def schedule(position: int):
+        if position < len(episodes):
+            tasks[position] = asyncio.ensure_future(prepare(episodes[position]))
+
+    for position in range(min(lookahead + 1, len(episodes))):
+        schedule(position)
+
+    try:
+        for position, episode in enumerate(episodes):
+            try:
+                prepared = await tasks.pop(position)
+            except Exception as e:
+                prepared = {"error": str(e)}
+            # Keep the upload queue full while this episode is created
+            schedule(position + lookahead + 1)
+
+            if isinstance(prepared, dict) and ('error' in prepared or 'status' in prepared):
+                result = prepared
+            else:
+                result = await create(episode, prepared)
+            results.append((episode, result))
+
+            if stop_on_error and isinstance(result, dict) and 'error' in result:
+                break
+    finally:
+        # Cancel the uploads of chapters that will not be created
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    return results
+
 async def save_comic_and_episodes(comic_data: Dict, episodes: List[Dict]) -> Dict:
     """Save a comic and its episodes to Strapi"""
     # Initialize managers
@@ -499,10 +588,16 @@ async def save_comic_and_episodes(comic_data: Dict, episodes: List[Dict]) -> Dic
         # Try to find similar comics
         similar_comics = await comic_manager.find_similar_comics(comic_data['title'])
         
-        if similar_comics:
+        # Select the best match without asking when it is clearly the right one
+        choice_idx = pick_confident_match(comic_data['title'], similar_comics)
+        if choice_idx is not None:
+            comic_id = similar_comics[choice_idx]['id']
+            print(f"Seleccionado automáticamente: {similar_comics[choice_idx]['title']} (ID: {comic_id}, similitud {similar_comics[choice_idx]['similarity']:.2f})")
+        
+        elif similar_comics:
             print("\nCómics similares encontrados:")
             for i, similar in enumerate(similar_comics, 1):
-                print(f"{i}. {similar['title']} (ID: {similar['id']})")
+                print(f"{i}. {similar['title']} (ID: {similar['id']}, similitud {similar['similarity']:.2f})")
             
             while True:
                 try:
@@ -625,23 +720,67 @@ async def save_comic_and_episodes(comic_data: Dict, episodes: List[Dict]) -> Dic
     # Get the document ID from similar_comics if available, otherwise use the comic_id
     document_id = similar_comics[choice_idx]['documentId'] if similar_comics else str(comic_id)
     
+    result = await upload_episodes(document_id, episodes, episode_manager)
+    if 'error' in result:
+        return result
+
+    # Return a success response with the comic ID
+    return {"id": comic_id, "documentId": document_id, "status": "success"}
+
+async def upload_episodes(document_id: str, episodes: List[Dict],
+                          episode_manager: Optional[EpisodeManager] = None) -> Dict:
+    """Upload the episodes a comic does not have yet, skipping existing ones before any image work
+
+    Args:
+        document_id: documentId of the comic in Strapi
+        episodes: Episodes with 'episode', 'images' and optionally 'directory'
+        episode_manager: Manager whose episode sets are reused (a new one by default)
+
+    Returns:
+        {"documentId", "status": "success", "created"} or {"error": ...} at the first failed episode
+    """
+    episode_manager = episode_manager or EpisodeManager()
+
+    # Load the comic's existing episodes once so existing chapters are skipped before any image work
+    existing_episodes = await episode_manager.get_existing_episodes(document_id)
+    if existing_episodes is None:
+        # Without the episode set every chapter would look new and be uploaded again
+        print(f"\nERROR: No se pudieron obtener los episodios existentes del cómic {document_id}")
+        return {"error": f"No se pudieron obtener los episodios del cómic {document_id}"}
+    
+    pending_episodes = []
     for episode in episodes:
         # Ensure episode has an episode number
         if 'episode' not in episode:
             # If episode number is missing, set it to 0 (which is valid)
             episode['episode'] = 0
-            
-        print(f"Procesando episodio {episode.get('episode', 'desconocido')}")
-        result = await episode_manager.create_or_update_episode(document_id, episode)
         
-        # Verificar si hubo un error en la creación/actualización del episodio
+        journal = journal_for_chapter_dir(episode.get('directory'))
+        if episode['episode'] in existing_episodes or (
+                journal and journal.has_episode(STRAPI_URL, document_id, episode['episode'])):
+            print(f"Capitulo {episode['episode']} ya existente, omitiendo...")
+            continue
+        pending_episodes.append(episode)
+    
+    async def prepare(episode: Dict) -> Dict:
+        print(f"Procesando episodio {episode.get('episode', 'desconocido')}")
+        return await episode_manager._prepare_episode_data(episode, document_id)
+    
+    async def create(episode: Dict, normalized_data: Dict) -> Dict:
+        journal = journal_for_chapter_dir(episode.get('directory'))
+        return await episode_manager.create_episode(document_id, episode['episode'], normalized_data, journal)
+    
+    # Upload the next chapters while earlier episodes are created, in chapter order
+    results = await run_episode_pipeline(pending_episodes, prepare, create)
+    for episode, result in results:
+        # Verificar si hubo un error en la creación del episodio
         if isinstance(result, dict) and 'error' in result:
             print(f"\nERROR CRÍTICO: Falló la subida del episodio {episode.get('episode', 'desconocido')}: {result['error']}")
             print(f"Deteniendo el proceso de subida de episodios.\n")
             return {"error": f"Falló la subida del episodio {episode.get('episode', 'desconocido')}"}
 
-    # Return a success response with the comic ID
-    return {"id": comic_id, "documentId": document_id, "status": "success"}
+    created = sum(1 for _, result in results if not (isinstance(result, dict) and 'status' in result))
+    return {"documentId": document_id, "status": "success", "created": created}
 
 # Example usage
 async def main():
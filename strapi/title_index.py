@@ -0,0 +1,73 @@
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Titles shorter than this many characters are padded so they still yield trigrams
+TRIGRAM_SIZE = 3
+
+
+def normalize_title(title: str) -> str:
+    """Normalize a title for matching: strip accents, lowercase, turn '_' and punctuation into spaces"""
+    decomposed = unicodedata.normalize('NFKD', title or '')
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = re.sub(r'[\W_]+', ' ', without_accents.lower())
+    return cleaned.strip()
+
+
+def title_trigrams(normalized: str) -> set:
+    """Return the set of character trigrams of a normalized title, padded at word edges"""
+    trigrams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - TRIGRAM_SIZE + 1):
+            trigrams.add(padded[i:i + TRIGRAM_SIZE])
+    return trigrams
+
+
+class TitleIndex:
+    """In-memory trigram inverted index over comic titles.
+
+    Similarity is the Dice coefficient of the trigram sets, so scores range
+    from 0 to 1 and an identical normalized title always scores 1.
+    """
+
+    def __init__(self, comics: List[Dict]):
+        self.comics = comics
+        self._normalized = []
+        self._sizes = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+
+        for position, comic in enumerate(comics):
+            normalized = normalize_title(comic.get('title', ''))
+            trigrams = title_trigrams(normalized)
+            self._normalized.append(normalized)
+            self._sizes.append(len(trigrams))
+            self._exact[normalized].append(position)
+            for trigram in trigrams:
+                self._postings[trigram].append(position)
+
+    def search(self, title: str, limit: int = 10, min_score: float = 0.3) -> List[Tuple[Dict, float]]:
+        """Return up to `limit` (comic, score) pairs sorted by descending similarity"""
+        normalized = normalize_title(title)
+        query = title_trigrams(normalized)
+        if not query:
+            return []
+
+        overlaps: Dict[int, int] = defaultdict(int)
+        for trigram in query:
+            for position in self._postings.get(trigram, ()):
+                overlaps[position] += 1
+
+        scores = {}
+        for position, overlap in overlaps.items():
+            scores[position] = 2.0 * overlap / (len(query) + self._sizes[position])
+        for position in self._exact.get(normalized, ()):
+            scores[position] = 1.0
+
+        ranked = sorted(
+            (item for item in scores.items() if item[1] >= min_score),
+            key=lambda item: (-item[1], self._normalized[item[0]])
+        )
+        return [(self.comics[position], round(score, 3)) for position, score in ranked[:limit]]
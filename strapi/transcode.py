@@ -0,0 +1,94 @@
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él se suben los originales
+    Image = None
+
+# Cargar variables de entorno
+load_dotenv('.env.local')
+
+# Configuración de la conversión a WebP
+WEBP_ENABLED = os.getenv('WEBP_TRANSCODE', '1') != '0'
+WEBP_QUALITY = int(os.getenv('WEBP_QUALITY', '80'))
+# Ancho máximo en píxeles (0 = conservar el ancho original)
+WEBP_MAX_WIDTH = int(os.getenv('WEBP_MAX_WIDTH', '0'))
+# Límite de dimensiones del formato WebP
+WEBP_MAX_DIMENSION = 16383
+
+_executor = None
+
+
+def transcoding_available() -> bool:
+    """Indica si la conversión a WebP está habilitada y Pillow está instalado."""
+    return WEBP_ENABLED and Image is not None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _executor
+
+
+def _convert_to_webp(source_path: str, target_path: str, quality: int, max_width: int) -> Optional[int]:
+    """Convierte una imagen a WebP en un proceso aparte y devuelve el tamaño del resultado."""
+    with Image.open(source_path) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if max_width and image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+        if max(image.size) > WEBP_MAX_DIMENSION:
+            # Las tiras largas de webtoon no caben en WebP; se sube el original
+            return None
+        image.save(target_path, 'WEBP', quality=quality, method=4)
+    return os.path.getsize(target_path)
+
+
+async def optimize_image(source_path: str, content_type: str,
+                         quality: int = None, max_width: int = None) -> Tuple[str, str]:
+    """Convierte una imagen a WebP y devuelve la versión más ligera.
+
+    Args:
+        source_path: Ruta de la imagen original
+        content_type: Content type de la imagen original
+        quality: Calidad WebP (por defecto WEBP_QUALITY)
+        max_width: Ancho máximo (por defecto WEBP_MAX_WIDTH)
+
+    Returns:
+        tuple: (ruta, content type) de la imagen a subir. Si la ruta es distinta
+               de source_path es un archivo temporal que debe borrar quien llama.
+    """
+    if not transcoding_available():
+        return source_path, content_type
+
+    quality = WEBP_QUALITY if quality is None else quality
+    max_width = WEBP_MAX_WIDTH if max_width is None else max_width
+
+    fd, target_path = tempfile.mkstemp(suffix='.webp')
+    os.close(fd)
+    try:
+        loop = asyncio.get_running_loop()
+        optimized_size = await loop.run_in_executor(
+            _get_executor(), _convert_to_webp, source_path, target_path, quality, max_width
+        )
+    except Exception as e:
+        print(f"No se pudo convertir {source_path} a WebP: {e}")
+        optimized_size = None
+
+    original_size = os.path.getsize(source_path)
+    # Decidir cuál imagen subir
+    if optimized_size is not None and optimized_size < original_size:
+        print(f"La imagen optimizada es más ligera: {optimized_size} vs {original_size}")
+        return target_path, 'image/webp'
+
+    if optimized_size is not None:
+        print(f"La imagen original es más ligera o igual: {original_size} vs {optimized_size}")
+    os.remove(target_path)
+    return source_path, content_type
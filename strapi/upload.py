@@ -2,11 +2,18 @@ import os
 import re
 import aiohttp
 import asyncio
+import hashlib
 import json
+import mimetypes
+import tempfile
+from contextlib import asynccontextmanager
 from typing import List, Dict
 from dotenv import load_dotenv
-# Comentado temporalmente para deshabilitar el optimizador
-# from .uploadOptimized import upload_and_get_optimized_url
+from .client import client_session, StrapiSession
+from .transcode import optimize_image, transcoding_available
+from .hash_index import hash_index, sha256_file
+from .journal import get_journal
+from utils.library_index import library_index
 # Cargar variables de entorno
 load_dotenv('.env.local')
 
@@ -21,6 +28,42 @@ if not STRAPI_URL or not STRAPI_TOKEN:
     
 if not STRAPI_URL_API or not STRAPI_TOKEN_API:
     raise ValueError("Las variables STRAPI_URL_API y STRAPI_TOKEN_API deben estar configuradas en .env.local")
+
+# Número de imágenes que se suben a la vez dentro de un capítulo
+UPLOAD_CONCURRENCY = int(os.getenv('STRAPI_UPLOAD_CONCURRENCY', '4'))
+# Límite global de subidas en curso, compartido por todos los capítulos
+MAX_INFLIGHT_UPLOADS = int(os.getenv('STRAPI_MAX_INFLIGHT_UPLOADS', '8'))
+# Tamaño de los bloques con los que se transmiten las imágenes
+STREAM_CHUNK_SIZE = 64 * 1024
+def guess_image_type(header: bytes, filename: str = None) -> str:
+    """Detecta el content type de una imagen por su firma.
+
+    Los scrapers guardan todas las páginas como .jpg aunque el sitio sirva
+    WebP o PNG, así que la extensión del archivo local no es fiable.
+    """
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG'):
+        return 'image/png'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    guessed, _ = mimetypes.guess_type(filename or '')
+    return guessed or 'application/octet-stream'
+
+_global_semaphores = {}
+
+def get_upload_semaphore() -> asyncio.Semaphore:
+    """Devuelve el semáforo global de subidas del event loop actual."""
+    loop = asyncio.get_running_loop()
+    semaphore = _global_semaphores.get(loop)
+    if semaphore is None:
+        _global_semaphores.clear()
+        semaphore = asyncio.Semaphore(max(1, MAX_INFLIGHT_UPLOADS))
+        _global_semaphores[loop] = semaphore
+    return semaphore
+
 class ImageUploader:
     def __init__(self):
         # Configurar headers para ambos servidores
@@ -42,7 +85,7 @@ class ImageUploader:
         # Máximo de fallos consecutivos antes de intentar con el API
         self.max_local_failures = 3
 
-    async def upload_image(self, url: str, path: str = "comic", as_media: bool = False, filename: str = None, retries: int = 3, recursion_level: int = 0) -> Dict:
+    async def upload_image(self, url: str, path: str = "comic", as_media: bool = False, filename: str = None, retries: int = 3, recursion_level: int = 0, local_path: str = None, journal=None) -> Dict:
         # Limitar la recursión para evitar el error de profundidad máxima
         if recursion_level >= 3:
             print(f"ADVERTENCIA: Se alcanzó el límite de recursión para {url}. Devolviendo error.")
@@ -64,34 +107,41 @@ class ImageUploader:
         # Ya no alternamos automáticamente, mantenemos el servidor local como prioridad
         # Solo cambiaremos si hay fallos consecutivos
         
+        # Si el diario registra la página en este servidor, no hace falta ni leerla
+        if as_media and journal is not None and filename:
+            existing = journal.get_image(strapi_url, filename)
+            if existing:
+                print(f"Imagen registrada en el diario ({server_name}, ID: {existing['id']}): {filename}")
+                return [existing]
+        
         for attempt in range(retries):
             try:
-                async with aiohttp.ClientSession() as session:
+                async with client_session() as session:
                     if as_media:
-                        # Descargar la imagen primero
-                        print(f"Descargando imagen desde: {url}")
-                        async with session.get(url) as response:
-                            if response.status != 200:
-                                raise ValueError(f"Error al descargar la imagen desde {url} (Estado: {response.status})")
-                            
-                            content_type = response.headers.get('Content-Type', '')
-                            if not content_type.startswith('image/'):
-                                raise ValueError(f"La URL {url} no corresponde a una imagen (Content-Type: {content_type})")
-                            
-                            image_data = await response.read()
+                        # Usar la copia local si existe; si no, descargar desde la URL de origen.
+                        # La imagen se envía por bloques mientras se lee.
+                        async with self._open_image(session, url, local_path, strapi_url) as (image_stream, content_type, digests, existing):
+                            if existing:
+                                # Mismo contenido ya subido a este servidor: reutilizar el archivo
+                                print(f"Imagen ya subida al servidor {server_name} (ID: {existing['id']}), omitiendo la subida: {filename}")
+                                hash_index.add(strapi_url, digests, existing)
+                                if journal is not None:
+                                    journal.record_image(strapi_url, filename, existing)
+                                return [existing]
                             
                             # Subir la imagen a Strapi
                             form_data = aiohttp.FormData()
                             filename = filename if filename else "image.webp"
-                            if not filename.endswith('.webp'):
-                                filename = filename.split('.')[0] + '.webp'
+                            # La extensión refleja el formato que realmente se sube
+                            extension = mimetypes.guess_extension(content_type.split(';')[0]) or '.webp'
+                            upload_filename = filename.split('.')[0] + extension
                             
                             form_data.add_field('files',
-                                              image_data,
-                                              filename=filename,
+                                              image_stream,
+                                              filename=upload_filename,
                                               content_type=content_type)
                             
-                            print(f"Subiendo imagen a servidor Strapi {server_name}: {filename} en {path}")
+                            print(f"Subiendo imagen a servidor Strapi {server_name}: {upload_filename} en {path}")
                             upload_url = f"{strapi_url}/api/upload"
                             
                             async with session.post(
@@ -120,11 +170,15 @@ class ImageUploader:
                                             print(f"Error al subir a servidor API, volviendo al servidor local...")
                                             self.server_index = 0
                                         # Reintentar con el servidor seleccionado, incrementando el nivel de recursión
-                                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1)
+                                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1, local_path=local_path, journal=journal)
                                     raise ValueError(f"Error al subir la imagen a Strapi {server_name} (Estado {upload_response.status}): {response_text}")
                                 try:
                                     result = await upload_response.json()
                                     print(f"Imagen subida exitosamente al servidor {server_name}")
+                                    if isinstance(result, list) and result:
+                                        hash_index.add(strapi_url, digests, result[0])
+                                        if journal is not None:
+                                            journal.record_image(strapi_url, filename, result[0])
                                     # Si la subida al servidor local fue exitosa, resetear el contador de fallos
                                     if server_name == "local":
                                         if self.local_failures > 0:
@@ -160,39 +214,144 @@ class ImageUploader:
                             # Mantener el servidor local para la próxima imagen a pesar del fallo actual
                             self.server_index = 0
                         # Reintentar con el servidor seleccionado, incrementando el nivel de recursión
-                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1)
+                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1, local_path=local_path, journal=journal)
                     elif server_name == "API":
                         print("Intentando con el servidor local...")
                         self.server_index = 0
                         # Resetear el contador de fallos al volver al servidor local
                         self.local_failures = 0
                         # Reintentar con el servidor seleccionado, incrementando el nivel de recursión
-                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1)
+                        return await self.upload_image(url, path, as_media, filename, 1, recursion_level + 1, local_path=local_path, journal=journal)
                     else:
                         print("Se agotaron los intentos en ambos servidores.")
                         return {'url': url, 'error': str(e)}
 
+    @asynccontextmanager
+    async def _open_image(self, session: aiohttp.ClientSession, url: str, local_path: str = None, strapi_url: str = None):
+        """Abre una imagen como flujo para subirla sin cargarla entera en memoria.
+
+        Si existe la copia local se parte de ella; si no, se descarga desde la
+        URL de origen. Cuando la conversión a WebP o el índice de hashes están
+        activos, la descarga se vuelca por bloques a un archivo temporal; si no,
+        los bytes remotos se reenvían por bloques directamente a Strapi.
+
+        Antes de convertir y de subir se consulta el índice de hashes: si el
+        contenido ya está en el servidor se devuelve el archivo existente en
+        lugar del flujo.
+
+        Yields:
+            tuple: (archivo o iterador asíncrono de bloques, content type,
+                    hashes del contenido, archivo ya subido o None)
+        """
+        temp_paths = []
+        digests = []
+        try:
+            source_digest = None
+            if local_path and os.path.isfile(local_path):
+                print(f"Usando imagen local: {local_path}")
+                source_path = local_path
+                with open(local_path, 'rb') as f:
+                    content_type = guess_image_type(f.read(16), local_path)
+            else:
+                # Descargar la imagen desde el sitio de origen
+                print(f"Descargando imagen desde: {url}")
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        raise ValueError(f"Error al descargar la imagen desde {url} (Estado: {response.status})")
+                    
+                    content_type = response.headers.get('Content-Type', '')
+                    if not content_type.startswith('image/'):
+                        raise ValueError(f"La URL {url} no corresponde a una imagen (Content-Type: {content_type})")
+                    
+                    if not transcoding_available() and not hash_index.enabled:
+                        yield response.content.iter_chunked(STREAM_CHUNK_SIZE), content_type, digests, None
+                        return
+                    
+                    # Volcar la descarga a disco, calculando el hash por el camino
+                    fd, source_path = tempfile.mkstemp()
+                    temp_paths.append(source_path)
+                    sha256 = hashlib.sha256()
+                    with os.fdopen(fd, 'wb') as f:
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            f.write(chunk)
+                            sha256.update(chunk)
+                    source_digest = sha256.hexdigest()
+            
+            if hash_index.enabled:
+                digests.append(source_digest or sha256_file(source_path))
+                existing = hash_index.get(strapi_url, digests[-1])
+                if existing:
+                    yield None, content_type, digests, existing
+                    return
+            
+            upload_path, content_type = await optimize_image(source_path, content_type)
+            if upload_path != source_path:
+                temp_paths.append(upload_path)
+                if hash_index.enabled:
+                    digests.append(sha256_file(upload_path))
+                    existing = hash_index.get(strapi_url, digests[-1])
+                    if existing:
+                        yield None, content_type, digests, existing
+                        return
+            
+            with open(upload_path, 'rb') as f:
+                yield f, content_type, digests, None
+        finally:
+            for temp_path in temp_paths:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
     async def get_image_size(self, url: str) -> int:
-        """Obtiene el tamaño de una imagen en bytes desde su URL."""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
+        """Obtiene el tamaño de una imagen en bytes desde su URL sin descargarla entera.
+
+        Usa Content-Length de una petición HEAD; si el servidor no lo da, pide
+        el primer byte con Range y lee el total de Content-Range. Como último
+        recurso cuenta los bytes del cuerpo por bloques.
+        """
+        async with client_session() as session:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status == 200 and response.content_length:
+                    return response.content_length
+            
+            async with session.get(url, headers={'Range': 'bytes=0-0'}) as response:
+                if response.status == 206:
+                    content_range = response.headers.get('Content-Range', '')
+                    total = content_range.rsplit('/', 1)[-1]
+                    if total.isdigit():
+                        return int(total)
+                elif response.status != 200:
                     print(f"Error al descargar la imagen para obtener tamaño: {url}")
                     return None
-                image_data = await response.read()
-                return len(image_data)
+                elif response.content_length:
+                    return response.content_length
+                
+                size = 0
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                return size
 
-    async def upload_images(self, images: List[Dict], path: str = "comic", as_media: bool = False, retries: int = 3) -> List[Dict]:
-        """Sube múltiples imágenes a Strapi, sin usar el optimizador.
+    async def upload_images(self, images: List[Dict], path: str = "comic", as_media: bool = False, retries: int = 3, concurrency: int = None, local_dir: str = None, journal=None) -> List[Dict]:
+        """Sube múltiples imágenes a Strapi en paralelo.
+
+        Las subidas se lanzan con concurrencia limitada, pero los resultados se
+        evalúan en el orden original, así que se conservan las reglas de antes:
+        los fallos en las dos primeras imágenes se toleran como anuncios y se
+        aborta si falla una imagen posterior sin tener aún más de dos subidas.
 
         Args:
             images: Lista de diccionarios con 'url' y 'filename'.
             path: Ruta en Strapi donde se almacenarán las imágenes.
             as_media: Si True, sube las imágenes como archivos multimedia.
             retries: Número de intentos por imagen.
+            concurrency: Número máximo de subidas simultáneas (por defecto STRAPI_UPLOAD_CONCURRENCY).
+                Además se respeta el límite global STRAPI_MAX_INFLIGHT_UPLOADS entre capítulos.
+            local_dir: Directorio del capítulo; si contiene el 'filename' de una imagen
+                se sube desde disco en lugar de volver a descargarla.
+            journal: Diario del capítulo (ChapterJournal); las páginas registradas
+                no se vuelven a subir y cada subida nueva se anota en él.
             
         Returns:
-            List[Dict]: Lista de resultados o None si hubo un error crítico que detuvo el proceso.
+            List[Dict]: Lista de resultados en el orden de las imágenes o None si hubo un error crítico que detuvo el proceso.
         """
         # Patrones de URL a ignorar
         skip_patterns = [
@@ -204,15 +363,25 @@ class ImageUploader:
             'z.webp'
         ]
         
-        results = []
-        # Contador para las imágenes procesadas (para identificar las primeras dos)
-        image_count = 0
-        # Contador de errores en las primeras dos imágenes
-        first_images_errors = 0
+        if concurrency is None:
+            concurrency = UPLOAD_CONCURRENCY
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        global_semaphore = get_upload_semaphore()
         
-        for image in images:
-            image_count += 1
-            print(f"Procesando imagen {image_count}/{len(images)}: {image['filename']}")
+        async def upload_one(image_count: int, image: Dict) -> Dict:
+            url_to_upload = image['url']
+            
+            local_path = None
+            if local_dir and image.get('filename'):
+                local_path = os.path.join(local_dir, image['filename'])
+            
+            async with semaphore, global_semaphore:
+                print(f"Procesando imagen {image_count}/{len(images)}: {image['filename']}")
+                return await self.upload_image(url_to_upload, path, as_media, image['filename'], retries, local_path=local_path, journal=journal)
+        
+        # Lanzar las subidas conservando el número de cada imagen (para identificar las primeras dos)
+        tasks = []
+        for image_count, image in enumerate(images, 1):
             url_to_upload = image['url']
             
             # Verificar si la URL contiene alguno de los patrones a ignorar
@@ -226,49 +395,48 @@ class ImageUploader:
             if should_skip:
                 continue  # Saltar esta imagen y continuar con la siguiente
             
-            # Comentado temporalmente para deshabilitar el optimizador
-            # optimized_url = upload_and_get_optimized_url(original_url)
-            # 
-            # if not optimized_url:
-            #     print(f"ERROR CRÍTICO: No se pudo optimizar la imagen {original_url}")
-            #     print(f"Deteniendo la subida del capítulo debido a un error crítico.")
-            #     return None  # Detener todo el proceso si no se puede optimizar
-            # 
-            # # Obtener el tamaño de la imagen original
-            # original_size = await self.get_image_size(original_url)
-            # if original_size is None:
-            #     print(f"ERROR CRÍTICO: No se pudo obtener el tamaño de la imagen original {original_url}")
-            #     print(f"Deteniendo la subida del capítulo debido a un error crítico.")
-            #     return None  # Detener todo el proceso si no se puede obtener el tamaño
-            # 
-            # # Obtener el tamaño de la imagen optimizada
-            # optimized_size = await self.get_image_size(optimized_url)
-            # if optimized_size is None:
-            #     print(f"ERROR CRÍTICO: No se pudo obtener el tamaño de la imagen optimizada {optimized_url}")
-            #     print(f"Deteniendo la subida del capítulo debido a un error crítico.")
-            #     return None  # Detener todo el proceso si no se puede obtener el tamaño
-            # 
-            # # Decidir cuál imagen subir
-            # if optimized_size < original_size:
-            #     url_to_upload = optimized_url
-            #     print(f"La imagen optimizada es más ligera: {optimized_size} vs {original_size}")
-            # else:
-            #     url_to_upload = original_url
-            #     print(f"La imagen original es más ligera o igual: {original_size} vs {optimized_size}")
-            
-            filename = image['filename']
-            try:
-                result = await self.upload_image(url_to_upload, path, as_media, filename, retries)
-                if 'error' in result:
+            tasks.append((image_count, image, asyncio.ensure_future(upload_one(image_count, image))))
+        
+        results = []
+        # Contador de errores en las primeras dos imágenes
+        first_images_errors = 0
+        
+        try:
+            # Evaluar los resultados en orden; la decisión sobre la imagen N
+            # solo depende de las imágenes anteriores
+            for image_count, image, task in tasks:
+                filename = image['filename']
+                url_to_upload = image['url']
+                try:
+                    result = await task
+                    if 'error' in result:
+                        # Si es una de las primeras dos imágenes, permitir que falle y continuar
+                        if image_count <= 2:
+                            first_images_errors += 1
+                            print(f"ADVERTENCIA: Falló la subida de la imagen {image_count} (posible anuncio): {filename}")
+                            print(f"Omitiendo esta imagen y continuando con las siguientes...")
+                            continue
+                        else:
+                            # Para el resto de imágenes, mantener el comportamiento original
+                            print(f"ERROR CRÍTICO: Falló la subida de la imagen {filename}: {result['error']}")
+                            # Si ya tenemos suficientes imágenes (más de 2), podemos continuar a pesar del error
+                            if len(results) > 2:
+                                print(f"Ya se han subido {len(results)} imágenes, continuando a pesar del error...")
+                                continue
+                            else:
+                                print(f"Deteniendo la subida del capítulo debido a un error crítico.")
+                                return None  # Detener el proceso solo si no hay suficientes imágenes
+                    results.append(result)
+                except Exception as e:
                     # Si es una de las primeras dos imágenes, permitir que falle y continuar
                     if image_count <= 2:
                         first_images_errors += 1
-                        print(f"ADVERTENCIA: Falló la subida de la imagen {image_count} (posible anuncio): {filename}")
+                        print(f"ADVERTENCIA: Error al subir la imagen {image_count} (posible anuncio) {url_to_upload}: {str(e)}")
                         print(f"Omitiendo esta imagen y continuando con las siguientes...")
                         continue
                     else:
-                        # Para el resto de imágenes, mantener el comportamiento original
-                        print(f"ERROR CRÍTICO: Falló la subida de la imagen {filename}: {result['error']}")
+                        # Para el resto de imágenes, ser más estricto pero aún permitir continuar si ya tenemos suficientes
+                        print(f"ERROR: Error al subir {url_to_upload}: {str(e)}")
                         # Si ya tenemos suficientes imágenes (más de 2), podemos continuar a pesar del error
                         if len(results) > 2:
                             print(f"Ya se han subido {len(results)} imágenes, continuando a pesar del error...")
@@ -276,24 +444,14 @@ class ImageUploader:
                         else:
                             print(f"Deteniendo la subida del capítulo debido a un error crítico.")
                             return None  # Detener el proceso solo si no hay suficientes imágenes
-                results.append(result)
-            except Exception as e:
-                # Si es una de las primeras dos imágenes, permitir que falle y continuar
-                if image_count <= 2:
-                    first_images_errors += 1
-                    print(f"ADVERTENCIA: Error al subir la imagen {image_count} (posible anuncio) {url_to_upload}: {str(e)}")
-                    print(f"Omitiendo esta imagen y continuando con las siguientes...")
-                    continue
-                else:
-                    # Para el resto de imágenes, ser más estricto pero aún permitir continuar si ya tenemos suficientes
-                    print(f"ERROR: Error al subir {url_to_upload}: {str(e)}")
-                    # Si ya tenemos suficientes imágenes (más de 2), podemos continuar a pesar del error
-                    if len(results) > 2:
-                        print(f"Ya se han subido {len(results)} imágenes, continuando a pesar del error...")
-                        continue
-                    else:
-                        print(f"Deteniendo la subida del capítulo debido a un error crítico.")
-                        return None  # Detener el proceso solo si no hay suficientes imágenes
+        finally:
+            # Cancelar las subidas pendientes si se abortó el capítulo
+            pending = [task for _, _, task in tasks if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            # Persistir los hashes de las imágenes subidas
+            hash_index.save()
         return results
         
 # Función principal
@@ -306,7 +464,7 @@ async def main():
         return
     
     # Obtener la lista de comics disponibles
-    comics = [d for d in os.listdir(images_dir) if os.path.isdir(os.path.join(images_dir, d))]
+    comics = [series['name'] for series in library_index.list_series()]
     if not comics:
         print("No se encontraron comics en el directorio 'images'")
         return
@@ -335,13 +493,10 @@ async def main():
         return
     
     # Obtener los capítulos disponibles para el comic seleccionado
-    chapter_dirs = [d for d in os.listdir(manga_path) if os.path.isdir(os.path.join(manga_path, d)) and re.match(r'capitulo_\d+', d)]
-    chapters_available = []
-    for d in chapter_dirs:
-        match = re.search(r'\d+', d)
-        if match:
-            chapters_available.append(int(match.group()))
-    chapters_available.sort()
+    # Los capítulos sin número no pueden elegirse por rango
+    chapters = {chapter['number']: chapter for chapter in library_index.get_chapters(manga_path)
+                if chapter['number'] is not None}
+    chapters_available = sorted(chapters)
 
     if not chapters_available:
         print(f"No se encontraron capítulos para el comic '{comic_choice}'")
@@ -380,43 +535,42 @@ async def main():
         print("No hay capítulos para subir en el rango especificado")
         return
     
-    # Inicializar el uploader
-    uploader = ImageUploader()
+    # Compartir una única sesión HTTP durante toda la subida
+    async with StrapiSession():
+        # Inicializar el uploader
+        uploader = ImageUploader()
     
-    # Crear las carpetas en Strapi y subir los capítulos
-    for chapter_number in chapters_to_upload:
-        path = f"{uploader.base_path}/{comic_choice}/{chapter_number}"
-        folder = None
-        try:
-            # folder_response = await uploader.create_folder(path)
-            # folder = folder_response['data']['currentFolder']
-            print(f"Carpeta {path} creada en Strapi")
-        except Exception as e:
-            print(f"Error al crear la carpeta {path} en Strapi: {str(e)}")
-            continue  # Saltar este capítulo si no se pudo crear la carpeta
+        # Crear las carpetas en Strapi y subir los capítulos
+        for chapter_number in chapters_to_upload:
+            path = f"{uploader.base_path}/{comic_choice}/{chapter_number}"
+            folder = None
+            try:
+                # folder_response = await uploader.create_folder(path)
+                # folder = folder_response['data']['currentFolder']
+                print(f"Carpeta {path} creada en Strapi")
+            except Exception as e:
+                print(f"Error al crear la carpeta {path} en Strapi: {str(e)}")
+                continue  # Saltar este capítulo si no se pudo crear la carpeta
 
-        # Solo proceder si la carpeta se creó correctamente
-        # if folder is None:
-        #     print(f"No se pudo obtener información de la carpeta {path}, omitiendo la subida.")
-        #     continue
+            # Solo proceder si la carpeta se creó correctamente
+            # if folder is None:
+            #     print(f"No se pudo obtener información de la carpeta {path}, omitiendo la subida.")
+            #     continue
 
-        chapter_path = os.path.join(manga_path, f"capitulo_{chapter_number}")
-        meta_file = os.path.join(chapter_path, 'meta.json')
-        if os.path.exists(meta_file):
-            with open(meta_file, 'r') as f:
-                meta_data = json.load(f)
-            
-            images = meta_data.get('images', [])
+            chapter_path = chapters[chapter_number]['directory']
+            images = chapters[chapter_number]['images']
             if not images:
-                print(f"No se encontraron imágenes en {meta_file}")
+                print(f"No se encontraron imágenes en {chapter_path}/meta.json")
                 continue
-            
+        
             # Usar la ruta de la carpeta creada
             upload_path = path
             print(f"Subiendo imágenes para {comic_choice} capítulo {chapter_number} a {upload_path}")
-            
+        
             # Subir las imágenes con reintentos
-            results = await uploader.upload_images(images, upload_path, as_media=True, retries=3)
+            # Retomar desde la última página registrada en el diario de subidas
+            journal = get_journal(manga_path).chapter(chapter_number)
+            results = await uploader.upload_images(images, upload_path, as_media=True, retries=3, local_dir=chapter_path, journal=journal)
             if results is None:
                 print(f"\nERROR: Se detuvo la subida del capítulo {chapter_number} debido a errores en la subida de imágenes.")
                 print(f"Pasando al siguiente capítulo...\n")
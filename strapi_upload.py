@@ -18,6 +18,8 @@ from pathlib import Path
 
 # Importar módulos de Strapi
 from strapi.save import ComicManager, EpisodeManager, save_comic_and_episodes
+from strapi.client import StrapiSession
+from utils.library_index import library_index
 
 # Cargar variables de entorno
 load_dotenv('.env.local')
@@ -50,18 +52,14 @@ async def upload_manga_from_directory(manga_dir):
     manga_name = os.path.basename(manga_dir)
     print(f"\nProcesando manga: {manga_name}")
     
-    # Buscar todos los directorios de capítulos
-    chapter_dirs = [d for d in os.listdir(manga_dir) 
-                   if os.path.isdir(os.path.join(manga_dir, d)) and d.startswith("capitulo_")]
+    # Capítulos del índice de la biblioteca, ya ordenados por número
+    episodes = library_index.get_episodes(manga_dir)
     
-    if not chapter_dirs:
+    if not episodes:
         print(f"No se encontraron capítulos para {manga_name}")
         return
     
-    # Ordenar capítulos por número
-    chapter_dirs.sort(key=lambda x: float(x.split('_')[1]) if x.split('_')[1].replace('.', '', 1).isdigit() else 0)
-    
-    print(f"Se encontraron {len(chapter_dirs)} capítulos")
+    print(f"Se encontraron {len(episodes)} capítulos")
     
     # Datos del cómic para Strapi
     comic_data = {
@@ -75,52 +73,6 @@ async def upload_manga_from_directory(manga_dir):
         'description': manga_name.replace('_', ' ')  # Descripción básica
     }
     
-    # Lista para almacenar datos de episodios
-    episodes = []
-    
-    # Procesar cada capítulo
-    for chapter_dir_name in chapter_dirs:
-        chapter_dir = os.path.join(manga_dir, chapter_dir_name)
-        meta_file = os.path.join(chapter_dir, 'meta.json')
-        
-        if not os.path.exists(meta_file):
-            print(f"No se encontró meta.json en {chapter_dir}")
-            continue
-        
-        # Cargar metadatos del capítulo
-        try:
-            with open(meta_file, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
-            
-            # Extraer información del capítulo
-            chapter_number = metadata.get('chapter_number')
-            if chapter_number is None:
-                # Intentar extraer del nombre del directorio
-                try:
-                    chapter_number = float(chapter_dir_name.split('_')[1])
-                    if chapter_number.is_integer():
-                        chapter_number = int(chapter_number)
-                except:
-                    print(f"No se pudo determinar el número de capítulo para {chapter_dir}")
-                    continue
-            
-            # Crear datos del episodio
-            episode_data = {
-                'episode': chapter_number,
-                'images': metadata.get('images', []),
-            }
-            episodes.append(episode_data)
-            print(f"  - Capítulo {chapter_number} procesado")
-            
-        except Exception as e:
-            print(f"Error al procesar {meta_file}: {str(e)}")
-    
-    if not episodes:
-        print(f"No se pudieron procesar capítulos para {manga_name}")
-        return
-    
-    # Ordenar episodios por número
-    episodes.sort(key=lambda x: x['episode'])
 
     # preguntar a el usuario si quiere subir todos los capitulos o un rango de capitulos 0-33
     print(f"\n¿Qué capítulos deseas subir de {manga_name}?")
@@ -211,9 +163,8 @@ async def main():
         print(f"El directorio {images_dir} no existe")
         return
     
-    # Listar todos los directorios de manga
-    manga_dirs = [os.path.join(images_dir, d) for d in os.listdir(images_dir) 
-                 if os.path.isdir(os.path.join(images_dir, d))]
+    # Listar todos los mangas del índice de la biblioteca
+    manga_dirs = [os.path.join(images_dir, series['name']) for series in library_index.list_series()]
 
     if not manga_dirs:
         print("No se encontraron mangas en el directorio de imágenes")
@@ -234,15 +185,17 @@ async def main():
     try:
         option = int(input("\nSelecciona una opción: "))
         
-        if option == 0:
-            # Subir todos los mangas
-            for manga_dir in manga_dirs:
-                await upload_manga_from_directory(manga_dir)
-        elif 1 <= option <= len(manga_dirs):
-            # Subir un manga específico
-            await upload_manga_from_directory(manga_dirs[option-1])
-        else:
-            print("Opción no válida")
+        # Compartir una única sesión HTTP durante toda la subida
+        async with StrapiSession():
+            if option == 0:
+                # Subir todos los mangas
+                for manga_dir in manga_dirs:
+                    await upload_manga_from_directory(manga_dir)
+            elif 1 <= option <= len(manga_dirs):
+                # Subir un manga específico
+                await upload_manga_from_directory(manga_dirs[option-1])
+            else:
+                print("Opción no válida")
     except ValueError:
         print("Por favor, ingresa un número válido")
     except Exception as e:
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Sincronización incremental de series: compara la lista de capítulos del
+sitio, los capítulos descargados en images/<manga>/ y los episodios de Strapi,
+y solo descarga y sube lo que falta.
+
+Las series se leen de un archivo JSON o JSONL (mismo formato que batch.py)
+con los campos:
+    site:     olympus, m440, inmanga o leercapitulo
+    url:      URL principal de la serie en el sitio
+    manga:    nombre del directorio del manga dentro de images/
+    comic:    documentId del cómic en Strapi (opcional; si se omite se busca
+              por título y solo se usa una coincidencia clara)
+    title:    título para buscar el cómic (por defecto, el nombre del directorio)
+    priority: prioridad de la serie en el planificador (opcional)
+
+Uso:
+    python sync.py series.jsonl [--dry-run] [--no-download] [--no-upload]
+"""
+
+import os
+import re
+import sys
+import json
+import asyncio
+
+from batch import load_jobs, parse_site_limits, DEFAULT_BATCH_WORKERS
+from utils.file_utils import create_directories, overwrite_policy, sanitize_filename
+from utils.download_utils import download_chapters, ensure_connection_pool
+from utils.scheduler import JobScheduler
+
+def _sites():
+    """Tabla por sitio: (índice de capítulos de la serie, descarga de un capítulo)."""
+    from main import scrape_olympus
+    from scrapers.olympus_scraper import get_olympus_chapters
+    from scrapers.m440 import get_m440_chapters
+    from scrapers.m440_scraper import scrape_m440
+    from scrapers.inmanga_scraper import get_inmanga_chapters, scrape_inmanga
+    from scrapers.leercapitulo_scraper import get_leercapitulo_chapters, scrape_leercapitulo
+
+    return {
+        'olympus': (get_olympus_chapters, scrape_olympus),
+        'm440': (get_m440_chapters, scrape_m440),
+        'inmanga': (get_inmanga_chapters, scrape_inmanga),
+        'leercapitulo': (get_leercapitulo_chapters, scrape_leercapitulo),
+    }
+
+def chapter_key(number):
+    """Normaliza un número de capítulo (3, 3.0 y '3' son el mismo capítulo), o None."""
+    try:
+        number = float(number)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+def scan_disk_chapters(manga_dir):
+    """
+    Capítulos descargados de un manga: directorios capitulo_<n> con meta.json.
+
+    Args:
+        manga_dir: Directorio del manga dentro de images/
+
+    Returns:
+        dict: Número de capítulo -> directorio del capítulo
+    """
+    chapters = {}
+    if not os.path.isdir(manga_dir):
+        return chapters
+    for name in os.listdir(manga_dir):
+        match = re.match(r'capitulo_(\d+(?:\.\d+)?)$', name)
+        chapter_dir = os.path.join(manga_dir, name)
+        if match and os.path.exists(os.path.join(chapter_dir, 'meta.json')):
+            chapters[chapter_key(match.group(1))] = chapter_dir
+    return chapters
+
+def load_episode(chapter_dir, number):
+    """Construye los datos de episodio de Strapi a partir del meta.json de un capítulo."""
+    try:
+        with open(os.path.join(chapter_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error al leer {chapter_dir}/meta.json: {str(e)}")
+        return None
+    return {'episode': number, 'images': metadata.get('images', []), 'directory': chapter_dir}
+
+async def resolve_strapi_state(series_list):
+    """
+    Obtiene el documentId del cómic y sus episodios existentes para cada serie.
+
+    Las series sin un cómic identificado con seguridad quedan con
+    'document_id' None y 'unmatched' True, y no se suben. Si fallan las
+    consultas a Strapi quedan con 'error'.
+    """
+    from strapi.client import StrapiSession
+    from strapi.save import ComicManager, EpisodeManager, pick_confident_match
+
+    comic_manager = ComicManager()
+    episode_manager = EpisodeManager()
+
+    async def resolve(series):
+        document_id = series['job'].get('comic')
+        if not document_id:
+            title = series['job'].get('title') or series['job']['manga'].replace('_', ' ')
+            similar = await comic_manager.find_similar_comics(title)
+            choice = pick_confident_match(title, similar)
+            if choice is None:
+                print(f"{series['name']}: no hay un cómic que coincida con seguridad con '{title}'; indica 'comic' para subirlo")
+                series['unmatched'] = True
+                return
+            document_id = similar[choice]['documentId']
+        existing = await episode_manager.get_existing_episodes(document_id)
+        if existing is None:
+            print(f"{series['name']}: no se pudieron obtener los episodios de Strapi")
+            series['error'] = "no se pudieron obtener los episodios de Strapi"
+            return
+        series['document_id'] = document_id
+        series['strapi'] = {chapter_key(number) for number in existing}
+
+    async with StrapiSession():
+        await asyncio.gather(*[resolve(series) for series in series_list])
+    return episode_manager
+
+def sync_series_download(series, sites, download):
+    """Obtiene el índice del sitio y descarga los capítulos que no están en disco ni en Strapi."""
+    get_chapters, scrape_chapter = sites[series['job']['site']]
+    index = get_chapters(series['job']['url'])
+    if not index:
+        print(f"{series['name']}: no se pudo obtener la lista de capítulos del sitio")
+        series['missing'] = []
+        series['error'] = "no se pudo obtener la lista de capítulos del sitio"
+        return series
+
+    present = set(series['disk']) | series['strapi']
+    missing = {}
+    for chapter in index:
+        key = chapter_key(chapter.get('number'))
+        if key is not None and key not in present and key not in missing:
+            missing[key] = chapter
+    series['missing'] = [missing[key] for key in sorted(missing)]
+    print(f"{series['name']}: {len(index)} en el sitio, {len(series['disk'])} en disco, "
+          f"{len(series['strapi'])} en Strapi, {len(series['missing'])} por descargar")
+
+    if download and series['missing']:
+        # Los capítulos que faltan no tienen directorio, así que nunca se pregunta
+        with overwrite_policy('keep'):
+            results = download_chapters(scrape_chapter, series['missing'])
+        series['downloaded'] = sum(1 for result in results if result)
+        titles = {sanitize_filename(result.get('manga_title') or result.get('manga_name')) for result in results
+                  if isinstance(result, dict) and (result.get('manga_title') or result.get('manga_name'))}
+        if titles - {series['job']['manga']}:
+            print(f"{series['name']}: los capítulos se guardaron en {', '.join(sorted(titles))}; "
+                  f"revisa el campo 'manga' de la serie")
+        # Volver a leer el disco: el scraper decide el nombre final del directorio
+        series['disk'] = scan_disk_chapters(series['manga_dir'])
+    return series
+
+async def upload_series(series_list, episode_manager):
+    """Sube a Strapi los capítulos que están en disco y no en Strapi."""
+    from strapi.client import StrapiSession
+    from strapi.save import upload_episodes
+
+    async with StrapiSession():
+        for series in series_list:
+            if not series.get('document_id'):
+                continue
+            pending = sorted(key for key in series['disk'] if key not in series['strapi'])
+            if not pending:
+                continue
+            episodes = [load_episode(series['disk'][key], key) for key in pending]
+            episodes = [episode for episode in episodes if episode]
+            print(f"\n{series['name']}: subiendo {len(episodes)} capítulos a Strapi...")
+            result = await upload_episodes(series['document_id'], episodes, episode_manager)
+            if 'error' in result:
+                series['upload_error'] = result['error']
+            else:
+                series['uploaded'] = result.get('created', 0)
+                # Los que ya existían también están ya en Strapi
+                series['strapi'].update(pending)
+
+def run_sync(jobs, download=True, upload=True, dry_run=False, workers=None):
+    """
+    Sincroniza una lista de series.
+
+    Args:
+        jobs: Series a sincronizar (ver el docstring del módulo)
+        download: Si es True, descarga los capítulos que faltan
+        upload: Si es True, sube a Strapi los capítulos que faltan allí
+        dry_run: Si es True, solo muestra las diferencias
+        workers: Series que se procesan a la vez (por defecto BATCH_WORKERS)
+
+    Returns:
+        list: Estado de cada serie
+    """
+    create_directories()
+    sites = _sites()
+    series_list = []
+    for job in jobs:
+        if not isinstance(job, dict) or job.get('site') not in sites or not job.get('url') or not job.get('manga'):
+            print(f"Serie omitida (se necesitan site, url y manga): {job}")
+            continue
+        series_list.append({
+            'job': job,
+            'name': job['manga'],
+            'manga_dir': os.path.join('images', job['manga']),
+            'disk': scan_disk_chapters(os.path.join('images', job['manga'])),
+            'strapi': set(),
+            'document_id': None,
+        })
+
+    # 1. Estado de Strapi de todas las series, en paralelo
+    episode_manager = None
+    if upload:
+        episode_manager = asyncio.run(resolve_strapi_state(series_list))
+
+    # 2. Índices de los sitios y descargas, respetando el límite de cada sitio
+    if download and not dry_run:
+        ensure_connection_pool(jobs=min(workers or DEFAULT_BATCH_WORKERS, len(series_list)))
+    with JobScheduler(workers or DEFAULT_BATCH_WORKERS, parse_site_limits(os.getenv('BATCH_SITE_LIMITS'))) as scheduler:
+        futures = [
+            scheduler.submit(series['job']['site'], sync_series_download, series, sites,
+                             download and not dry_run, priority=series['job'].get('priority', 0))
+            for series in series_list
+        ]
+        for series, future in zip(series_list, futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{series['name']}: error al sincronizar: {str(e)}")
+                series['error'] = str(e)
+
+    # 3. Subidas, en orden de capítulo dentro de cada serie
+    if upload and not dry_run:
+        asyncio.run(upload_series(series_list, episode_manager))
+
+    print("\nResumen de la sincronización:")
+    for series in series_list:
+        pending_upload = sum(1 for key in series['disk'] if key not in series['strapi'])
+        status = (f"{len(series.get('missing', []))} nuevos en el sitio, "
+                  f"{series.get('downloaded', 0)} descargados")
+        if upload:
+            status += (f", {series.get('uploaded', 0)} subidos" if not dry_run
+                       else f", {pending_upload} por subir")
+        if series.get('upload_error') or series.get('error'):
+            status += f" (error: {series.get('upload_error') or series.get('error')})"
+        print(f"  - {series['name']}: {status}")
+    return series_list
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    flags = {arg for arg in sys.argv[1:] if arg.startswith('--')}
+    if not args:
+        print("Uso: python sync.py <series.json|series.jsonl> [--dry-run] [--no-download] [--no-upload]")
+        sys.exit(1)
+    if not os.path.exists(args[0]):
+        print(f"Error: El archivo {args[0]} no existe")
+        sys.exit(1)
+    run_sync(load_jobs(args[0]), download='--no-download' not in flags,
+             upload='--no-upload' not in flags, dry_run='--dry-run' in flags)
@@ -6,4 +6,6 @@ Módulo de utilidades para el scraper de mangas.
 """
 
 from .file_utils import *
-from .http_utils import *
\ No newline at end of file
+from .http_utils import *
+from .download_utils import *
+from .scheduler import *
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Pool de navegador Playwright de larga duración.
+
+Un único Chromium se inicia la primera vez que se necesita y se mantiene
+abierto en un bucle de eventos propio, en un hilo en segundo plano. Los
+contextos se reutilizan (con una página ya abierta cada uno) y se reciclan
+tras un número de usos, de modo que las consultas repetidas solo pagan el
+arranque del navegador una vez.
+"""
+
+import os
+import atexit
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+
+# Contextos (y por tanto páginas) que pueden usarse a la vez
+DEFAULT_BROWSER_CONTEXTS = int(os.getenv('BROWSER_CONTEXTS', '2'))
+# Usos de un contexto antes de cerrarlo y crear uno nuevo (libera memoria)
+DEFAULT_CONTEXT_MAX_USES = int(os.getenv('BROWSER_CONTEXT_MAX_USES', '25'))
+# Tipos de recurso que no se descargan: no hacen falta para leer el DOM
+DEFAULT_BLOCKED_RESOURCES = ('image', 'font', 'stylesheet', 'media')
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+DEFAULT_VIEWPORT = {"width": 1920, "height": 1080}
+
+class BrowserPool:
+    """
+    Navegador compartido con contextos precalentados.
+
+    Las corrutinas que usan el navegador se ejecutan siempre en el bucle del
+    pool; desde código síncrono se lanzan con run() y desde otro bucle con
+    call().
+    """
+
+    def __init__(self, max_contexts=DEFAULT_BROWSER_CONTEXTS, max_uses=DEFAULT_CONTEXT_MAX_USES,
+                 blocked_resources=DEFAULT_BLOCKED_RESOURCES, headless=True):
+        self.max_contexts = max(1, int(max_contexts))
+        self.max_uses = max(1, int(max_uses))
+        self.blocked_resources = frozenset(blocked_resources or ())
+        self.headless = headless
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._start_lock = None
+        self._slots = None
+        self._idle = []
+
+    def _ensure_loop(self):
+        """Arranca el hilo con el bucle de eventos del pool si no existe."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """Programa una corrutina en el bucle del pool y devuelve un concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro):
+        """Ejecuta una corrutina en el bucle del pool y espera su resultado (uso síncrono)."""
+        return self.submit(coro).result()
+
+    async def call(self, coro):
+        """Ejecuta una corrutina en el bucle del pool desde cualquier otro bucle."""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    async def _start(self):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_contexts)
+        async with self._start_lock:
+            if self._browser is None or not self._browser.is_connected():
+                from playwright.async_api import async_playwright
+                if self._playwright is None:
+                    self._playwright = await async_playwright().start()
+                print("Iniciando navegador compartido...")
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+                self._idle = []
+
+    async def _block_resources(self, route):
+        if route.request.resource_type in self.blocked_resources:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _new_slot(self):
+        """Crea un contexto con su página y el bloqueo de recursos configurado."""
+        context = await self._browser.new_context(viewport=DEFAULT_VIEWPORT, user_agent=DEFAULT_USER_AGENT)
+        if self.blocked_resources:
+            await context.route("**/*", self._block_resources)
+        page = await context.new_page()
+        return {'context': context, 'page': page, 'uses': 0}
+
+    async def _close_slot(self, slot):
+        try:
+            await slot['context'].close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Presta una página de un contexto precalentado.
+
+        Debe usarse dentro del bucle del pool (a través de run() o call()).
+        Si el bloque falla, el contexto se descarta en lugar de reutilizarse.
+        """
+        await self._start()
+        async with self._slots:
+            slot = self._idle.pop() if self._idle else None
+            if slot is None or slot['page'].is_closed():
+                if slot is not None:
+                    await self._close_slot(slot)
+                slot = await self._new_slot()
+
+            slot['uses'] += 1
+            healthy = False
+            try:
+                yield slot['page']
+                healthy = True
+            finally:
+                if healthy and slot['uses'] < self.max_uses and self._browser.is_connected():
+                    self._idle.append(slot)
+                else:
+                    await self._close_slot(slot)
+
+    async def _close(self):
+        for slot in self._idle:
+            await self._close_slot(slot)
+        self._idle = []
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def close(self):
+        """Cierra el navegador y detiene el bucle del pool."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout=30)
+        except Exception as e:
+            print(f"Error al cerrar el navegador compartido: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=5)
+        self._start_lock = None
+        self._slots = None
+
+# Pool global del proceso
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
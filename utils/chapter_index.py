@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Almacén de índices de capítulos por serie, compartido por los get_*_chapters
+de todos los sitios.
+
+Cada serie tiene su propio archivo JSONL de solo anexado: una línea por
+capítulo y una línea por cada consulta al sitio (con su fecha). Mientras el
+índice no caduque no se consulta el sitio. Al refrescarlo se vuelve a
+obtener y analizar la lista completa de capítulos del sitio (la única forma
+de ver capítulos insertados o con la URL cambiada); lo incremental es la
+escritura: solo se anexan los capítulos que no estaban (o cuya URL cambió),
+así que no se reescribe la serie completa ni se lee el índice de otras
+series. Cada CHAPTER_INDEX_REBUILD_INTERVAL segundos el refresco reescribe el
+índice entero para descartar los capítulos retirados del sitio.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+# Directorio de los índices y tiempo de validez (segundos)
+CHAPTER_INDEX_DIR = os.getenv('CHAPTER_INDEX_DIR', os.path.join('images', '.chapter_index'))
+CHAPTER_INDEX_TTL = int(os.getenv('CHAPTER_INDEX_TTL', '3600'))
+# Cada cuánto un refresco reescribe el índice completo (segundos)
+CHAPTER_INDEX_REBUILD_INTERVAL = int(os.getenv('CHAPTER_INDEX_REBUILD_INTERVAL', str(7 * 24 * 3600)))
+
+def _chapter_key(chapter):
+    """Clave de un capítulo: su número (el 0 es un prólogo válido) o, si no tiene uno válido, su URL."""
+    try:
+        number = float(chapter.get('number'))
+    except (TypeError, ValueError):
+        number = None
+    if number is not None and number >= 0:
+        return str(int(number)) if number.is_integer() else str(number)
+    return 'url:' + chapter.get('url', '')
+
+def _number(chapter):
+    try:
+        return float(chapter.get('number'))
+    except (TypeError, ValueError):
+        return 0.0
+
+class SeriesIndex:
+    """Índice de capítulos de una serie, reconstruido desde su archivo JSONL."""
+
+    def __init__(self, path):
+        self.path = path
+        self.chapters = {}
+        self.fetched_at = 0.0
+        self.rebuilt_at = 0.0
+        self._replay()
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Línea incompleta si el proceso murió mientras escribía
+                    continue
+                if entry.get('type') == 'chapter':
+                    chapter = entry['chapter']
+                    self.chapters[_chapter_key(chapter)] = chapter
+                elif entry.get('type') == 'refresh':
+                    self.fetched_at = entry.get('fetched_at', 0.0)
+                    if entry.get('full'):
+                        self.rebuilt_at = self.fetched_at
+
+    def is_fresh(self, ttl):
+        return bool(self.chapters) and time.time() - self.fetched_at < ttl
+
+    def sorted_chapters(self):
+        """Capítulos ordenados por número."""
+        return sorted(self.chapters.values(), key=_number)
+
+    def _write(self, path, entries, mode):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, mode, encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+
+    def append(self, site, url, chapters):
+        """
+        Anexa los capítulos que no estaban en el índice o cuya URL cambió
+        (la línea más reciente prevalece al reproducir el archivo) y registra
+        la consulta.
+
+        Returns:
+            int: Número de capítulos nuevos o actualizados
+        """
+        new_chapters = [chapter for chapter in chapters
+                        if self.chapters.get(_chapter_key(chapter), {}).get('url') != chapter.get('url')]
+        self.fetched_at = time.time()
+        entries = [{'type': 'chapter', 'chapter': chapter} for chapter in new_chapters]
+        entries.append({'type': 'refresh', 'site': site, 'url': url, 'fetched_at': self.fetched_at,
+                        'new': len(new_chapters)})
+        self._write(self.path, entries, 'a')
+        for chapter in new_chapters:
+            self.chapters[_chapter_key(chapter)] = chapter
+        return len(new_chapters)
+
+    def replace(self, site, url, chapters):
+        """Reescribe el índice completo (para descartar capítulos retirados del sitio)."""
+        self.chapters = {_chapter_key(chapter): chapter for chapter in chapters}
+        self.fetched_at = time.time()
+        entries = [{'type': 'chapter', 'chapter': chapter} for chapter in self.chapters.values()]
+        entries.append({'type': 'refresh', 'site': site, 'url': url, 'fetched_at': self.fetched_at,
+                        'new': len(entries), 'full': True})
+        self.rebuilt_at = self.fetched_at
+        temp_path = self.path + '.tmp'
+        self._write(temp_path, entries, 'w')
+        os.replace(temp_path, self.path)
+
+class ChapterIndexStore:
+    """Índices de capítulos de todas las series, un archivo por serie."""
+
+    def __init__(self, directory=CHAPTER_INDEX_DIR, ttl=CHAPTER_INDEX_TTL,
+                 rebuild_interval=CHAPTER_INDEX_REBUILD_INTERVAL):
+        self.directory = directory
+        self.ttl = ttl
+        self.rebuild_interval = rebuild_interval
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _path(self, site, url):
+        series_key = hashlib.sha1(url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{site}_{series_key}.jsonl")
+
+    def _lock(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @contextmanager
+    def max_age(self, seconds):
+        """
+        Dentro del bloque (y solo en este hilo) los índices con más de seconds
+        segundos se consideran caducados. Con 0 siempre se consulta la lista
+        completa del sitio, pero solo se anexan al archivo los capítulos nuevos.
+        """
+        previous = getattr(self._local, 'max_age', None)
+        self._local.max_age = seconds
+        try:
+            yield
+        finally:
+            self._local.max_age = previous
+
+    def series(self, site, url):
+        """Carga el índice de una serie (solo lee el archivo de esa serie)."""
+        return SeriesIndex(self._path(site, url))
+
+    def get_chapters(self, site, url, fetch, refresh=False):
+        """
+        Devuelve el índice de capítulos de una serie, consultando el sitio solo si hace falta.
+
+        Args:
+            site: Nombre del sitio ('olympus', 'm440', ...)
+            url: URL principal de la serie
+            fetch: Función que obtiene la lista de capítulos del sitio a partir de la URL
+            refresh: Si es True, consulta el sitio y reescribe el índice completo
+                     (también ocurre si la última reescritura es más antigua
+                     que rebuild_interval)
+
+        Returns:
+            list: Capítulos ordenados por número, o None si no hay índice ni se pudo obtener
+        """
+        path = self._path(site, url)
+        with self._lock(path):
+            series = SeriesIndex(path)
+            ttl = getattr(self._local, 'max_age', None)
+            if not refresh and series.is_fresh(self.ttl if ttl is None else ttl):
+                print(f"Usando el índice guardado de {url} ({len(series.chapters)} capítulos)")
+                return series.sorted_chapters()
+
+            chapters = fetch(url)
+            if not chapters:
+                if series.chapters:
+                    # Mejor un índice caducado que ninguno
+                    print(f"No se pudo actualizar el índice de {url}; se usa el guardado")
+                    return series.sorted_chapters()
+                return chapters
+
+            if refresh or time.time() - series.rebuilt_at >= self.rebuild_interval:
+                series.replace(site, url, chapters)
+                print(f"Índice de {url} reescrito: {len(series.chapters)} capítulos")
+            else:
+                new_count = series.append(site, url, chapters)
+                print(f"Índice de {url} actualizado: {new_count} capítulos nuevos o modificados")
+            return series.sorted_chapters()
+
+# Almacén global del proceso
+chapter_index = ChapterIndexStore()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Motor de descarga concurrente de las páginas de un capítulo y de los
+capítulos de un rango.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .file_utils import download_image, get_overwrite_policy, overwrite_policy
+from .http_utils import configure_session_pool
+
+# Número de hilos por capítulo y límite de descargas simultáneas por host
+DEFAULT_MAX_WORKERS = 6
+DEFAULT_HOST_CONCURRENCY = 4
+# Capítulos que se procesan a la vez cuando se conoce el índice de la serie
+DEFAULT_CHAPTER_WORKERS = int(os.getenv('CHAPTER_WORKERS', '3'))
+
+_host_semaphores = {}
+_host_limits = {}
+_host_lock = threading.Lock()
+
+def ensure_connection_pool(jobs=1, chapter_workers=DEFAULT_CHAPTER_WORKERS, image_workers=DEFAULT_MAX_WORKERS):
+    """
+    Dimensiona el pool de conexiones para las descargas que pueden coincidir.
+    
+    Args:
+        jobs: Trabajos (series) que se ejecutan a la vez
+        chapter_workers: Capítulos simultáneos por trabajo
+        image_workers: Imágenes simultáneas por capítulo
+    """
+    configure_session_pool(max(1, jobs) * max(1, chapter_workers) * max(1, image_workers))
+
+def set_host_concurrency(host, limit):
+    """Configura el número máximo de descargas simultáneas para un host.
+
+    Args:
+        host: Nombre del host (ej. 'm440.in')
+        limit: Número máximo de descargas simultáneas
+    """
+    with _host_lock:
+        _host_limits[host] = max(1, int(limit))
+        # El semáforo se recrea con el nuevo límite en el siguiente uso
+        _host_semaphores.pop(host, None)
+
+def _get_host_semaphore(url):
+    """Devuelve el semáforo compartido que limita las descargas hacia el host de la URL."""
+    host = urlparse(url).netloc
+    with _host_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            limit = _host_limits.get(host, DEFAULT_HOST_CONCURRENCY)
+            semaphore = threading.BoundedSemaphore(limit)
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def _download_page(session, url, part_path, headers):
+    """Descarga una página a un archivo temporal respetando el límite del host."""
+    with _get_host_semaphore(url):
+        return download_image(session, url, part_path, headers)
+
+def download_chapter_images(session, images, chapter_dir, headers=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Descarga concurrentemente las imágenes de un capítulo.
+
+    Cada página se descarga a un archivo '.part' y se renombra a su nombre final
+    siguiendo el orden de las páginas, de modo que el directorio del capítulo
+    siempre contiene un prefijo continuo de páginas completas. Al terminar se
+    actualiza el capítulo en el índice de la biblioteca, que lo marca como
+    completo solo si están todas sus páginas.
+
+    Args:
+        session: Sesión HTTP a utilizar
+        images: Lista de diccionarios con 'url' y 'filename' (y opcionalmente 'number')
+        chapter_dir: Directorio donde se guardarán las imágenes
+        headers: Cabeceras adicionales para las peticiones
+        max_workers: Número máximo de descargas simultáneas para el capítulo
+
+    Returns:
+        list: Estado de cada página en el orden original, con las claves
+              'number', 'url', 'filename', 'path' y 'success'
+    """
+    results = []
+    if not images:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(images)))) as executor:
+        futures = []
+        for index, image in enumerate(images, 1):
+            file_path = os.path.join(chapter_dir, image['filename'])
+            future = executor.submit(_download_page, session, image['url'], file_path + '.part', headers)
+            futures.append((index, image, file_path, future))
+
+        # Confirmar los archivos en orden de página a medida que terminan
+        for index, image, file_path, future in futures:
+            number = image.get('number', index)
+            try:
+                success = future.result()
+            except Exception as e:
+                print(f"Error al descargar la imagen {number}: {str(e)}")
+                success = False
+
+            part_path = file_path + '.part'
+            if success:
+                os.replace(part_path, file_path)
+                print(f"Guardada imagen {number}/{len(images)}")
+            else:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                print(f"Error al descargar la imagen {number}: {image['url']}")
+
+            results.append({
+                'number': number,
+                'url': image['url'],
+                'filename': image['filename'],
+                'path': file_path,
+                'success': success
+            })
+
+    # El meta.json suele guardarse antes de descargar: registrar el resultado real
+    if os.path.exists(os.path.join(chapter_dir, 'meta.json')):
+        from .library_index import library_index
+        try:
+            library_index.record_chapter(chapter_dir)
+        except Exception as e:
+            print(f"No se pudo actualizar el índice de la biblioteca para {chapter_dir}: {str(e)}")
+
+    return results
+
+def _chapter_key(number):
+    try:
+        return float(number)
+    except (TypeError, ValueError):
+        return None
+
+def select_following_chapters(chapters, current_url, current_number, max_chapters=float('inf')):
+    """
+    Selecciona del índice de la serie los capítulos posteriores al actual.
+
+    El capítulo actual se localiza por su URL y, si no aparece en el índice,
+    por su número. Los capítulos con el mismo número se descargan una sola vez.
+
+    Args:
+        chapters: Índice de capítulos con 'number' y 'url'
+        current_url: URL del capítulo ya descargado
+        current_number: Número del capítulo ya descargado
+        max_chapters: Número máximo de capítulos a devolver
+
+    Returns:
+        list: Capítulos siguientes ordenados por número, o None si no se pudo
+              situar el capítulo actual en el índice
+    """
+    ordered = sorted(
+        (chapter for chapter in chapters if _chapter_key(chapter.get('number')) is not None),
+        key=lambda chapter: _chapter_key(chapter['number'])
+    )
+
+    current = None
+    normalized_url = (current_url or '').rstrip('/')
+    for chapter in ordered:
+        if chapter.get('url', '').rstrip('/') == normalized_url:
+            current = _chapter_key(chapter['number'])
+            break
+    if current is None:
+        current = _chapter_key(current_number)
+        if current is None:
+            return None
+
+    following = []
+    seen = {current}
+    for chapter in ordered:
+        number = _chapter_key(chapter['number'])
+        if number > current and number not in seen:
+            seen.add(number)
+            following.append(chapter)
+
+    if max_chapters != float('inf'):
+        following = following[:max(0, int(max_chapters))]
+    return following
+
+def download_chapters(scrape_chapter, chapters, download_images=True, max_workers=DEFAULT_CHAPTER_WORKERS):
+    """
+    Descarga en paralelo una lista de capítulos ya resuelta.
+
+    Cada capítulo se procesa con la función de un solo capítulo del sitio; el
+    limitador por host sigue espaciando las peticiones, así que el paralelismo
+    solo elimina la espera en cadena de seguir el enlace "siguiente".
+
+    Args:
+        scrape_chapter: Función que descarga un capítulo a partir de su URL
+        chapters: Capítulos con 'url' (y opcionalmente 'number')
+        download_images: Si es True, descarga las imágenes de cada capítulo
+        max_workers: Número máximo de capítulos simultáneos
+
+    Returns:
+        list: Resultado de scrape_chapter para cada capítulo, en el orden dado
+              (None si el capítulo falló)
+    """
+    if not chapters:
+        return []
+
+    # Los hilos nuevos no heredan la política de sobreescritura del que llama
+    policy = get_overwrite_policy()
+
+    def run(chapter):
+        print(f"\n=== Procesando capítulo {chapter.get('number', '?')}: {chapter['url']} ===")
+        with overwrite_policy(policy):
+            try:
+                return scrape_chapter(chapter['url'], download_images)
+            except Exception as e:
+                print(f"Error al procesar el capítulo {chapter['url']}: {str(e)}")
+                return None
+
+    if download_images:
+        ensure_connection_pool(chapter_workers=min(max_workers, len(chapters)))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chapters)))) as executor:
+        return list(executor.map(run, chapters))
+
+def download_following_chapters(scrape_chapter, chapter_info, current_url, index,
+                                download_images=True, max_chapters=float('inf')):
+    """
+    Descarga en paralelo los capítulos del índice que siguen al ya descargado.
+
+    Args:
+        scrape_chapter: Función que descarga un capítulo a partir de su URL
+        chapter_info: Información devuelta al descargar el capítulo actual
+        current_url: URL del capítulo actual
+        index: Índice de capítulos de la serie (o None si no se pudo obtener)
+        download_images: Si es True, descarga las imágenes de cada capítulo
+        max_chapters: Número máximo de capítulos adicionales
+
+    Returns:
+        list: Información de los capítulos descargados correctamente, o None si
+              el índice no sirve y hay que recorrer los enlaces "siguiente"
+    """
+    if not index:
+        return None
+    chapters = select_following_chapters(index, current_url, chapter_info.get('chapter_number'), max_chapters)
+    if chapters is None:
+        print("No se encontró el capítulo actual en el índice de la serie.")
+        return None
+
+    print(f"Índice de la serie: {len(chapters)} capítulos por descargar en paralelo.")
+    results = download_chapters(scrape_chapter, chapters, download_images)
+    return [result for result in results if result]
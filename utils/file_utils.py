@@ -9,11 +9,47 @@ import os
 import json
 import sys
 import re
+import threading
+from contextlib import contextmanager
+
+from .http_utils import rate_limited_get, get_session, THROTTLE_STATUS_CODES
+
+# Qué hacer cuando el directorio de un capítulo ya tiene contenido
+OVERWRITE_POLICIES = ('ask', 'keep', 'overwrite')
+
+# Política por hilo, para que cada trabajo del modo por lotes use la suya
+_overwrite_state = threading.local()
+# Evita que varios capítulos descargados en paralelo pregunten a la vez
+_prompt_lock = threading.Lock()
+
+def get_overwrite_policy():
+    """Devuelve la política de sobreescritura del hilo actual ('ask' por defecto)."""
+    return getattr(_overwrite_state, 'policy', 'ask')
+
+def set_overwrite_policy(policy):
+    """Fija la política de sobreescritura del hilo actual.
+
+    Args:
+        policy: 'ask' (preguntar), 'keep' (usar el directorio existente)
+                u 'overwrite' (eliminar el contenido actual)
+    """
+    if policy not in OVERWRITE_POLICIES:
+        raise ValueError(f"Política de sobreescritura no válida: {policy}")
+    _overwrite_state.policy = policy
+
+@contextmanager
+def overwrite_policy(policy):
+    """Aplica una política de sobreescritura solo dentro de un bloque with."""
+    previous = get_overwrite_policy()
+    set_overwrite_policy(policy)
+    try:
+        yield
+    finally:
+        set_overwrite_policy(previous)
 
 def create_directories():
     """Crea el directorio principal para guardar imágenes si no existe."""
-    if not os.path.exists('images'):
-        os.mkdir('images')
+    os.makedirs('images', exist_ok=True)
     return os.path.abspath('images')
 
 def sanitize_filename(filename):
@@ -29,8 +65,7 @@ def create_manga_directory(manga_title):
     images_dir = create_directories()
     manga_dir = os.path.join(images_dir, sanitize_filename(manga_title))
     
-    if not os.path.exists(manga_dir):
-        os.mkdir(manga_dir)
+    os.makedirs(manga_dir, exist_ok=True)
     
     return manga_dir
 
@@ -63,11 +98,17 @@ def create_chapter_directory(manga_title, chapter_number, chapter_title=None, fo
         has_content = len(os.listdir(chapter_dir)) > 0
         
         if has_content and not force_new:
-            # Preguntar al usuario qué hacer
-            action = input(f"El directorio para {manga_title} - Capítulo {chapter_number} ya existe. ¿Qué deseas hacer?\n"
-                          f"1. Usar el directorio existente\n"
-                          f"2. Sobreescribir (eliminar contenido actual)\n"
-                          f"Selecciona una opción (1/2): ")
+            policy = get_overwrite_policy()
+            if policy == 'ask':
+                # Preguntar al usuario qué hacer
+                with _prompt_lock:
+                    action = input(f"El directorio para {manga_title} - Capítulo {chapter_number} ya existe. ¿Qué deseas hacer?\n"
+                                  f"1. Usar el directorio existente\n"
+                                  f"2. Sobreescribir (eliminar contenido actual)\n"
+                                  f"Selecciona una opción (1/2): ")
+            else:
+                # Modo no interactivo: aplicar la política configurada
+                action = "2" if policy == 'overwrite' else "1"
             
             if action == "2":
                 # Eliminar archivos existentes (excepto meta.json para preservar metadatos)
@@ -81,7 +122,7 @@ def create_chapter_directory(manga_title, chapter_number, chapter_title=None, fo
                 print(f"Usando directorio existente: {chapter_dir}")
     else:
         # Crear directorio si no existe
-        os.mkdir(chapter_dir)
+        os.makedirs(chapter_dir, exist_ok=True)
     
     return chapter_dir
 
@@ -90,14 +131,33 @@ def save_metadata(directory, metadata):
     meta_file = os.path.join(directory, 'meta.json')
     with open(meta_file, 'w', encoding='utf-8') as f:
         json.dump(metadata, f, ensure_ascii=False, indent=4)
+    
+    # Mantener al día el índice de la biblioteca (nunca debe interrumpir la descarga)
+    from .library_index import library_index
+    try:
+        library_index.record_chapter(directory, metadata)
+    except Exception as e:
+        print(f"No se pudo actualizar el índice de la biblioteca para {directory}: {str(e)}")
 
-def download_image(session, url, file_path, headers=None):
-    """Descarga una imagen desde una URL y la guarda en el archivo especificado."""
+def download_image(session, url, file_path, headers=None, retries=3):
+    """Descarga una imagen desde una URL y la guarda en el archivo especificado.
+    
+    Si no se indica sesión se usa la sesión compartida del proceso.
+    """
     try:
+        if session is None:
+            session = get_session()
         if headers is None:
             headers = {}
         
-        response = session.get(url, headers=headers, stream=True)
+        # Reintentar solo cuando el servidor pide bajar el ritmo (429/503);
+        # el limitador ya espera lo indicado por Retry-After
+        for attempt in range(retries):
+            response = rate_limited_get(session, url, headers=headers, stream=True)
+            if response.status_code not in THROTTLE_STATUS_CODES:
+                break
+            response.close()
+        
         if response.status_code == 200:
             with open(file_path, 'wb') as f:
                 for chunk in response.iter_content(1024):
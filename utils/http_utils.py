@@ -6,10 +6,14 @@ Utilidades para operaciones HTTP y manejo de sesiones web.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
 import time
 import random
+import threading
+
+from .rate_limiter import rate_limiter, configure_host_rate, THROTTLE_STATUS_CODES
 
 def create_session():
     """Crea una sesión HTTP con cabeceras que simulan un navegador moderno."""
@@ -28,6 +32,116 @@ def create_session():
     session.headers.update(headers)
     return session
 
+# Tamaño del pool de conexiones keep-alive por host; debe cubrir el número
+# de hilos que descargan a la vez
+DEFAULT_POOL_SIZE = 16
+# Número de hosts distintos cuyos pools se mantienen abiertos
+DEFAULT_POOL_HOSTS = 32
+
+_pool_size = DEFAULT_POOL_SIZE
+_shared_adapter = None
+_host_adapters = {}
+_shared_session = None
+_session_lock = threading.Lock()
+
+def _new_adapter(pool_size):
+    return HTTPAdapter(pool_connections=DEFAULT_POOL_HOSTS, pool_maxsize=pool_size)
+
+def _mount_adapters(session):
+    """Monta en la sesión los adaptadores compartidos del proceso."""
+    global _shared_adapter
+    if _shared_adapter is None:
+        _shared_adapter = _new_adapter(_pool_size)
+    session.mount('http://', _shared_adapter)
+    session.mount('https://', _shared_adapter)
+    for prefix, adapter in _host_adapters.items():
+        session.mount(prefix, adapter)
+
+def configure_session_pool(pool_size):
+    """
+    Ajusta el tamaño del pool de conexiones al número de hilos de trabajo.
+    
+    El pool solo crece: si ya es suficiente no se hace nada, de modo que un
+    llamador anidado (un trabajo dentro de un lote) no lo reduce. Las
+    sesiones ya creadas conservan el pool anterior.
+    
+    Args:
+        pool_size: Número máximo de conexiones keep-alive por host
+    """
+    global _pool_size, _shared_adapter, _shared_session
+    with _session_lock:
+        if int(pool_size) <= _pool_size:
+            return
+        _pool_size = int(pool_size)
+        _shared_adapter = None
+        _shared_session = None
+
+def mount_host_adapter(host, pool_size=None, scheme='https'):
+    """
+    Reserva un adaptador con pool propio para un host concreto (p. ej. el CDN de imágenes).
+    
+    Args:
+        host: Nombre del host
+        pool_size: Conexiones keep-alive para ese host (por defecto, el tamaño global)
+        scheme: Esquema de las URLs del host
+    """
+    prefix = f"{scheme}://{host}/"
+    with _session_lock:
+        adapter = _new_adapter(pool_size or _pool_size)
+        _host_adapters[prefix] = adapter
+        if _shared_session is not None:
+            _shared_session.mount(prefix, adapter)
+
+def get_session(headers=None):
+    """
+    Devuelve una sesión que reutiliza el pool de conexiones del proceso.
+    
+    Sin cabeceras se devuelve la sesión compartida. Con cabeceras se crea una
+    sesión ligera con esas cabeceras que monta los mismos adaptadores, de modo
+    que las conexiones TCP/TLS se siguen reutilizando sin que las cabeceras de
+    un sitio se filtren a los demás.
+    
+    Args:
+        headers: Cabeceras adicionales específicas del sitio
+    
+    Returns:
+        requests.Session: Sesión con el pool compartido
+    """
+    global _shared_session
+    with _session_lock:
+        if headers is None:
+            if _shared_session is None:
+                _shared_session = create_session()
+                _mount_adapters(_shared_session)
+            return _shared_session
+        
+        session = create_session()
+        _mount_adapters(session)
+        session.headers.update(headers)
+        return session
+
+def rate_limited_get(session, url, **kwargs):
+    """
+    Realiza una petición GET respetando el límite de peticiones del host.
+    
+    Args:
+        session: Sesión HTTP a utilizar
+        url: URL a solicitar
+        **kwargs: Argumentos adicionales para session.get
+    
+    Returns:
+        Response: Respuesta HTTP. Las excepciones de conexión se propagan tras
+                  informar al limitador para que aplique el retroceso.
+    """
+    rate_limiter.wait(url)
+    try:
+        response = session.get(url, **kwargs)
+    except requests.exceptions.RequestException:
+        rate_limiter.feedback(url, None)
+        raise
+    rate_limiter.feedback(url, response)
+    return response
+
 def get_page_content(session, url, timeout=30, retry_count=3):
     """
     Obtiene el contenido de una página web con manejo de errores y reintentos.
@@ -36,7 +150,8 @@ def get_page_content(session, url, timeout=30, retry_count=3):
         session: Sesión HTTP a utilizar
         url: URL de la página a obtener
         timeout: Tiempo de espera máximo en segundos
-        retry_count: Número de reintentos si ocurre un error
+        retry_count: Número de reintentos si ocurre un error (los errores 4xx
+                     distintos de 429 no se reintentan)
     
     Returns:
         tuple: (soup, response) donde soup es un objeto BeautifulSoup y response es la respuesta HTTP
@@ -46,22 +161,27 @@ def get_page_content(session, url, timeout=30, retry_count=3):
     
     while current_try < retry_count:
         try:
-            response = session.get(url, timeout=timeout)
+            # El limitador bloquea el host tras un 429/5xx; la espera de abajo
+            # cubre el resto de fallos
+            response = rate_limited_get(session, url, timeout=timeout)
             
             if response.status_code == 200:
                 soup = BeautifulSoup(response.text, 'html.parser')
                 return soup, response
             else:
                 print(f"Error al acceder a {url}: Código {response.status_code}")
-                
-            # Esperar antes de reintentar
-            if current_try < retry_count - 1:
-                sleep_time = 2 * (current_try + 1) + random.uniform(0, 1)
-                time.sleep(sleep_time)
+                # Una página que no existe o está prohibida no cambia al reintentar
+                if 400 <= response.status_code < 500 and response.status_code not in THROTTLE_STATUS_CODES:
+                    return None, None
                 
         except requests.exceptions.RequestException as e:
             print(f"Error de conexión al acceder a {url}: {str(e)}")
         
+        # Esperar antes de reintentar
+        if current_try < retry_count - 1:
+            sleep_time = 2 * (current_try + 1) + random.uniform(0, 1)
+            time.sleep(sleep_time)
+        
         current_try += 1
     
     return None, None
@@ -122,7 +242,7 @@ def get_json_api(session, url, api_headers=None):
         if 'X-Requested-With' not in headers:
             headers['X-Requested-With'] = 'XMLHttpRequest'
         
-        response = session.get(url, headers=headers)
+        response = rate_limited_get(session, url, headers=headers)
         
         if response.status_code == 200:
             try:
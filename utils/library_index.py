@@ -0,0 +1,496 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Índice local de la biblioteca de images/ en SQLite.
+
+Guarda las series, sus capítulos (y si tienen todas sus páginas en disco),
+las páginas de cada capítulo y los episodios ya creados en Strapi. Los
+scrapers lo actualizan al guardar el meta.json de cada capítulo y al terminar
+de descargar sus imágenes, y el diario de subidas al crear cada episodio, así
+que listar las series o un rango de capítulos es una consulta indexada en
+lugar de recorrer directorios y abrir todos los meta.json.
+
+Las consultas solo miran el disco cuando cambia la fecha de modificación del
+directorio de la biblioteca (series nuevas o borradas) o del de un manga
+(capítulos nuevos o borrados). El hash de cada página se calcula la primera
+vez que se pide (page_hash), no al indexarla.
+
+Reconstrucción a partir de los directorios existentes (solo vuelve a leer los
+capítulos que cambiaron desde la última vez, salvo con --full):
+    python -m utils.library_index [--full]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+# Directorio de la biblioteca y archivo del índice (vacío: índice en memoria)
+LIBRARY_ROOT = 'images'
+LIBRARY_INDEX_PATH = os.getenv('LIBRARY_INDEX', os.path.join(LIBRARY_ROOT, '.library.sqlite3'))
+HASH_CHUNK_SIZE = 64 * 1024
+# Diario de subidas de cada manga (ver strapi/journal.py)
+JOURNAL_FILENAME = '.upload_journal.jsonl'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    directory TEXT NOT NULL,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    id INTEGER PRIMARY KEY,
+    series_id INTEGER NOT NULL REFERENCES series(id) ON DELETE CASCADE,
+    dir_name TEXT NOT NULL,
+    number REAL,
+    title TEXT,
+    source_url TEXT,
+    page_count INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    total_size INTEGER,
+    mtime REAL,
+    indexed_at REAL,
+    UNIQUE (series_id, dir_name)
+);
+CREATE INDEX IF NOT EXISTS chapters_by_number ON chapters (series_id, number);
+CREATE TABLE IF NOT EXISTS pages (
+    chapter_id INTEGER NOT NULL REFERENCES chapters(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    filename TEXT,
+    url TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (chapter_id, position)
+);
+CREATE INDEX IF NOT EXISTS pages_by_hash ON pages (sha256);
+CREATE TABLE IF NOT EXISTS uploads (
+    series_id INTEGER NOT NULL REFERENCES series(id) ON DELETE CASCADE,
+    chapter TEXT NOT NULL,
+    server TEXT NOT NULL,
+    comic TEXT NOT NULL,
+    episode_id INTEGER,
+    uploaded_at REAL,
+    PRIMARY KEY (series_id, chapter, server, comic)
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime REAL
+);
+"""
+# Columnas añadidas después de crear el esquema, para índices ya existentes
+MIGRATIONS = (
+    ('chapters', 'complete', 'INTEGER NOT NULL DEFAULT 0'),
+)
+
+def parse_chapter_number(value):
+    """Convierte un número de capítulo (3, '3', '3.5') en int o float, o None."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else number
+
+def chapter_number_from_dir(dir_name):
+    """Número de capítulo de un directorio capitulo_<n>, o None."""
+    match = re.match(r'capitulo_(\d+(?:\.\d+)?)$', dir_name)
+    return parse_chapter_number(match.group(1)) if match else None
+
+def _chapter_key(number):
+    """Clave de capítulo igual a la del diario de subidas ('3', '3.5')."""
+    number = parse_chapter_number(number)
+    return str(number) if number is not None else None
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _chapter_mtime(chapter_dir):
+    """Última modificación del capítulo: su meta.json o sus archivos (añadir una imagen cambia el directorio)."""
+    return max(os.path.getmtime(chapter_dir), os.path.getmtime(os.path.join(chapter_dir, 'meta.json')))
+
+def _page_rows(chapter_dir, images):
+    """Filas de las páginas de un capítulo, con su tamaño si el archivo está en disco."""
+    rows = []
+    for position, image in enumerate(images):
+        filename = image.get('filename') if isinstance(image, dict) else None
+        url = image.get('url') if isinstance(image, dict) else image
+        size = None
+        path = os.path.join(chapter_dir, filename) if filename else None
+        if path and os.path.isfile(path):
+            size = os.path.getsize(path)
+        rows.append((position, filename, url, size, json.dumps(image, ensure_ascii=False)))
+    return rows
+
+class LibraryIndex:
+    """Índice SQLite de la biblioteca, compartido por todos los hilos del proceso."""
+
+    def __init__(self, path=LIBRARY_INDEX_PATH, root=LIBRARY_ROOT):
+        self.path = path or ':memory:'
+        self.root = root
+        self._conn = None
+        self._lock = threading.RLock()
+        # Última modificación de cada diario ya importado en este proceso
+        self._journal_mtimes = {}
+
+    def _connect(self):
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute('PRAGMA foreign_keys = ON')
+            if self.path != ':memory:':
+                # Permite leer el índice mientras otro proceso (un scraper) escribe
+                self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.executescript(SCHEMA)
+            for table, column, definition in MIGRATIONS:
+                columns = {row['name'] for row in self._conn.execute(f'PRAGMA table_info({table})')}
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                    # Los capítulos ya indexados se releen en el siguiente escaneo
+                    with self._conn:
+                        self._conn.execute('UPDATE chapters SET mtime = NULL')
+                        self._conn.execute('DELETE FROM directories')
+        return self._conn
+
+    def _series_id(self, conn, manga_dir, title=None):
+        manga_dir = os.path.abspath(manga_dir)
+        name = os.path.basename(manga_dir)
+        conn.execute('INSERT INTO series (name, directory, title) VALUES (?, ?, ?) '
+                     'ON CONFLICT (name) DO UPDATE SET directory = excluded.directory, '
+                     'title = COALESCE(excluded.title, series.title)',
+                     (name, manga_dir, title))
+        return conn.execute('SELECT id FROM series WHERE name = ?', (name,)).fetchone()['id']
+
+    def _find_series(self, conn, manga_dir):
+        row = conn.execute('SELECT id FROM series WHERE name = ?',
+                           (os.path.basename(os.path.abspath(manga_dir)),)).fetchone()
+        return row['id'] if row else None
+
+    def record_chapter(self, chapter_dir, metadata=None):
+        """
+        Registra (o actualiza) un capítulo y sus páginas.
+
+        El capítulo queda como completo solo si todas sus páginas están en
+        disco, así que se vuelve a registrar al terminar la descarga.
+
+        Args:
+            chapter_dir: Directorio del capítulo dentro del directorio del manga
+            metadata: Contenido de su meta.json (se lee del disco si se omite)
+        """
+        chapter_dir = os.path.abspath(chapter_dir)
+        if metadata is None:
+            with open(os.path.join(chapter_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+
+        dir_name = os.path.basename(chapter_dir)
+        number = parse_chapter_number(metadata.get('chapter_number'))
+        if number is None:
+            number = chapter_number_from_dir(dir_name)
+        images = metadata.get('images') or []
+        pages = _page_rows(chapter_dir, images)
+        sizes = [row[3] for row in pages if row[3] is not None]
+        complete = bool(pages) and len(sizes) == len(pages)
+        mtime = _chapter_mtime(chapter_dir) if os.path.exists(os.path.join(chapter_dir, 'meta.json')) else None
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                series_id = self._series_id(conn, os.path.dirname(chapter_dir),
+                                            metadata.get('manga_title') or metadata.get('manga_name'))
+                conn.execute('INSERT INTO chapters (series_id, dir_name, number, title, source_url, page_count, '
+                             'complete, total_size, mtime, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                             'ON CONFLICT (series_id, dir_name) DO UPDATE SET number = excluded.number, '
+                             'title = excluded.title, source_url = excluded.source_url, '
+                             'page_count = excluded.page_count, complete = excluded.complete, '
+                             'total_size = excluded.total_size, '
+                             'mtime = excluded.mtime, indexed_at = excluded.indexed_at',
+                             (series_id, dir_name, number, metadata.get('chapter_title'),
+                              metadata.get('source_url'), len(images), int(complete),
+                              sum(sizes) if sizes else None, mtime, time.time()))
+                chapter_id = conn.execute('SELECT id FROM chapters WHERE series_id = ? AND dir_name = ?',
+                                          (series_id, dir_name)).fetchone()['id']
+                conn.execute('DELETE FROM pages WHERE chapter_id = ?', (chapter_id,))
+                conn.executemany('INSERT INTO pages (chapter_id, position, filename, url, size, data) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(chapter_id,) + row for row in pages])
+
+    def page_hash(self, chapter_dir, filename):
+        """
+        SHA-256 de una página descargada, calculado la primera vez que se pide.
+
+        Returns:
+            str: Hash del archivo, o None si no está en disco
+        """
+        chapter_dir = os.path.abspath(chapter_dir)
+        path = os.path.join(chapter_dir, filename)
+        if not os.path.isfile(path):
+            return None
+        size = os.path.getsize(path)
+        query = ('SELECT p.chapter_id, p.position, p.size, p.sha256 FROM pages p '
+                 'JOIN chapters c ON c.id = p.chapter_id JOIN series s ON s.id = c.series_id '
+                 'WHERE s.name = ? AND c.dir_name = ? AND p.filename = ?')
+        params = (os.path.basename(os.path.dirname(chapter_dir)), os.path.basename(chapter_dir), filename)
+        with self._lock:
+            row = self._connect().execute(query, params).fetchone()
+        if row is not None and row['sha256'] and row['size'] == size:
+            return row['sha256']
+
+        sha256 = _hash_file(path)
+        if row is not None:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute('UPDATE pages SET size = ?, sha256 = ? WHERE chapter_id = ? AND position = ?',
+                                 (size, sha256, row['chapter_id'], row['position']))
+        return sha256
+
+    def record_upload(self, manga_dir, chapter, server, comic, episode_id=None):
+        """Registra un episodio creado en Strapi para un capítulo del manga (comic es el documentId del cómic)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                series_id = self._series_id(conn, manga_dir)
+                conn.execute('INSERT OR REPLACE INTO uploads (series_id, chapter, server, comic, episode_id, uploaded_at) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (series_id, _chapter_key(chapter) or str(chapter), server, str(comic), episode_id, time.time()))
+
+    def scan_series(self, manga_dir, full=False):
+        """
+        Sincroniza el índice con el directorio de un manga.
+
+        Solo se vuelven a leer los capítulos cuyo meta.json o contenido cambió
+        (o todos con full=True), se eliminan los que ya no existen y se importan
+        los episodios del diario de subidas.
+
+        Returns:
+            int: Número de capítulos leídos
+        """
+        manga_dir = os.path.abspath(manga_dir)
+        dir_mtime = os.path.getmtime(manga_dir)
+        with self._lock:
+            conn = self._connect()
+            series_id = self._find_series(conn, manga_dir)
+            known = {}
+            if series_id is not None:
+                known = {row['dir_name']: row['mtime'] for row in
+                         conn.execute('SELECT dir_name, mtime FROM chapters WHERE series_id = ?', (series_id,))}
+
+        present = set()
+        updated = 0
+        for dir_name in os.listdir(manga_dir):
+            chapter_dir = os.path.join(manga_dir, dir_name)
+            if not dir_name.startswith('capitulo_') or not os.path.exists(os.path.join(chapter_dir, 'meta.json')):
+                continue
+            present.add(dir_name)
+            if not full and known.get(dir_name) == _chapter_mtime(chapter_dir):
+                continue
+            try:
+                self.record_chapter(chapter_dir)
+                updated += 1
+            except (OSError, ValueError) as e:
+                print(f"Error al indexar {chapter_dir}: {str(e)}")
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                series_id = self._series_id(conn, manga_dir)
+                conn.executemany('DELETE FROM chapters WHERE series_id = ? AND dir_name = ?',
+                                 [(series_id, dir_name) for dir_name in set(known) - present])
+                self._set_directory_mtime(conn, manga_dir, dir_mtime)
+        self._import_journal(manga_dir)
+        return updated
+
+    def _directory_mtime(self, path):
+        """Fecha de modificación de un directorio en el último escaneo, o None."""
+        with self._lock:
+            row = self._connect().execute('SELECT mtime FROM directories WHERE path = ?',
+                                          (os.path.abspath(path),)).fetchone()
+        return row['mtime'] if row else None
+
+    def _set_directory_mtime(self, conn, path, mtime):
+        conn.execute('INSERT OR REPLACE INTO directories (path, mtime) VALUES (?, ?)', (os.path.abspath(path), mtime))
+
+    def _refresh_series(self, manga_dir):
+        """Vuelve a escanear un manga solo si su directorio cambió (capítulos nuevos o borrados)."""
+        if not os.path.isdir(manga_dir):
+            self._remove_series(os.path.basename(os.path.abspath(manga_dir)))
+            return
+        if self._directory_mtime(manga_dir) != os.path.getmtime(manga_dir):
+            self.scan_series(manga_dir)
+        else:
+            self._import_journal(os.path.abspath(manga_dir))
+
+    def _refresh_library(self):
+        """Indexa las series añadidas y quita las borradas si el directorio de la biblioteca cambió."""
+        if not os.path.isdir(self.root):
+            return
+        root_mtime = os.path.getmtime(self.root)
+        if self._directory_mtime(self.root) == root_mtime:
+            return
+        names = self._series_names()
+        with self._lock:
+            known = {row['name'] for row in self._connect().execute('SELECT name FROM series')}
+        for name in sorted(set(names) - known):
+            self.scan_series(os.path.join(self.root, name))
+        self._remove_series(*(known - set(names)))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._set_directory_mtime(conn, self.root, root_mtime)
+
+    def _series_names(self):
+        return [name for name in os.listdir(self.root)
+                if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name))]
+
+    def _import_journal(self, manga_dir):
+        """Importa los episodios registrados en el diario de subidas del manga."""
+        path = os.path.join(manga_dir, JOURNAL_FILENAME)
+        if not os.path.exists(path):
+            return
+        mtime = os.path.getmtime(path)
+        if self._journal_mtimes.get(path) == mtime:
+            return
+        # Se lee el archivo directamente: el paquete strapi exige su configuración
+        rows = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('type') == 'episode':
+                    rows.append((entry['chapter'], entry['server'], entry['comic'], entry.get('episode_id'), entry.get('ts')))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                series_id = self._series_id(conn, manga_dir)
+                conn.executemany('INSERT OR IGNORE INTO uploads (series_id, chapter, server, comic, episode_id, uploaded_at) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)', [(series_id,) + row for row in rows])
+        self._journal_mtimes[path] = mtime
+
+    def scan(self, full=False):
+        """
+        Sincroniza el índice con todo el directorio de la biblioteca.
+
+        Recorre todos los capítulos de todas las series (un stat por capítulo,
+        o una lectura completa con full=True); las consultas no lo hacen.
+
+        Returns:
+            int: Número de capítulos leídos
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        root_mtime = os.path.getmtime(self.root)
+        names = self._series_names()
+        updated = sum(self.scan_series(os.path.join(self.root, name), full) for name in sorted(names))
+        with self._lock:
+            stale = [row['name'] for row in self._connect().execute('SELECT name FROM series')
+                     if row['name'] not in names]
+        self._remove_series(*stale)
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._set_directory_mtime(conn, self.root, root_mtime)
+        return updated
+
+    def _remove_series(self, *names):
+        """Elimina del índice series cuyo directorio ya no existe."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany('DELETE FROM series WHERE name = ?', [(name,) for name in names])
+
+    def list_series(self):
+        """
+        Series de la biblioteca con su número de capítulos, ordenadas por nombre.
+
+        Solo se mira el disco si el directorio de la biblioteca cambió desde la
+        última vez, y entonces solo se indexan las series nuevas.
+        """
+        self._refresh_library()
+        with self._lock:
+            return [dict(row) for row in self._connect().execute(
+                'SELECT s.name, s.directory, s.title, COUNT(c.id) AS chapters FROM series s '
+                'LEFT JOIN chapters c ON c.series_id = s.id GROUP BY s.id ORDER BY s.name')]
+
+    def get_chapters(self, manga_dir, start=None, end=None):
+        """
+        Capítulos de un manga ordenados por número, opcionalmente en un rango.
+
+        Solo se vuelve a escanear el directorio del manga si cambió desde la
+        última vez. Los capítulos sin número van al final (un rango los excluye).
+
+        Args:
+            manga_dir: Directorio del manga
+            start: Primer número de capítulo incluido (opcional)
+            end: Último número de capítulo incluido (opcional)
+
+        Returns:
+            list: Diccionarios con 'number', 'directory', 'title', 'complete' e 'images'
+        """
+        self._refresh_series(manga_dir)
+
+        query = ('SELECT c.id, c.dir_name, c.number, c.title, c.complete, p.data FROM series s '
+                 'JOIN chapters c ON c.series_id = s.id LEFT JOIN pages p ON p.chapter_id = c.id '
+                 'WHERE s.name = ?')
+        params = [os.path.basename(os.path.abspath(manga_dir))]
+        if start is not None:
+            query += ' AND c.number >= ?'
+            params.append(start)
+        if end is not None:
+            query += ' AND c.number <= ?'
+            params.append(end)
+        query += ' ORDER BY c.number IS NULL, c.number, c.dir_name, p.position'
+
+        chapters = []
+        with self._lock:
+            for row in self._connect().execute(query, params):
+                if not chapters or chapters[-1]['id'] != row['id']:
+                    chapters.append({
+                        'id': row['id'],
+                        'number': parse_chapter_number(row['number']),
+                        'directory': os.path.join(manga_dir, row['dir_name']),
+                        'title': row['title'],
+                        'complete': bool(row['complete']),
+                        'images': [],
+                    })
+                if row['data'] is not None:
+                    chapters[-1]['images'].append(json.loads(row['data']))
+        for chapter in chapters:
+            del chapter['id']
+        return chapters
+
+    def get_episodes(self, manga_dir, start=None, end=None):
+        """Capítulos de un manga con el formato de episodio que usan las subidas a Strapi."""
+        episodes = []
+        for chapter in self.get_chapters(manga_dir, start, end):
+            if chapter['number'] is None:
+                print(f"No se pudo determinar el número de capítulo para {chapter['directory']}")
+                continue
+            if not chapter['complete']:
+                print(f"Advertencia: faltan imágenes en disco de {chapter['directory']}; se descargarán de su URL")
+            episodes.append({'episode': chapter['number'], 'images': chapter['images'],
+                             'directory': chapter['directory']})
+        return episodes
+
+# Índice global del proceso
+library_index = LibraryIndex()
+
+if __name__ == "__main__":
+    full = '--full' in sys.argv[1:]
+    print(f"Indexando {os.path.abspath(LIBRARY_ROOT)} en {library_index.path}...")
+    updated = library_index.scan(full=full)
+    series = library_index.list_series()
+    print(f"Índice actualizado: {updated} capítulos leídos, {len(series)} series, "
+          f"{sum(item['chapters'] for item in series)} capítulos en total")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Limitador de peticiones por host basado en token bucket, con soporte para
+Retry-After y retroceso adaptativo.
+
+La tasa por defecto está pensada para el motor de descargas, que hace hasta
+DEFAULT_HOST_CONCURRENCY (4) descargas simultáneas por host: con una imagen
+cada medio segundo por hilo son unas 8 peticiones por segundo. Tras cada
+respuesta correcta la tasa sube poco a poco por encima de la configurada,
+hasta RATE_LIMIT_MAX_RATE, y se reduce a la mitad cuando el servidor pide
+bajar el ritmo. Los hosts que necesiten otros valores se configuran con
+RATE_LIMITS, por ejemplo 'olympusbiblioteca.com=2:4,cdn.example.com=16'
+(peticiones por segundo y, opcionalmente, ráfaga).
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Valores por defecto para hosts sin configuración explícita
+DEFAULT_RATE = float(os.getenv('RATE_LIMIT_RATE', '8'))     # peticiones por segundo
+DEFAULT_BURST = int(os.getenv('RATE_LIMIT_BURST', '8'))     # peticiones que se pueden hacer de golpe
+MAX_RATE = float(os.getenv('RATE_LIMIT_MAX_RATE', '20'))    # techo al que puede subir la tasa
+MIN_RATE = 0.1          # nunca bajar de una petición cada 10 segundos
+MAX_BACKOFF = 60.0      # espera máxima tras errores consecutivos
+# Aumento de la tasa por respuesta correcta, en fracción de la tasa configurada
+RECOVERY_STEP = 0.1     # hasta volver a la tasa configurada
+PROBE_STEP = 0.02       # por encima de ella, hasta MAX_RATE
+
+# Códigos que indican que el servidor pide bajar el ritmo
+THROTTLE_STATUS_CODES = (429, 503)
+
+def parse_retry_after(value):
+    """Convierte el valor de la cabecera Retry-After a segundos (o None si no es válido)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+class TokenBucket:
+    """Token bucket de un host con tasa adaptativa."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_rate=MAX_RATE):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.max_rate = max(self.base_rate, float(max_rate))
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible y lo consume."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, retry_after=None):
+        """Reduce la tasa a la mitad y bloquea el host durante Retry-After o un retroceso exponencial."""
+        with self.lock:
+            self.failures += 1
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after is None:
+                retry_after = min(MAX_BACKOFF, 2 ** self.failures)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def success(self):
+        """Recupera la tasa configurada tras una respuesta correcta y luego la sube despacio hasta max_rate."""
+        with self.lock:
+            self.failures = 0
+            if self.rate < self.base_rate:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.base_rate * PROBE_STEP)
+
+class RateLimiter:
+    """Registro central de token buckets indexados por host."""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.default_rate = rate
+        self.default_burst = burst
+        self._settings = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host, rate=None, burst=None):
+        """Configura las peticiones por segundo y la ráfaga permitida para un host."""
+        with self._lock:
+            current_rate, current_burst = self._settings.get(host, (self.default_rate, self.default_burst))
+            self._settings[host] = (rate or current_rate, burst or current_burst)
+            self._buckets.pop(host, None)
+
+    def bucket(self, url):
+        """Devuelve el bucket del host de la URL, creándolo si no existe."""
+        host = urlparse(url).netloc or url
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, burst = self._settings.get(host, (self.default_rate, self.default_burst))
+                bucket = TokenBucket(rate, burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def wait(self, url):
+        """Espera el turno para hacer una petición al host de la URL."""
+        self.bucket(url).acquire()
+
+    def feedback(self, url, response=None):
+        """
+        Ajusta la tasa del host según la respuesta recibida.
+
+        Args:
+            url: URL solicitada
+            response: Respuesta HTTP, o None si hubo un error de conexión
+        """
+        bucket = self.bucket(url)
+        if response is None or response.status_code >= 500 or response.status_code in THROTTLE_STATUS_CODES:
+            retry_after = None
+            if response is not None and response.status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            bucket.backoff(retry_after)
+        else:
+            bucket.success()
+
+def parse_host_limits(value):
+    """Convierte 'host=tasa[:ráfaga],host=tasa' en un diccionario {host: (tasa, ráfaga)}."""
+    limits = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        host, limit = item.split('=', 1)
+        rate, _, burst = limit.partition(':')
+        try:
+            limits[host.strip()] = (float(rate), int(burst) if burst else None)
+        except ValueError:
+            print(f"Límite de peticiones no válido para {host.strip()}: {limit}")
+    return limits
+
+# Instancia compartida por todo el proceso
+rate_limiter = RateLimiter()
+for _host, (_rate, _burst) in parse_host_limits(os.getenv('RATE_LIMITS')).items():
+    rate_limiter.configure(_host, _rate, _burst)
+
+def configure_host_rate(host, rate=None, burst=None):
+    """Configura las peticiones por segundo y la ráfaga de un host en el limitador compartido."""
+    rate_limiter.configure(host, rate, burst)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Planificador de trabajos con un pool global de hilos, límites de concurrencia
+por sitio y prioridades.
+"""
+
+import itertools
+import threading
+from concurrent.futures import Future
+
+# Hilos del pool global
+DEFAULT_SCHEDULER_WORKERS = 6
+# Trabajos simultáneos permitidos por sitio si no se configura otro valor
+DEFAULT_SITE_LIMIT = 2
+
+# Límites por sitio: M440 abre un navegador por trabajo e Ikigai responde con
+# 403 ante ráfagas, así que ambos van de uno en uno
+DEFAULT_SITE_LIMITS = {
+    'olympus': 2,
+    'm440': 1,
+    'inmanga': 2,
+    'ikigai': 1,
+    'leercapitulo': 2,
+    'tmo': 1,
+}
+
+class JobScheduler:
+    """
+    Ejecuta trabajos de varios sitios en un pool compartido de hilos.
+
+    Cada hilo libre toma el trabajo de mayor prioridad cuyo sitio no haya
+    alcanzado su límite; a igual prioridad se respeta el orden de llegada.
+    Así los trabajos de sitios distintos avanzan en paralelo mientras cada
+    sitio solo recibe la carga permitida.
+    """
+
+    def __init__(self, max_workers=DEFAULT_SCHEDULER_WORKERS, site_limits=None):
+        self.max_workers = max(1, int(max_workers))
+        self.site_limits = dict(DEFAULT_SITE_LIMITS)
+        if site_limits:
+            self.site_limits.update(site_limits)
+        self._pending = []
+        self._running = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._shutdown = False
+
+    def set_site_limit(self, site, limit):
+        """Configura el número máximo de trabajos simultáneos de un sitio."""
+        with self._condition:
+            self.site_limits[site] = max(1, int(limit))
+            self._condition.notify_all()
+
+    def submit(self, site, fn, *args, priority=0, **kwargs):
+        """
+        Encola un trabajo.
+
+        Args:
+            site: Sitio al que pertenece el trabajo (para aplicar su límite)
+            fn: Función a ejecutar
+            priority: Prioridad del trabajo (mayor valor, antes se ejecuta)
+
+        Returns:
+            Future: Resultado del trabajo
+        """
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("El planificador ya se ha detenido")
+            self._pending.append((-priority, next(self._counter), site, fn, args, kwargs, future))
+            self._start_workers()
+            self._condition.notify()
+        return future
+
+    def _start_workers(self):
+        # Los hilos se crean con el primer trabajo y se reutilizan hasta shutdown()
+        while len(self._threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_job(self):
+        """Saca el trabajo de mayor prioridad cuyo sitio tiene capacidad libre."""
+        best = None
+        for item in self._pending:
+            site = item[2]
+            if self._running.get(site, 0) >= self.site_limits.get(site, DEFAULT_SITE_LIMIT):
+                continue
+            if best is None or item[:2] < best[:2]:
+                best = item
+        if best is not None:
+            self._pending.remove(best)
+        return best
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown and not self._pending:
+                        return
+                    self._condition.wait()
+                    job = self._next_job()
+                site = job[2]
+                self._running[site] = self._running.get(site, 0) + 1
+
+            _, _, site, fn, args, kwargs, future = job
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running[site] -= 1
+                    self._condition.notify_all()
+
+    def shutdown(self, wait=True):
+        """Deja de aceptar trabajos; con wait=True espera a que terminen los encolados."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Vigilante de series: consulta periódicamente las series de una lista de
+seguimiento y, cuando aparecen capítulos nuevos, los descarga y sube con
+sync.py.
+
+La lista de seguimiento tiene el mismo formato que la de sync.py (site, url,
+manga y opcionalmente comic, title y priority) y se vuelve a leer en cada
+ronda, así que puede editarse sin detener el proceso.
+
+Cada serie tiene su propio intervalo de consulta: se acorta cuando aparecen
+capítulos nuevos y se alarga cuando no cambia nada, entre WATCH_MIN_INTERVAL
+y WATCH_MAX_INTERVAL segundos. Los errores aplican un retroceso exponencial
+sin alterar ese intervalo.
+
+Cada consulta es una petición condicional (If-None-Match / If-Modified-Since)
+a la página de la serie, de la que los cuatro sitios soportados sacan su
+índice de capítulos. Si el servidor responde 304, o los enlaces de la página
+que apuntan a la serie (sus capítulos) son los mismos que la vez anterior,
+no se procesa nada más: anuncios, tokens o fechas que cambian en cada
+petición no cuentan. Solo cuando cambian se fuerza la consulta del índice de
+capítulos; si la página no tiene esos enlaces (listas cargadas por
+JavaScript) se consulta el índice respetando su caducidad.
+
+Las series sin un cómic identificado con seguridad en Strapi no se vuelven a
+sincronizar en cada consulta, solo cuando aparecen capítulos nuevos o cambia
+su entrada en la lista de seguimiento.
+
+Uso:
+    python watcher.py series.jsonl [--once] [--no-download] [--no-upload]
+"""
+
+import os
+import sys
+import json
+import time
+import re
+import random
+import hashlib
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from batch import load_jobs, parse_site_limits, DEFAULT_BATCH_WORKERS
+from sync import _sites, chapter_key, run_sync
+from utils.chapter_index import chapter_index
+from utils.http_utils import get_session, rate_limited_get
+from utils.scheduler import JobScheduler
+
+# Límites del intervalo de consulta de cada serie (segundos)
+WATCH_MIN_INTERVAL = float(os.getenv('WATCH_MIN_INTERVAL', '900'))
+WATCH_MAX_INTERVAL = float(os.getenv('WATCH_MAX_INTERVAL', '86400'))
+WATCH_INITIAL_INTERVAL = float(os.getenv('WATCH_INITIAL_INTERVAL', '3600'))
+# Factor con el que crece el intervalo en cada consulta sin novedades
+WATCH_BACKOFF_FACTOR = float(os.getenv('WATCH_BACKOFF_FACTOR', '1.5'))
+# Espera máxima entre rondas (para releer la lista de seguimiento)
+WATCH_RELOAD_INTERVAL = float(os.getenv('WATCH_RELOAD_INTERVAL', '60'))
+# Estado de cada serie (validadores HTTP, intervalo, próxima consulta)
+WATCH_STATE_FILE = os.getenv('WATCH_STATE_FILE', os.path.join('images', '.watcher_state.json'))
+
+def series_key(job):
+    return f"{job['site']}|{job['url'].rstrip('/')}"
+
+def load_state(path=WATCH_STATE_FILE):
+    """Lee el estado guardado de las series, o un estado vacío."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No se pudo leer el estado del vigilante ({str(e)}); se empieza de cero")
+        return {}
+
+def save_state(state, path=WATCH_STATE_FILE):
+    """Guarda el estado de forma atómica para no perderlo si el proceso muere."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+def new_entry():
+    return {
+        'interval': WATCH_INITIAL_INTERVAL,
+        'next_poll': 0,
+        'errors': 0,
+        'etag': None,
+        'last_modified': None,
+        'links_hash': None,
+        'chapters': None,
+        'latest': None,
+        'pending_sync': False,
+    }
+
+def _series_slug(url):
+    """Segmento de la URL de la serie con su nombre (el más largo que no es un ID)."""
+    segments = [segment for segment in urlparse(url).path.split('/') if segment]
+    names = [segment for segment in segments if not re.fullmatch(r'\d+|[0-9a-f-]{16,}', segment.lower())]
+    return max(names, key=len) if names else None
+
+def chapter_links_hash(url, content):
+    """
+    Hash de los enlaces de la página que apuntan a la serie, es decir, de su
+    lista de capítulos.
+
+    Returns:
+        str: Hash de los enlaces, o None si la página no tiene ninguno
+    """
+    slug = _series_slug(url)
+    if not slug:
+        return None
+    series_url = url.rstrip('/')
+    links = set()
+    for a_tag in BeautifulSoup(content, 'html.parser').find_all('a', href=True):
+        href = urljoin(url, a_tag['href']).split('#')[0].split('?')[0].rstrip('/')
+        if slug in href and href != series_url:
+            links.add(href)
+    if not links:
+        return None
+    return hashlib.sha1('\n'.join(sorted(links)).encode('utf-8')).hexdigest()
+
+def page_changed(url, entry):
+    """
+    Consulta la página de la serie con una petición condicional.
+
+    Args:
+        url: URL principal de la serie
+        entry: Estado de la serie (se actualizan sus validadores)
+
+    Returns:
+        bool: True si la lista de capítulos de la página cambió desde la
+              última consulta, False si no, o None si no se puede saber
+              (la página no enlaza sus capítulos)
+    """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+
+    response = rate_limited_get(get_session(), url, headers=headers, timeout=30)
+    if response.status_code == 304:
+        return False
+    if response.status_code != 200:
+        raise RuntimeError(f"Código {response.status_code} al consultar {url}")
+
+    entry['etag'] = response.headers.get('ETag')
+    entry['last_modified'] = response.headers.get('Last-Modified')
+    # Sin validadores (o si cambian con cada petición) se compara la lista de
+    # capítulos, no el cuerpo completo
+    links_hash = chapter_links_hash(url, response.content)
+    if links_hash is None:
+        return None
+    changed = links_hash != entry.get('links_hash')
+    entry['links_hash'] = links_hash
+    return changed
+
+def poll_series(job, entry, sites):
+    """
+    Consulta una serie y actualiza su índice de capítulos si la página cambió.
+
+    Returns:
+        str: 'new' si hay capítulos nuevos, 'unchanged' o 'error'
+    """
+    get_chapters = sites[job['site']][0]
+    try:
+        changed = page_changed(job['url'], entry)
+        if changed is False:
+            return 'unchanged'
+        if changed:
+            # Forzar la consulta del índice: solo se anexan los capítulos nuevos
+            with chapter_index.max_age(0):
+                chapters = get_chapters(job['url'])
+        else:
+            # Sin enlaces que comparar, el índice se consulta cuando caduca
+            chapters = get_chapters(job['url'])
+    except Exception as e:
+        print(f"{job['manga']}: error al consultar la serie: {str(e)}")
+        return 'error'
+    if not chapters:
+        print(f"{job['manga']}: no se pudo obtener la lista de capítulos")
+        return 'error'
+
+    numbers = [key for key in (chapter_key(chapter.get('number')) for chapter in chapters) if key is not None]
+    latest = max(numbers) if numbers else None
+    first_poll = entry.get('chapters') is None
+    new = not first_poll and (len(chapters) > entry['chapters'] or
+                              (latest is not None and latest > (entry.get('latest') or 0)))
+    entry['chapters'] = len(chapters)
+    entry['latest'] = latest
+    if new:
+        print(f"{job['manga']}: capítulos nuevos (último: {latest})")
+    if new or first_poll:
+        # La primera vez se sincroniza para ponerse al día con la serie
+        entry['pending_sync'] = True
+    return 'new' if new else 'unchanged'
+
+def schedule_next(entry, outcome, now=None):
+    """Calcula la próxima consulta de una serie según el resultado de la última."""
+    now = time.time() if now is None else now
+    if outcome == 'error':
+        entry['errors'] = entry.get('errors', 0) + 1
+        delay = min(WATCH_MAX_INTERVAL, entry['interval'] * 2 ** entry['errors'])
+    else:
+        entry['errors'] = 0
+        if outcome == 'new':
+            entry['interval'] = max(WATCH_MIN_INTERVAL, entry['interval'] / 2)
+        else:
+            entry['interval'] = min(WATCH_MAX_INTERVAL, entry['interval'] * WATCH_BACKOFF_FACTOR)
+        delay = entry['interval']
+    # Un poco de variación para que las series no se consulten todas a la vez
+    entry['next_poll'] = now + delay * random.uniform(0.9, 1.1)
+
+def watch_round(jobs, state, sites, download=True, upload=True, workers=None):
+    """
+    Consulta las series cuya próxima consulta ya llegó y sincroniza las que tienen novedades.
+
+    Returns:
+        int: Número de series consultadas
+    """
+    now = time.time()
+    due = [job for job in jobs if state[series_key(job)]['next_poll'] <= now]
+    if not due:
+        return 0
+
+    print(f"\nConsultando {len(due)} de {len(jobs)} series...")
+    with JobScheduler(workers or DEFAULT_BATCH_WORKERS, parse_site_limits(os.getenv('BATCH_SITE_LIMITS'))) as scheduler:
+        futures = [
+            scheduler.submit(job['site'], poll_series, job, state[series_key(job)], sites,
+                             priority=job.get('priority', 0))
+            for job in due
+        ]
+        for job, future in zip(due, futures):
+            schedule_next(state[series_key(job)], future.result())
+
+    to_sync = [job for job in due if state[series_key(job)]['pending_sync']]
+    if to_sync:
+        results = run_sync(to_sync, download=download, upload=upload)
+        for series in results:
+            # Si algo falló o quedan capítulos sin subir, se vuelve a sincronizar
+            # en la siguiente consulta aunque la serie no cambie. Una serie sin
+            # cómic en Strapi espera a tener capítulos nuevos o a que cambie su
+            # entrada en la lista de seguimiento.
+            pending = series.get('error') or series.get('upload_error')
+            if upload and not series.get('unmatched'):
+                pending = pending or not series.get('document_id') or any(
+                    key not in series['strapi'] for key in series['disk'])
+            state[series_key(series['job'])]['pending_sync'] = bool(pending)
+    return len(due)
+
+def watch(path, download=True, upload=True, once=False, workers=None):
+    """
+    Vigila las series de una lista de seguimiento.
+
+    Args:
+        path: Archivo JSON o JSONL con la lista de seguimiento
+        download: Si es True, descarga los capítulos nuevos
+        upload: Si es True, sube a Strapi los capítulos nuevos
+        once: Si es True, hace una sola ronda (útil desde cron)
+        workers: Series que se consultan a la vez (por defecto BATCH_WORKERS)
+    """
+    sites = _sites()
+    state = load_state()
+    try:
+        while True:
+            jobs = []
+            for job in load_jobs(path):
+                if not isinstance(job, dict) or job.get('site') not in sites or not job.get('url') or not job.get('manga'):
+                    print(f"Serie omitida (se necesitan site, url y manga): {job}")
+                    continue
+                jobs.append(job)
+                entry = state.setdefault(series_key(job), new_entry())
+                # Una entrada editada (por ejemplo, con el 'comic' que faltaba)
+                # se sincroniza en la siguiente ronda
+                signature = json.dumps(job, sort_keys=True, ensure_ascii=False)
+                if entry.get('job') not in (None, signature):
+                    entry['pending_sync'] = True
+                    entry['next_poll'] = 0
+                entry['job'] = signature
+
+            if watch_round(jobs, state, sites, download, upload, workers):
+                save_state(state)
+            if once:
+                return state
+
+            next_poll = min((state[series_key(job)]['next_poll'] for job in jobs), default=time.time() + WATCH_RELOAD_INTERVAL)
+            time.sleep(min(WATCH_RELOAD_INTERVAL, max(1, next_poll - time.time())))
+    except KeyboardInterrupt:
+        print("\nDeteniendo el vigilante...")
+        save_state(state)
+        return state
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    flags = {arg for arg in sys.argv[1:] if arg.startswith('--')}
+    if not args:
+        print("Uso: python watcher.py <series.json|series.jsonl> [--once] [--no-download] [--no-upload]")
+        sys.exit(1)
+    if not os.path.exists(args[0]):
+        print(f"Error: El archivo {args[0]} no existe")
+        sys.exit(1)
+    watch(args[0], download='--no-download' not in flags, upload='--no-upload' not in flags,
+          once='--once' in flags)